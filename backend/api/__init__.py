@@ -1,11 +1,15 @@
 from fastapi import FastAPI
 from api.reporte import ReporteService
 from api.campania import CampaniaService
+from api.pool import PoolService
+from api.metrics import MetricsService
 from fastapi.middleware.cors import CORSMiddleware
 
 def setup_services(api_server: FastAPI):
     ReporteService(api_server)
     CampaniaService(api_server)
+    PoolService(api_server)
+    MetricsService(api_server)
 
     # Configuraciones de CORS
     api_server.add_middleware(
@@ -1,18 +1,26 @@
 from fastapi import FastAPI, APIRouter, Depends, Query
-from sqlalchemy import distinct, func, text
-from models.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy import distinct, func, select, text
+from models.database import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.ta_sms_maestro import TaSmsMaestro
 from schemas.ta_sms_maestro import TaSmsMaestro as TaSmsMaestroSchema
 from schemas.pagination import PaginatedResponse, PaginationParams
 from utils.fecha import convertir_fecha
+from utils.cursor import codificar_cursor, decodificar_cursor
+from utils.cache import TTLCache
+from tasks.campaign_stats import pivot_stats, stats_by_date_query
 import datetime
+import math
+import os
 from typing import Optional
 from fastapi import HTTPException
 
 ROUTE_NAME = 'campania'
 "Campaña"
 
+# Conteo de campañas por fecha para la paginación keyset (segundos de vigencia)
+total_campanias_cache = TTLCache(ttl=int(os.getenv("CAMPANIAS_TOTAL_TTL", 60)))
+
 class CampaniaService:
 
     def __init__(self, api_server: FastAPI):
@@ -23,17 +31,24 @@ class CampaniaService:
     def setup_routes(self):
         self.api_router.get('/list/')(self.list_campanias_fecha)#listar las campañas por fecha y paginacion
         self.api_router.get('/fechas')(self.obtener_fechas)#obtener todas las fechas distintas donde existen campañas
+        self.api_router.get('/stats/')(self.obtener_estadisticas)#conteo de mensajes por estado de las campañas de una fecha
     
     async def list_campanias_fecha(
         self,
         fecha: datetime.datetime = Depends(convertir_fecha),
         page: int = Query(1, ge=1, description="Número de página"),
         page_size: int = Query(10, ge=1, le=100, description="Tamaño de página"),
-        db: Session = Depends(get_db)) -> PaginatedResponse[TaSmsMaestroSchema]:
+        paginacion: str = Query("offset", pattern="^(offset|keyset)$", description="Modo de paginación: offset (page) o keyset (cursor)"),
+        cursor: Optional[str] = Query(None, description="Cursor next_cursor de la página anterior (paginación keyset)"),
+        incluir_total: bool = Query(True, description="Incluir total de registros y páginas (en keyset se cachea por fecha)"),
+        db: AsyncSession = Depends(get_async_db)) -> PaginatedResponse[TaSmsMaestroSchema]:
+
+        if paginacion == "keyset" or cursor is not None:
+            return await self.list_campanias_fecha_keyset(fecha, page, page_size, cursor, incluir_total, db)
 
         try:
             # Ejecutar la función get_campanias_by_fecha
-            results = db.execute(
+            results = (await db.execute(
                 text("""
                     SELECT * FROM get_campanias_by_fecha(:fecha, :page, :page_size);
                 """),
@@ -42,7 +57,7 @@ class CampaniaService:
                     "page": page,
                     "page_size": page_size
                 }
-            ).fetchall()
+            )).fetchall()
 
             # Verificar si hay resultados, si no hay, retornar lista vacía
             if not results:
@@ -79,18 +94,83 @@ class CampaniaService:
             )
 
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=500,
                 detail=f"Error al obtener campañas: {str(e)}"
             )
 
     
-    async def obtener_fechas(self, db: Session = Depends(get_db)):
+    async def list_campanias_fecha_keyset(
+        self,
+        fecha: datetime.datetime,
+        page: int,
+        page_size: int,
+        cursor: Optional[str],
+        incluir_total: bool,
+        db: AsyncSession) -> PaginatedResponse[TaSmsMaestroSchema]:
+        """
+        Paginación keyset sobre (fecha, id): cada página continúa desde el último id de la anterior,
+        por lo que la latencia no depende de la profundidad de la página.
+        """
+        try:
+            query = select(TaSmsMaestro).where(TaSmsMaestro.fecha == fecha.date())
+
+            if cursor is not None:
+                posicion = decodificar_cursor(cursor)
+                if posicion.get("fecha") != fecha.date().isoformat() or not isinstance(posicion.get("id"), int):
+                    raise HTTPException(status_code=400, detail="El cursor no corresponde a la fecha solicitada.")
+                query = query.where(TaSmsMaestro.id > posicion["id"])
+
+            # Se pide una fila extra para saber si existe una página siguiente
+            campanias = (await db.execute(
+                query.order_by(TaSmsMaestro.id).limit(page_size + 1)
+            )).scalars().all()
+
+            next_cursor = None
+            if len(campanias) > page_size:
+                campanias = campanias[:page_size]
+                next_cursor = codificar_cursor({"fecha": fecha.date().isoformat(), "id": campanias[-1].id})
+
+            total_registros = total_paginas = None
+            if incluir_total:
+                total_registros = await self.contar_campanias_fecha(fecha.date(), db)
+                total_paginas = math.ceil(total_registros / page_size)
+
+            return PaginatedResponse(
+                items=campanias,
+                total=total_registros,
+                page=page,
+                page_size=page_size,
+                total_pages=total_paginas,
+                next_cursor=next_cursor
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error al obtener campañas: {str(e)}"
+            )
+
+    async def contar_campanias_fecha(self, fecha: datetime.date, db: AsyncSession) -> int:
+        """Total de campañas de una fecha; se cachea para no ejecutar COUNT(*) en cada página"""
+        total = total_campanias_cache.get(fecha)
+        if total is None:
+            total = (await db.execute(
+                select(func.count()).select_from(TaSmsMaestro).where(TaSmsMaestro.fecha == fecha)
+            )).scalar_one()
+            total_campanias_cache.set(fecha, total)
+        return total
+
+    async def obtener_fechas(self, db: AsyncSession = Depends(get_async_db)):
         """Obtiene todas las fechas distintas donde existen campañas"""
-        fechas = db.query(distinct(TaSmsMaestro.fecha))\
-                  .order_by(TaSmsMaestro.fecha.desc())\
-                  .all()
+        fechas = (await db.execute(
+            select(distinct(TaSmsMaestro.fecha))
+            .order_by(TaSmsMaestro.fecha.desc())
+        )).all()
         
         # Convertir las fechas a formato ISO para JSON
         fechas_formateadas = [
@@ -101,4 +181,17 @@ class CampaniaService:
         return {
             "fechas": fechas_formateadas,
             "total": len(fechas_formateadas)
-        }
\ No newline at end of file
+        }
+
+    async def obtener_estadisticas(
+        self,
+        fecha: datetime.datetime = Depends(convertir_fecha),
+        db: AsyncSession = Depends(get_async_db)):
+        """Obtiene, para cada campaña de la fecha, el total de mensajes y su conteo por estado"""
+        campanias = pivot_stats((await db.execute(stats_by_date_query(fecha.date()))).all())
+
+        return {
+            "fecha": fecha.strftime("%Y/%m/%d"),
+            "campanias": campanias,
+            "total": len(campanias)
+        }
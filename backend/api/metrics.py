@@ -0,0 +1,46 @@
+from fastapi import FastAPI, APIRouter
+from fastapi.responses import Response
+from models.database import ENGINES
+from models.pool import pool_status
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, registry
+
+ROUTE_NAME = 'metrics'
+
+registry.gauge("db_pool_conexiones", "Conexiones de cada pool por estado (checked_in, checked_out, overflow)")
+registry.gauge("db_pool_esperas", "Checkouts que encontraron el pool agotado")
+registry.gauge("db_pool_espera_segundos", "Tiempo total esperado por una conexión con el pool agotado")
+registry.gauge("db_pool_timeouts", "Checkouts que agotaron pool_timeout")
+
+
+def pool_gauges() -> list[tuple[str, dict, float]]:
+    """Estado actual de los pools de la API como gauges de Prometheus"""
+    gauges = []
+    for nombre, engine in ENGINES.items():
+        status = pool_status(engine)
+        for estado in ("checked_in", "checked_out", "overflow"):
+            gauges.append(("db_pool_conexiones", {"engine": nombre, "estado": estado}, status[estado]))
+        gauges.append(("db_pool_esperas", {"engine": nombre}, status.get("esperas", 0)))
+        gauges.append(("db_pool_espera_segundos", {"engine": nombre}, status.get("tiempo_espera_s", 0)))
+        gauges.append(("db_pool_timeouts", {"engine": nombre}, status.get("timeouts", 0)))
+    return gauges
+
+
+registry.gauge_callback(pool_gauges)
+
+
+class MetricsService:
+
+    def __init__(self, api_server: FastAPI):
+        self.api_router = APIRouter(prefix=f'/{ROUTE_NAME}')
+        self.setup_routes()
+        api_server.include_router(self.api_router)
+
+    def setup_routes(self):
+        self.api_router.get('')(self.get_metrics)#métricas en formato Prometheus
+
+    async def get_metrics(self):
+        """
+        Métricas del proceso de la API en formato de texto de Prometheus: fases de generación
+        de reportes (incluidos los procesos del pool), sentencias SQL por engine y estado de los pools.
+        """
+        return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
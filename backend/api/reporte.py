@@ -1,14 +1,112 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from utils.fecha import convertir_fecha
 import datetime
-from models.database import get_db
-from sqlalchemy.orm import Session
-from tasks.report_generator import ReportGenerator
+from models.database import AsyncSessionLocal, get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from tasks.report_executor import report_executor
+from tasks.job_queue import active_jobs_query, enqueue_jobs_query, finished_jobs_query, latest_reports_query
+from tasks.campaign_stats import ESTADISTICAS_MATERIALIZADAS
+from tasks.report_scheduler import costo_estimado, estimate_rows_query
+from tasks.report_cache import REPORT_CACHE, cached_reports_query, calcular_huellas, fingerprint_query, select_cached, touch_report
 from models.report_status import ReporteEstado
 from models.ta_sms_maestro import TaSmsMaestro
-from sqlalchemy import and_, text
+from sqlalchemy import select, text
+from utils.csv_export import EXPORTADORES
+from utils.metrics import registry
+from utils.report_formats import FORMATOS, MEDIA_TYPES, formato_de_ruta
+from utils.file_response import ReportFileResponse
+import anyio
 
 ROUTE_NAME = 'reporte'
+EXPORTADORES_PATTERN = f"^({'|'.join(EXPORTADORES)})$"
+FORMATOS_PATTERN = f"^({'|'.join(f.replace('.', '[.]') for f in FORMATOS)})$"
+
+# Recorridos de la generación: una consulta de detalles por campaña o una sola para toda la fecha
+RECORRIDOS_PATTERN = "^(campania|fecha)$"
+
+registry.counter("reportes_encolados_total", "Reportes de campaña encolados por /reporte/")
+registry.counter("reportes_cache_hits_total", "Reportes de campaña respondidos con un archivo ya generado")
+registry.counter("reportes_coalescidos_total", "Solicitudes de reporte unidas a un trabajo activo de la misma campaña")
+
+# Trabajos registrados por sentencia INSERT ... ON CONFLICT
+LOTE_REGISTRO = 1000
+
+# Campañas por consulta de estado masiva (?ids=)
+STATUS_MAX_IDS = 1000
+
+# Flujo de estados (SSE): cada cuánto se consulta la base, cada cuánto se envía un
+# comentario para mantener viva la conexión y duración máxima (el navegador reconecta solo)
+STATUS_STREAM_INTERVALO = float(os.getenv("STATUS_STREAM_INTERVALO", 1))
+STATUS_STREAM_HEARTBEAT = float(os.getenv("STATUS_STREAM_HEARTBEAT", 15))
+STATUS_STREAM_MAX_SEGUNDOS = float(os.getenv("STATUS_STREAM_MAX_SEGUNDOS", 300))
+
+ESTADOS_FINALES = ("COMPLETADO", "ERROR")
+
+
+def progreso_reporte(reporte: ReporteEstado) -> Optional[dict]:
+    """
+    Avance del reporte publicado por el worker (ver ProgressReporter en tasks/job_queue.py):
+    filas estimadas y escritas, bytes, filas/s, porcentaje y tiempo restante estimado.
+
+    El ETA son las filas restantes divididas por las filas por segundo del intento actual,
+    contado desde la última publicación del avance (timestamp de la fila, reloj de la base).
+    None si el trabajo aún no publica avance.
+    """
+    if reporte.filas_escritas is None:
+        return None
+
+    total, escritas, velocidad = reporte.filas_total, reporte.filas_escritas, reporte.filas_por_segundo
+    en_proceso = reporte.estado == "EN PROCESO"
+
+    porcentaje = None
+    if reporte.estado == "COMPLETADO":
+        porcentaje = 100.0
+    elif total:
+        # La estimación puede quedarse corta: el 100% solo se informa al completar
+        porcentaje = round(min(escritas / total, 0.999) * 100, 1)
+
+    eta_segundos = eta = None
+    if en_proceso and total and velocidad:
+        eta_segundos = round(max(total - escritas, 0) / velocidad, 1)
+        if reporte.timestamp is not None:
+            eta = reporte.timestamp + datetime.timedelta(seconds=eta_segundos)
+
+    return {
+        "filas_total": total,
+        "filas_escritas": escritas,
+        "bytes_escritos": reporte.bytes_escritos,
+        "filas_por_segundo": velocidad if en_proceso else None,
+        "porcentaje": porcentaje,
+        "eta_segundos": eta_segundos,
+        "eta": eta,
+        "actualizado": reporte.timestamp
+    }
+
+
+def estado_reporte(reporte: ReporteEstado) -> dict:
+    """Respuesta de estado de un reporte (consulta individual, masiva y flujo SSE)"""
+    completado = reporte.estado == "COMPLETADO"
+    return {
+        "id_campana": reporte.id_campana,
+        "id_reporte": reporte.id,
+        "estado": reporte.estado,
+        "fecha": reporte.fecha,
+        "formato": reporte.formato,
+        "ruta_archivo": reporte.ruta_archivo if completado else None,
+        "url_descarga": f"/{ROUTE_NAME}/download/{reporte.id}" if completado else None,
+        "progreso": progreso_reporte(reporte)
+    }
+
+
+def evento_sse(evento: str, datos) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, default=str)}\n\n"
 
 class ReporteService:
 
@@ -19,51 +117,44 @@ class ReporteService:
 
     def setup_routes(self):
         self.api_router.get('/')(self.reporte)
+        self.api_router.get('/status/')(self.get_reports_status)
+        self.api_router.get('/status/stream')(self.stream_reports_status)
         self.api_router.get('/status/{id_campana}')(self.get_report_status)
-
-    async def process_campaign_report(self, db: Session, campana_id: int, fecha: datetime.date):
-        """Procesa el reporte de una campaña específica en segundo plano"""
-        try:
-            # Actualizar estado a EN PROCESO
-            reporte_estado = db.query(ReporteEstado).filter(
-                and_(
-                    ReporteEstado.id_campana == campana_id,
-                    ReporteEstado.fecha == fecha
-                )
-            ).first()
-
-            if not reporte_estado:
-                return
-
-            reporte_estado.estado = "EN PROCESO"
-            db.commit()
-
-            # Generar reporte
-            report_generator = ReportGenerator(db)
-            file_path = report_generator.generate_by_campaign(campana_id)
-
-            # Actualizar estado a COMPLETADO
-            reporte_estado.estado = "COMPLETADO"
-            reporte_estado.ruta_archivo = file_path
-            db.commit()
-
-        except Exception as e:
-            # En caso de error, actualizar estado
-            if reporte_estado:
-                reporte_estado.estado = "ERROR"
-                db.commit()
-            print(f"Error procesando reporte para campaña {campana_id}: {str(e)}")
+        self.api_router.api_route('/download/{id_reporte}', methods=["GET", "HEAD"])(self.download_report)
 
     async def reporte(
         self,
         fecha: datetime.datetime = Depends(convertir_fecha),
-        background_tasks: BackgroundTasks = BackgroundTasks(),
-        db: Session = Depends(get_db)
+        exportador: str = Query("auto", pattern=EXPORTADORES_PATTERN, description="Motor de exportación: auto, copy o python"),
+        formato: str = Query("csv", pattern=FORMATOS_PATTERN, description="Formato del archivo: csv, csv.gz, csv.zst o parquet"),
+        usar_cache: bool = Query(True, description="Reutilizar los reportes de campañas cuyos datos no cambiaron"),
+        recorrido: str = Query(
+            "campania", pattern=RECORRIDOS_PATTERN,
+            description="campania: una consulta de detalles por campaña; fecha: un solo recorrido repartido por campaña"
+        ),
+        solicitante: Optional[str] = Query(
+            None, max_length=100,
+            description="Usuario o sistema que solicita; el planificador reparte turnos por solicitante (por defecto, por fecha)"
+        ),
+        db: AsyncSession = Depends(get_async_db)
     ):
-        """Genera reportes CSV para todas las campañas en una fecha específica"""
+        """
+        Genera reportes (CSV, CSV comprimido o Parquet) para todas las campañas en una fecha específica.
+
+        Las campañas cuyos datos no cambiaron desde un reporte anterior en el mismo formato
+        (misma huella, ver tasks/report_cache.py) se responden con ese archivo sin regenerarlo.
+        Las campañas con un trabajo pendiente o en proceso para la misma fecha y formato
+        (solicitudes concurrentes o repetidas) se unen a ese trabajo en lugar de encolar otro.
+
+        Con recorrido=fecha los trabajos nuevos se generan juntos con un solo recorrido de
+        TA_SMS_DETALLE (siempre con el exportador de Python).
+
+        Los trabajos nuevos pasan por el planificador de la API (ver tasks/report_scheduler.py):
+        primero las campañas con menos detalles, y turnos entre solicitantes o fechas.
+        """
         try:
             # Buscar campañas de la fecha
-            campanias = db.execute(
+            campanias = (await db.execute(
             text("""
                     SELECT * FROM get_campanias_by_fecha(:fecha, NULL, NULL);
                 """),
@@ -72,9 +163,7 @@ class ReporteService:
                 "page": None,
                 "page_size": None
                 }
-                ).fetchall()
-
-            print("generando reportes para:", len(campanias))
+                )).fetchall()
 
             if not campanias:
                 raise HTTPException(
@@ -82,40 +171,86 @@ class ReporteService:
                     detail=f"No se encontraron campañas para la fecha {fecha.date()}"
                 )
 
-            # Crear registros de estado para cada campaña
-            reportes_estado = []
-            for campana in campanias:
-                reporte_estado = ReporteEstado(
-                    id_campana=campana.id,
-                    fecha=fecha.date(),
-                    estado="PENDIENTE"
-                )
-                reportes_estado.append(reporte_estado)
+            # Campañas con un archivo vigente: se responden sin encolar un nuevo reporte
+            cached = {}
+            if REPORT_CACHE and usar_cache:
+                cached = await self.buscar_reportes_cached([c.id for c in campanias], formato, db)
+                for _, ruta_archivo in cached.values():
+                    await anyio.to_thread.run_sync(touch_report, ruta_archivo)
+                registry.inc("reportes_cache_hits_total", len(cached))
 
-            print("for done")
+            # Registrar un trabajo por campaña a generar
+            ids_campana = [c.id for c in campanias if c.id not in cached]
+            nuevos = await self.registrar_trabajos(ids_campana, fecha.date(), exportador, formato, db)
 
-            db.add_all(reportes_estado)
-            db.commit()
+            # Campañas que ya tenían un trabajo activo: se informa ese trabajo
+            unidos = {}
+            en_curso = [id_campana for id_campana in ids_campana if id_campana not in nuevos]
+            if en_curso:
+                unidos = {
+                    id_campana: (id_reporte, estado)
+                    for id_reporte, id_campana, estado in (await db.execute(
+                        active_jobs_query(en_curso, fecha.date(), formato)
+                    )).all()
+                }
+                registry.inc("reportes_coalescidos_total", len(en_curso))
 
-            print("commited all")
+            # Trabajos activos que terminaron entre el registro y la consulta: su último resultado
+            terminados = {}
+            sin_activo = [id_campana for id_campana in en_curso if id_campana not in unidos]
+            if sin_activo:
+                terminados = {
+                    id_campana: (id_reporte, estado)
+                    for id_reporte, id_campana, estado in (await db.execute(
+                        finished_jobs_query(sin_activo, fecha.date(), formato)
+                    )).all()
+                }
 
-            # Agregar tareas en segundo plano para cada campaña
-            for campana in campanias:
-                print("agregando tarea para:", campana.id)
-                background_tasks.add_task(
-                    self.process_campaign_report,
-                    db,
-                    campana.id,
-                    fecha.date()
+            # Los trabajos ya quedaron en la cola de reporte_estado; además se planifican
+            # en el pool de procesos de la API (no bloquea la API). Solo se envían los nuevos
+            filas = await self.estimar_filas(list(nuevos), db)
+            grupo = solicitante or fecha.date()
+            if recorrido == "fecha":
+                report_executor.submit_fecha(
+                    list(nuevos.values()), costo_estimado(sum(filas.values())), grupo
                 )
+            else:
+                report_executor.submit_lote(
+                    [(id_reporte, costo_estimado(filas.get(id_campana))) for id_campana, id_reporte in nuevos.items()],
+                    grupo
+                )
+
+            def estado_campania(id_campana: int) -> dict:
+                if id_campana in cached:
+                    id_reporte, _ = cached[id_campana]
+                    return {
+                        "estado": "COMPLETADO",
+                        "id_reporte": id_reporte,
+                        "url_descarga": f"/{ROUTE_NAME}/download/{id_reporte}"
+                    }
+                if id_campana in nuevos:
+                    return {"estado": "PENDIENTE", "id_reporte": nuevos[id_campana]}
+                if id_campana in unidos:
+                    id_reporte, estado = unidos[id_campana]
+                    return {"estado": estado, "id_reporte": id_reporte}
+                if id_campana in terminados:
+                    id_reporte, estado = terminados[id_campana]
+                    respuesta = {"estado": estado, "id_reporte": id_reporte}
+                    if estado == "COMPLETADO":
+                        respuesta["url_descarga"] = f"/{ROUTE_NAME}/download/{id_reporte}"
+                    return respuesta
+                return {"estado": "PENDIENTE"}
 
             return {
-                "mensaje": f"Generación de reportes iniciada para {len(campanias)} campañas",
+                "mensaje": (
+                    f"Generación de reportes iniciada para {len(nuevos)} campañas "
+                    f"({len(en_curso)} ya en curso, {len(cached)} sin cambios)"
+                ),
                 "campanias": [
                     {
                         "id": c.id,
                         "nombre": c.nombre,
-                        "estado": "PENDIENTE"
+                        **estado_campania(c.id)
                     } for c in campanias
                 ]
             }
@@ -125,11 +260,67 @@ class ReporteService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_report_status(self, id_campana: int, db: Session = Depends(get_db)):
+    async def registrar_trabajos(
+        self,
+        ids_campana: list[int],
+        fecha: datetime.date,
+        exportador: str,
+        formato: str,
+        db: AsyncSession
+    ) -> dict[int, int]:
+        """
+        Registra los trabajos PENDIENTE con INSERT ... ON CONFLICT DO NOTHING por lotes.
+        El índice único de trabajos activos garantiza que dos solicitudes concurrentes no
+        encolen la misma campaña dos veces.
+
+        Retorna {id_campana: id_reporte} de los trabajos insertados por esta solicitud.
+        """
+        nuevos = {}
+        dialect_name = db.get_bind().dialect.name
+        for inicio in range(0, len(ids_campana), LOTE_REGISTRO):
+            jobs = [
+                {"id_campana": id_campana, "fecha": fecha, "exportador": exportador, "formato": formato}
+                for id_campana in ids_campana[inicio:inicio + LOTE_REGISTRO]
+            ]
+            for id_reporte, id_campana in (await db.execute(enqueue_jobs_query(dialect_name, jobs))).all():
+                nuevos[id_campana] = id_reporte
+
+        await db.commit()
+        registry.inc("reportes_encolados_total", len(nuevos))
+        return nuevos
+
+    async def estimar_filas(self, ids_campana: list[int], db: AsyncSession) -> dict[int, int]:
+        """
+        Detalles por campaña según campania_estadistica, para estimar el costo de cada trabajo.
+        Sin estadísticas materializadas no se estima (contarlos costaría tanto como exportarlos)
+        y el planificador las ordena por llegada.
+        """
+        if not ids_campana or not ESTADISTICAS_MATERIALIZADAS:
+            return {}
+
+        filas = {}
+        for inicio in range(0, len(ids_campana), LOTE_REGISTRO):
+            lote = ids_campana[inicio:inicio + LOTE_REGISTRO]
+            filas.update((await db.execute(estimate_rows_query(lote))).all())
+        return filas
+
+    async def buscar_reportes_cached(
+        self, ids_campana: list[int], formato: str, db: AsyncSession
+    ) -> dict[int, tuple[int, str]]:
+        """
+        Reportes ya generados (misma huella de datos y formato) por campaña, en dos consultas:
+        {id_campana: (id_reporte, ruta_archivo)}
+        """
+        huellas = calcular_huellas((await db.execute(fingerprint_query(ids_campana))).all())
+        if not huellas:
+            return {}
+
+        rows = (await db.execute(cached_reports_query(huellas, formato))).all()
+        return await anyio.to_thread.run_sync(select_cached, rows, huellas)
+
+    async def get_report_status(self, id_campana: int, db: AsyncSession = Depends(get_async_db)):
         """Obtiene el estado actual del reporte de una campaña"""
-        reporte = db.query(ReporteEstado).filter(
-            ReporteEstado.id_campana == id_campana
-        ).order_by(ReporteEstado.timestamp.desc()).first()
+        reporte = (await db.execute(latest_reports_query([id_campana]))).scalar_one_or_none()
 
         if not reporte:
             raise HTTPException(
@@ -137,9 +328,125 @@ class ReporteService:
                 detail=f"No se encontró reporte para la campaña {id_campana}"
             )
 
+        return estado_reporte(reporte)
+
+    def _filtro_estados(self, fecha: Optional[str], ids: Optional[list[int]]) -> dict:
+        """Valida los parámetros de la consulta masiva: fecha (YYYY/MM/DD), ids o ambos"""
+        if fecha is None and not ids:
+            raise HTTPException(status_code=400, detail="Indique la fecha o los ids de campaña")
+        if ids and len(ids) > STATUS_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"Se admiten hasta {STATUS_MAX_IDS} ids por consulta")
         return {
-            "id_campana": reporte.id_campana,
-            "estado": reporte.estado,
-            "fecha": reporte.fecha,
-            "ruta_archivo": reporte.ruta_archivo if reporte.estado == "COMPLETADO" else None
-        }
\ No newline at end of file
+            "ids_campana": ids or None,
+            "fecha": convertir_fecha(fecha).date() if fecha is not None else None
+        }
+
+    async def get_reports_status(
+        self,
+        fecha: Optional[str] = Query(None, description="Campañas de la fecha (YYYY/MM/DD)"),
+        ids: Optional[list[int]] = Query(None, description="Ids de campaña (?ids=1&ids=2)"),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """
+        Último estado del reporte de varias campañas en una sola consulta: todas las campañas
+        de una fecha o una lista de ids. Las campañas sin reportes no aparecen en la respuesta.
+        """
+        filtro = self._filtro_estados(fecha, ids)
+        reportes = (await db.execute(latest_reports_query(**filtro))).scalars().all()
+        return {"reportes": [estado_reporte(reporte) for reporte in reportes]}
+
+    async def stream_reports_status(
+        self,
+        request: Request,
+        fecha: Optional[str] = Query(None, description="Campañas de la fecha (YYYY/MM/DD)"),
+        ids: Optional[list[int]] = Query(None, description="Ids de campaña (?ids=1&ids=2)")
+    ):
+        """
+        Flujo server-sent events con los cambios de estado de los reportes (mismos filtros que
+        /status/). El primer evento 'estado' de cada campaña es su estado actual; después solo se
+        envían los cambios. Con todos los reportes terminados (con ids, cuando cada campaña pedida
+        tiene un reporte terminado) se envía 'fin' y se cierra el flujo.
+        """
+        filtro = self._filtro_estados(fecha, ids)
+        return StreamingResponse(
+            self._eventos_estado(request, filtro),
+            media_type="text/event-stream",
+            headers={"cache-control": "no-cache", "x-accel-buffering": "no"}
+        )
+
+    @staticmethod
+    def _estados_terminados(filtro: dict, reportes: list[ReporteEstado]) -> bool:
+        """
+        Con ids, cada campaña pedida debe tener su último reporte terminado: una campaña sin
+        reporte todavía (trabajo aún no registrado) no cierra el flujo. Por fecha, los reportes
+        encontrados deben estar terminados.
+        """
+        terminadas = {reporte.id_campana for reporte in reportes if reporte.estado in ESTADOS_FINALES}
+        if filtro["ids_campana"]:
+            return terminadas.issuperset(filtro["ids_campana"])
+        return bool(reportes) and len(terminadas) == len(reportes)
+
+    async def _eventos_estado(self, request: Request, filtro: dict):
+        enviados: dict[int, tuple] = {}
+        inicio = ultimo_envio = time.monotonic()
+
+        while time.monotonic() - inicio < STATUS_STREAM_MAX_SEGUNDOS:
+            if await request.is_disconnected():
+                return
+
+            # Una sesión por consulta: la conexión vuelve al pool entre consultas
+            async with AsyncSessionLocal() as db:
+                reportes = (await db.execute(latest_reports_query(**filtro))).scalars().all()
+
+            for reporte in reportes:
+                version = (reporte.id, reporte.estado, reporte.timestamp)
+                if enviados.get(reporte.id_campana) != version:
+                    enviados[reporte.id_campana] = version
+                    ultimo_envio = time.monotonic()
+                    yield evento_sse("estado", estado_reporte(reporte))
+
+            if self._estados_terminados(filtro, reportes):
+                yield evento_sse("fin", {"reportes": len(reportes)})
+                return
+
+            if time.monotonic() - ultimo_envio >= STATUS_STREAM_HEARTBEAT:
+                ultimo_envio = time.monotonic()
+                yield ": ping\n\n"
+
+            await asyncio.sleep(STATUS_STREAM_INTERVALO)
+
+    async def download_report(self, id_reporte: int, db: AsyncSession = Depends(get_async_db)):
+        """
+        Descarga el archivo de un reporte completado (id de reporte_estado, el id_reporte o la
+        url_descarga de las respuestas de estado). Cada reporte es un archivo de una campaña,
+        fecha y formato, así que se descarga exactamente el archivo informado.
+
+        Admite Range (descargas reanudables) e If-None-Match: si el cliente ya tiene el archivo
+        (mismo ETag) se responde 304 sin cuerpo.
+        """
+        ruta_archivo = (await db.execute(
+            select(ReporteEstado.ruta_archivo)
+            .where(ReporteEstado.id == id_reporte, ReporteEstado.estado == "COMPLETADO")
+        )).scalar_one_or_none()
+
+        if not ruta_archivo:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No se encontró el reporte completado {id_reporte}"
+            )
+
+        ruta = Path(ruta_archivo)
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, ruta)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=410,
+                detail=f"El archivo del reporte {id_reporte} ya no existe"
+            )
+
+        return ReportFileResponse(
+            ruta,
+            stat_result=stat_result,
+            filename=ruta.name,
+            media_type=MEDIA_TYPES[formato_de_ruta(ruta_archivo)]
+        )
\ No newline at end of file
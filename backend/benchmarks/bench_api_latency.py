@@ -0,0 +1,82 @@
+"""
+Prueba de carga de endpoints de la API: clientes concurrentes durante un tiempo fijo,
+reportando requests/s y latencias p50/p99.
+
+Se pueden indicar varios servidores para compararlos en la misma ejecución, por ejemplo
+la versión con sesiones bloqueantes (levantada desde un commit anterior en el puerto 8081)
+frente a la versión asíncrona (puerto 8080):
+
+    python -m benchmarks.bench_api_latency --clientes 50 --duracion 20 \\
+        --servidor bloqueante=http://localhost:8081 --servidor async=http://localhost:8080 \\
+        --ruta "/campania/list/?fecha=2025/01/15&page=1&page_size=10" --ruta /campania/fechas
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from tasks.report_scheduler import percentil
+
+
+async def _cliente(client: httpx.AsyncClient, rutas: list[str], fin: float, latencias: list[float], errores: list[int]):
+    i = 0
+    while time.perf_counter() < fin:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            respuesta = await client.get(ruta)
+            if respuesta.status_code >= 500:
+                errores.append(respuesta.status_code)
+        except httpx.HTTPError:
+            errores.append(0)
+        latencias.append(time.perf_counter() - inicio)
+
+
+async def medir(base_url: str, rutas: list[str], clientes: int, duracion: float, transport=None) -> dict:
+    """
+    Ejecuta la carga contra un servidor y retorna sus métricas.
+    Con transport (por ejemplo httpx.ASGITransport) la carga se envía a una app en el mismo proceso.
+    """
+    latencias: list[float] = []
+    errores: list[int] = []
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=60, transport=transport) as client:
+        inicio = time.perf_counter()
+        fin = inicio + duracion
+        await asyncio.gather(*(_cliente(client, rutas, fin, latencias, errores) for _ in range(clientes)))
+        transcurrido = time.perf_counter() - inicio
+
+    return {
+        "requests": len(latencias),
+        "errores": len(errores),
+        "rps": len(latencias) / transcurrido,
+        "p50_ms": (percentil(latencias, 50) or 0.0) * 1000,
+        "p99_ms": (percentil(latencias, 99) or 0.0) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servidor", action="append", default=None,
+                        help="nombre=url del servidor a medir (repetible). Por defecto api=http://localhost:8080")
+    parser.add_argument("--ruta", action="append", default=None,
+                        help="Ruta a solicitar (repetible, se alternan). Por defecto /campania/fechas")
+    parser.add_argument("--clientes", type=int, default=50, help="Clientes concurrentes")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos de carga por servidor")
+    args = parser.parse_args()
+
+    servidores = [s.split("=", 1) for s in (args.servidor or ["api=http://localhost:8080"])]
+    rutas = args.ruta or ["/campania/fechas"]
+
+    print(f"{args.clientes} clientes, {args.duracion:.0f}s por servidor, rutas: {', '.join(rutas)}")
+    print(f"{'servidor':<14} {'requests':>9} {'errores':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for nombre, url in servidores:
+        r = asyncio.run(medir(url, rutas, args.clientes, args.duracion))
+        print(f"{nombre:<14} {r['requests']:>9} {r['errores']:>8} {r['rps']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
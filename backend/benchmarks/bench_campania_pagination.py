@@ -0,0 +1,78 @@
+"""
+Compara la latencia por página del listado de campañas de una fecha con paginación
+LIMIT/OFFSET (la que usa get_campanias_by_fecha) frente a paginación keyset por id.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_campania_pagination --campanias 1000000 --paginas 1 100 1000 10000
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import FECHA_BENCHMARK, crear_engine_benchmark
+from models.ta_sms_maestro import TaSmsMaestro
+
+
+def sembrar_campanias(engine, total: int, fecha: date, lote: int = 50_000):
+    """Inserta campañas mínimas para la fecha (solo importa el volumen)"""
+    with engine.begin() as conn:
+        for inicio in range(0, total, lote):
+            conn.execute(insert(TaSmsMaestro), [
+                {"fecha": fecha, "nombre": f"Campaña {i}", "estado": "COMPLETADO"}
+                for i in range(inicio, min(total, inicio + lote))
+            ])
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Mejor tiempo (ms) de varias ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = (time.perf_counter() - inicio) * 1000
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campanias", type=int, default=200_000, help="Campañas de la fecha")
+    parser.add_argument("--page-size", type=int, default=10, help="Tamaño de página")
+    parser.add_argument("--paginas", type=int, nargs="+", default=[1, 100, 1000, 10000], help="Páginas a medir")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Ejecuciones por medición (se toma la mejor)")
+    parser.add_argument("--url", default=None, help="URL de base de datos (por defecto SQLite temporal)")
+    args = parser.parse_args()
+
+    engine = crear_engine_benchmark(args.url)
+    sembrar_campanias(engine, args.campanias, FECHA_BENCHMARK)
+    SessionLocal = sessionmaker(bind=engine)
+    base = select(TaSmsMaestro).where(TaSmsMaestro.fecha == FECHA_BENCHMARK).order_by(TaSmsMaestro.id)
+
+    print(f"Motor: {engine.dialect.name} | {args.campanias} campañas | page_size={args.page_size}")
+    print(f"{'página':>8} {'offset ms':>10} {'keyset ms':>10}")
+
+    with SessionLocal() as db:
+        for pagina in args.paginas:
+            offset = (pagina - 1) * args.page_size
+            if offset >= args.campanias:
+                continue
+
+            def por_offset():
+                # Equivalente a get_campanias_by_fecha: COUNT(*) + LIMIT/OFFSET en cada página
+                db.execute(select(func.count()).select_from(TaSmsMaestro).where(TaSmsMaestro.fecha == FECHA_BENCHMARK)).scalar_one()
+                db.execute(base.limit(args.page_size).offset(offset)).scalars().all()
+
+            # El cursor de la página es el último id de la página anterior
+            ultimo_id = db.execute(base.with_only_columns(TaSmsMaestro.id).limit(1).offset(offset - 1)).scalar() if offset else 0
+
+            def por_keyset():
+                db.execute(base.where(TaSmsMaestro.id > ultimo_id).limit(args.page_size + 1)).scalars().all()
+
+            print(f"{pagina:>8} {medir(por_offset, args.repeticiones):>10.2f} {medir(por_keyset, args.repeticiones):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
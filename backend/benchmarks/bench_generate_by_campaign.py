@@ -0,0 +1,92 @@
+"""
+Mide el RSS pico al exportar el detalle de una campaña grande: lectura completa con .all()
+(implementación anterior) frente al cursor del servidor con escritura por lotes.
+
+Cada medición corre en un proceso nuevo para que el RSS pico no se contamine entre modos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_generate_by_campaign --detalles 250000 1000000
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import crear_engine_sqlite, rss_pico_mb, sembrar, sembrar_detalles_masivo
+from models.ta_sms_detalle import TaSmsDetalle
+from models.ta_sms_maestro import TaSmsMaestro
+from tasks.report_generator import ReportGenerator
+
+
+def generate_by_campaign_anterior(db, campaign_id, filepath):
+    """Implementación previa: materializa todas las entidades antes de escribir"""
+    campaign = db.query(TaSmsMaestro).filter(TaSmsMaestro.id == campaign_id).first()
+    details = db.query(TaSmsDetalle).filter(TaSmsDetalle.id_maestro == campaign_id).all()
+
+    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["ID Campaña", "Nombre Campaña", "Fecha Campaña", "Mensaje", "Estado Mensaje"])
+        for detail in details:
+            writer.writerow([
+                campaign.id,
+                campaign.nombre,
+                campaign.fecha.strftime("%Y-%m-%d"),
+                detail.mensaje,
+                detail.estado
+            ])
+
+    return filepath
+
+
+def _medir(modo, ruta_db, campaign_id, tmp, cola):
+    """Ejecuta una exportación en un proceso limpio y reporta el RSS pico"""
+    from sqlalchemy import create_engine
+
+    SessionLocal = sessionmaker(bind=create_engine(f"sqlite:///{ruta_db}"))
+    base = rss_pico_mb()
+    inicio = time.perf_counter()
+
+    with SessionLocal() as db:
+        if modo == "anterior":
+            generate_by_campaign_anterior(db, campaign_id, os.path.join(tmp, "anterior.csv"))
+        else:
+            generator = ReportGenerator(db)
+            generator.reports_dir = Path(tmp)
+            generator.generate_by_campaign(campaign_id)
+
+    cola.put((base, rss_pico_mb(), time.perf_counter() - inicio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detalles", type=int, nargs="+", default=[250_000, 1_000_000],
+                        help="Tamaños de campaña a medir")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'detalles':>10} {'modo':<10} {'RSS base (MB)':>14} {'RSS pico (MB)':>14} {'segundos':>10}")
+
+    for num_detalles in args.detalles:
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta_db = os.path.join(tmp, "bench.db")
+            engine = crear_engine_sqlite(ruta_db)
+            campaign_id = sembrar(engine, 1, 0)[0]
+            sembrar_detalles_masivo(engine, campaign_id, num_detalles)
+            engine.dispose()
+
+            for modo in ("anterior", "streaming"):
+                cola = ctx.Queue()
+                proceso = ctx.Process(target=_medir, args=(modo, ruta_db, campaign_id, tmp, cola))
+                proceso.start()
+                base, pico, segundos = cola.get()
+                proceso.join()
+                print(f"{num_detalles:>10} {modo:<10} {base:>14.1f} {pico:>14.1f} {segundos:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
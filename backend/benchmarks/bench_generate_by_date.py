@@ -0,0 +1,92 @@
+"""
+Compara el reporte resumen por fecha: cuatro count() por campaña (implementación anterior),
+un único GROUP BY sobre TA_SMS_DETALLE y la lectura de la tabla campania_estadistica.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_generate_by_date --maestros 500 --detalles 50
+"""
+import argparse
+import csv
+import os
+import tempfile
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import FECHA_BENCHMARK, ContadorConsultas, crear_engine_sqlite, cronometro, sembrar
+from models.ta_sms_detalle import TaSmsDetalle
+from models.ta_sms_maestro import TaSmsMaestro
+from tasks.campaign_stats import refresh_stats_by_date
+from tasks.report_generator import ReportGenerator
+
+
+def generate_by_date_anterior(db, fecha, filepath):
+    """Implementación previa: cuatro count() por campaña"""
+    campaigns = db.query(TaSmsMaestro).filter(TaSmsMaestro.fecha == fecha).all()
+
+    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([
+            "ID Campaña", "Nombre Campaña", "Estado Campaña",
+            "Total Mensajes", "Enviados", "Pendientes", "Fallidos"
+        ])
+
+        for campaign in campaigns:
+            details = db.query(TaSmsDetalle).filter(TaSmsDetalle.id_maestro == campaign.id)
+            writer.writerow([
+                campaign.id,
+                campaign.nombre,
+                campaign.estado,
+                details.count(),
+                details.filter(TaSmsDetalle.estado == 'ENVIADO').count(),
+                details.filter(TaSmsDetalle.estado == 'PENDIENTE').count(),
+                details.filter(TaSmsDetalle.estado == 'FALLIDO').count()
+            ])
+
+    return filepath
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maestros", type=int, default=500, help="Número de campañas de la fecha")
+    parser.add_argument("--detalles", type=int, default=50, help="Detalles por campaña")
+    args = parser.parse_args()
+
+    engine = crear_engine_sqlite()
+    sembrar(engine, args.maestros, args.detalles)
+    SessionLocal = sessionmaker(bind=engine)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes
+        with SessionLocal() as db, ContadorConsultas(engine) as contador:
+            with cronometro(resultados, "anterior"):
+                anterior = generate_by_date_anterior(db, FECHA_BENCHMARK, os.path.join(tmp, "anterior.csv"))
+        consultas = {"anterior": contador.total}
+        iguales = {}
+
+        # Después: un único GROUP BY sobre TA_SMS_DETALLE, y lectura de campania_estadistica
+        for modo, materializadas in (("agregado", False), ("materializada", True)):
+            with SessionLocal() as db:
+                if materializadas:
+                    refresh_stats_by_date(db, FECHA_BENCHMARK)
+
+                with ContadorConsultas(engine) as contador:
+                    generator = ReportGenerator(db)
+                    generator.reports_dir = Path(tmp)
+                    generator.stats_materializadas = materializadas
+                    with cronometro(resultados, modo):
+                        ruta = generator.generate_by_date(FECHA_BENCHMARK)
+                consultas[modo] = contador.total
+
+            with open(anterior, encoding='utf-8') as a, open(ruta, encoding='utf-8') as b:
+                iguales[modo] = a.read() == b.read()
+
+    print(f"Dataset: {args.maestros} campañas x {args.detalles} detalles")
+    print(f"{'modo':<14} {'consultas':>10} {'segundos':>10} {'speedup':>8} {'CSV idéntico':>13}")
+    for modo in ("anterior", "agregado", "materializada"):
+        speedup = resultados["anterior"] / resultados[modo]
+        print(f"{modo:<14} {consultas[modo]:>10} {resultados[modo]:>10.3f} {speedup:>7.1f}x {str(iguales.get(modo, '-')):>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Simula con un reloj simulado el planificador de reportes de la API (tasks/report_scheduler.py)
+y compara el tiempo de finalización (desde que se planifica hasta que termina) de los trabajos
+con tres políticas:
+
+- llegada: orden de llegada (id de campaña), como el pool sin planificador.
+- sjf: primero el más corto, sin envejecimiento ni turnos.
+- sjf+turnos: el más corto con envejecimiento y turnos entre fechas (la política de la API).
+
+La carga reproduce el caso de una campaña gigante al frente de cientos de campañas pequeñas,
+más solicitudes posteriores de otras fechas y un flujo de solicitudes pequeñas para la misma
+fecha de la gigante: sin envejecimiento (e=0) la adelantan mientras dure el flujo. La duración
+real de cada trabajo es su costo estimado con un error aleatorio, así que la estimación no es
+perfecta. No usa base de datos y con la misma semilla el resultado es idéntico.
+
+tests/test_report_scheduler.py verifica el orden, el envejecimiento y los turnos con un reloj falso.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_scheduler --workers 4 --pequenas 500 --gigante 20000000
+    python -m benchmarks.bench_scheduler --envejecimiento 0 0.5 1 4 --flujo 200 --semilla 7
+"""
+import argparse
+import heapq
+import random
+
+from tasks.report_scheduler import PlanificadorReportes, costo_estimado
+
+
+class RelojSimulado:
+    """Reloj del planificador que solo avanza cuando la simulación lo indica"""
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self) -> float:
+        return self.ahora
+
+
+def generar_carga(args) -> list[tuple[float, str, int]]:
+    """Trabajos (llegada, fecha, filas) ordenados por llegada y, en cada solicitud, por id de campaña"""
+    rng = random.Random(args.semilla)
+    carga = [(0.0, "fecha_1", args.gigante)]
+    carga += [(0.0, "fecha_1", rng.randint(1_000, 50_000)) for _ in range(args.pequenas)]
+    # Otras fechas solicitadas mientras se genera la primera
+    for numero in range(2, args.fechas + 1):
+        llegada = (numero - 1) * args.separacion
+        carga += [(llegada, f"fecha_{numero}", rng.randint(1_000, 200_000)) for _ in range(args.pequenas // 2)]
+    # Flujo de solicitudes pequeñas para la fecha de la gigante (otros usuarios, reintentos)
+    for numero in range(1, args.flujo + 1):
+        carga += [(numero * args.separacion, "fecha_1", rng.randint(1_000, 50_000)) for _ in range(20)]
+    return sorted(carga, key=lambda trabajo: trabajo[0])
+
+
+def simular(carga: list[tuple[float, str, int]], workers: int, error: float, semilla: int, **politica) -> dict:
+    """Simulación de eventos discretos: llegadas y fines de trabajo en max workers procesos"""
+    rng = random.Random(semilla)
+    reloj = RelojSimulado()
+    planificador = PlanificadorReportes(reloj=reloj, ventana=len(carga), **politica)
+
+    duraciones = {
+        clave: costo_estimado(filas) * rng.uniform(1 - error, 1 + error)
+        for clave, (_, _, filas) in enumerate(carga)
+    }
+    grupos = {clave: fecha for clave, (_, fecha, _) in enumerate(carga)}
+    tiempos_grupo: dict[str, list[float]] = {}
+    tiempo_gigante = None
+
+    en_curso: list[tuple[float, int]] = []
+    siguiente_llegada = 0
+    while siguiente_llegada < len(carga) or en_curso:
+        proximo_fin = en_curso[0][0] if en_curso else float("inf")
+        if siguiente_llegada < len(carga) and carga[siguiente_llegada][0] <= proximo_fin:
+            # Una solicitud llega completa: todos sus trabajos se agregan antes de despachar
+            reloj.ahora, fecha = carga[siguiente_llegada][:2]
+            lote = []
+            while siguiente_llegada < len(carga) and carga[siguiente_llegada][:2] == (reloj.ahora, fecha):
+                lote.append((siguiente_llegada, costo_estimado(carga[siguiente_llegada][2])))
+                siguiente_llegada += 1
+            planificador.agregar_lote(lote, fecha)
+        else:
+            reloj.ahora, clave = heapq.heappop(en_curso)
+            tiempo = planificador.terminar(clave)
+            tiempos_grupo.setdefault(grupos[clave], []).append(tiempo)
+            if clave == 0:
+                tiempo_gigante = tiempo
+
+        while len(en_curso) < workers:
+            trabajo = planificador.siguiente()
+            if trabajo is None:
+                break
+            heapq.heappush(en_curso, (reloj.ahora + duraciones[trabajo.clave], trabajo.clave))
+
+    todos = [tiempo for tiempos in tiempos_grupo.values() for tiempo in tiempos]
+    return {
+        **planificador.resumen(),
+        "maximo_segundos": max(todos),
+        "gigante_segundos": tiempo_gigante,
+        "media_por_fecha": {fecha: sum(t) / len(t) for fecha, t in sorted(tiempos_grupo.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Procesos que generan reportes")
+    parser.add_argument("--gigante", type=int, default=20_000_000, help="Detalles de la campaña gigante (la primera por id)")
+    parser.add_argument("--pequenas", type=int, default=500, help="Campañas pequeñas de la primera fecha (la mitad en las demás)")
+    parser.add_argument("--fechas", type=int, default=3, help="Fechas solicitadas")
+    parser.add_argument("--separacion", type=float, default=5.0, help="Segundos entre las solicitudes de cada fecha")
+    parser.add_argument("--flujo", type=int, default=100, help="Solicitudes de 20 campañas pequeñas para la primera fecha, una cada --separacion segundos")
+    parser.add_argument("--error", type=float, default=0.5, help="Error relativo de la estimación de costo (0.5 = ±50%%)")
+    parser.add_argument("--envejecimiento", type=float, nargs="+", default=[0.0, 1.0], help="Envejecimiento de sjf+turnos a medir")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla de la carga y de los errores de estimación")
+    args = parser.parse_args()
+
+    carga = generar_carga(args)
+    politicas = [
+        ("llegada", {"por_costo": False, "por_grupo": False}),
+        ("sjf", {"envejecimiento": 0.0, "por_grupo": False}),
+        *[(f"sjf+turnos e={e:g}", {"envejecimiento": e}) for e in args.envejecimiento]
+    ]
+
+    print(f"{len(carga)} trabajos | {args.workers} workers | {args.fechas} fechas | error ±{args.error:.0%}")
+    print(f"{'política':<18} {'media s':>9} {'p95 s':>9} {'máximo s':>9} {'gigante s':>10}  media por fecha (s)")
+    for nombre, politica in politicas:
+        r = simular(carga, args.workers, args.error, args.semilla, **politica)
+        por_fecha = "  ".join(f"{fecha}={media:.1f}" for fecha, media in r["media_por_fecha"].items())
+        print(f"{nombre:<18} {r['media_segundos']:>9.1f} {r['p95_segundos']:>9.1f} {r['maximo_segundos']:>9.1f} "
+              f"{r['gigante_segundos']:>10.1f}  {por_fecha}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base
+from models.ta_sms_maestro import TaSmsMaestro
+from models.ta_sms_detalle import TaSmsDetalle
+from models.report_status import ReporteEstado
+from models.campania_estadistica import CampaniaEstadistica
+from seeder.generate_maestro import generar_registros
+from seeder.generate_details import generar_detalles
+from seeder.bulk_copy import generar_lote_detalles
+
+FECHA_BENCHMARK = date(2025, 1, 15)
+
+
+def crear_engine_sqlite(ruta: str | None = None):
+    """
+    Crea un engine SQLite en un archivo temporal con el esquema del proyecto.
+    Sirve como sustituto local de PostgreSQL para los benchmarks.
+    """
+    if ruta is None:
+        fd, ruta = tempfile.mkstemp(prefix="bench_", suffix=".db")
+        os.close(fd)
+
+    engine = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def crear_engine_benchmark(url: str | None = None):
+    """
+    Crea el engine del benchmark: la URL indicada (por ejemplo un PostgreSQL local)
+    o, si no se indica, un SQLite temporal.
+    """
+    if url is None:
+        return crear_engine_sqlite()
+
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def sembrar(engine, num_maestros: int, detalles_por_maestro: int, fecha: date = FECHA_BENCHMARK, semilla: int = 42) -> list[int]:
+    """
+    Siembra campañas y detalles con los generadores de seeder/ y retorna los ids de las campañas.
+    """
+    random.seed(semilla)
+    SessionLocal = sessionmaker(bind=engine)
+
+    with SessionLocal() as db:
+        registros = generar_registros(num_maestros, fecha)
+        db.add_all(registros)
+        db.commit()
+
+        ids = [registro.id for registro in registros]
+        for id_maestro in ids:
+            db.add_all(generar_detalles(id_maestro, detalles_por_maestro, fecha))
+        db.commit()
+
+    return ids
+
+
+def sembrar_detalles_masivo(
+    engine, id_maestro: int, num_detalles: int, lote: int = 50_000, semilla: int = 42, fecha: date = FECHA_BENCHMARK
+):
+    """
+    Inserta muchos detalles para una campaña sin pasar por objetos ORM ni Pydantic,
+    con el generador por lotes del seeder masivo (seeder/bulk_copy.py).
+    Se usa para datasets de millones de filas donde generar_detalles sería demasiado lento.
+    """
+    rnd = random.Random(semilla)
+    with engine.begin() as conn:
+        for inicio in range(0, num_detalles, lote):
+            filas = generar_lote_detalles(rnd, id_maestro, min(lote, num_detalles - inicio), fecha)
+            conn.execute(
+                insert(TaSmsDetalle),
+                [{"id_maestro": i, "fecha": f, "mensaje": m, "estado": e} for i, f, m, e in filas]
+            )
+
+
+def rss_pico_mb() -> float:
+    """RSS máximo alcanzado por el proceso actual, en MB"""
+    import resource
+    import sys
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS reporta bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+class ContadorConsultas:
+    """
+    Cuenta las sentencias SQL ejecutadas por un engine mediante eventos de SQLAlchemy.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def cronometro(resultado: dict, clave: str = "segundos"):
+    """Mide el tiempo de pared del bloque y lo guarda en resultado[clave]"""
+    inicio = time.perf_counter()
+    try:
+        yield resultado
+    finally:
+        resultado[clave] = time.perf_counter() - inicio
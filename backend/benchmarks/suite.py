@@ -0,0 +1,310 @@
+"""
+Suite de benchmarks del pipeline de reportes sobre datasets sintéticos de varios tamaños
+(campañas x detalles por campaña), sembrados con los generadores de seeder/.
+
+Para cada tamaño mide:
+- generate_by_campaign: filas/s, RSS pico y consultas al exportar la campaña
+- generate_by_date: segundos, RSS pico y consultas del reporte resumen
+- procesar_reportes: filas/s, RSS pico y consultas del ReportService del middleware
+- campania_list: latencias p50/p99 y requests/s de /campania/list/ (paginación keyset)
+
+Cada caso corre en un proceso nuevo para que el RSS pico no se contamine entre casos.
+Los resultados se guardan en JSON y pueden compararse contra una ejecución anterior:
+la suite termina con código 1 si alguna métrica empeora más que la tolerancia.
+
+Uso (desde backend/):
+    python -m benchmarks.suite --tamanos 10x1000 100x1000 --salida base.json
+    python -m benchmarks.suite --tamanos 10x1000 100x1000 --salida actual.json --comparar base.json
+
+Con --url se mide contra un PostgreSQL local. La base debe ser exclusiva para benchmarks:
+sus tablas se vacían antes de sembrar cada tamaño.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import (
+    FECHA_BENCHMARK, ContadorConsultas, crear_engine_benchmark, crear_engine_sqlite,
+    cronometro, rss_pico_mb, sembrar, sembrar_detalles_masivo
+)
+from models.database import Base
+from tasks.campaign_stats import refresh_stats_by_date
+
+CASOS = ("generate_by_campaign", "generate_by_date", "procesar_reportes", "campania_list")
+
+# Sentido de cada métrica para la comparación: True si un valor mayor es mejor
+METRICAS = {
+    "filas_s": True,
+    "rps": True,
+    "segundos": False,
+    "rss_pico_mb": False,
+    "consultas": False,
+    "p50_ms": False,
+    "p99_ms": False
+}
+
+MIDDLEWARE_DIR = Path(__file__).resolve().parents[2] / "middleware"
+
+
+def parse_tamano(valor: str) -> tuple[int, int]:
+    """Convierte 'CAMPAÑASxDETALLES' (por ejemplo 100x1000) en una tupla"""
+    try:
+        campanias, detalles = (int(parte) for parte in valor.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Tamaño inválido '{valor}', se espera CAMPAÑASxDETALLES (ej. 100x1000)")
+    return campanias, detalles
+
+
+def url_async(url: str) -> str:
+    """URL equivalente con driver asíncrono (asyncpg o aiosqlite) para la API"""
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1).replace("+psycopg2", "")
+
+
+def preparar_dataset(url: str | None, campanias: int, detalles: int, semilla: int) -> tuple[str, list[int]]:
+    """
+    Crea (o vacía) la base, siembra el dataset y refresca campania_estadistica.
+    Retorna la URL de la base sembrada y los ids de las campañas.
+    """
+    if url is None:
+        fd, ruta = tempfile.mkstemp(prefix="suite_", suffix=".db")
+        os.close(fd)
+        engine = crear_engine_sqlite(ruta)
+        url = f"sqlite:///{ruta}"
+    else:
+        engine = crear_engine_benchmark(url)
+        tablas = ", ".join(f'"{tabla.name}"' for tabla in Base.metadata.sorted_tables)
+        with engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {tablas} RESTART IDENTITY CASCADE"))
+
+    # Campañas con los generadores del seeder; detalles con el generador por lotes
+    ids = sembrar(engine, campanias, 0, FECHA_BENCHMARK, semilla)
+    for posicion, id_maestro in enumerate(ids):
+        sembrar_detalles_masivo(engine, id_maestro, detalles, semilla=semilla * 1_000_003 + posicion)
+
+    with sessionmaker(bind=engine)() as db:
+        refresh_stats_by_date(db, FECHA_BENCHMARK)
+
+    engine.dispose()
+    return url, ids
+
+
+def _caso_generate_by_campaign(db, ids: list[int], tmp: str, detalles: int) -> dict:
+    from tasks.report_generator import ReportGenerator
+
+    generator = ReportGenerator(db)
+    generator.reports_dir = Path(tmp)
+    resultado = {}
+    with ContadorConsultas(db.get_bind()) as contador, cronometro(resultado):
+        generator.generate_by_campaign(ids[0])
+
+    resultado["consultas"] = contador.total
+    resultado["filas_s"] = detalles / resultado["segundos"]
+    return resultado
+
+
+def _caso_generate_by_date(db, tmp: str) -> dict:
+    from tasks.report_generator import ReportGenerator
+
+    generator = ReportGenerator(db)
+    generator.reports_dir = Path(tmp)
+    resultado = {}
+    with ContadorConsultas(db.get_bind()) as contador, cronometro(resultado):
+        generator.generate_by_date(FECHA_BENCHMARK)
+
+    resultado["consultas"] = contador.total
+    return resultado
+
+
+async def _medir_campania_list(url: str, ids: list[int], clientes: int, duracion: float) -> dict:
+    import httpx
+    from fastapi import FastAPI
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from api.campania import CampaniaService
+    from benchmarks.bench_api_latency import medir
+    from models.database import get_async_db
+    from utils.cursor import codificar_cursor
+
+    engine = create_async_engine(url_async(url))
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_bench_db():
+        async with SessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    CampaniaService(app)
+    app.dependency_overrides[get_async_db] = get_bench_db
+
+    # Primera página y una página a mitad del listado (cursor en la campaña central)
+    fecha = FECHA_BENCHMARK.strftime("%Y/%m/%d")
+    base = f"/campania/list/?fecha={fecha}&paginacion=keyset&page_size=10"
+    cursor = codificar_cursor({"fecha": FECHA_BENCHMARK.isoformat(), "id": ids[len(ids) // 2]})
+    rutas = [base, f"{base}&cursor={cursor}"]
+
+    try:
+        resultado = await medir("http://bench", rutas, clientes, duracion, transport=httpx.ASGITransport(app=app))
+    finally:
+        await engine.dispose()
+
+    if resultado["errores"]:
+        raise RuntimeError(f"{resultado['errores']} respuestas con error en /campania/list/")
+    return resultado
+
+
+def _ejecutar_caso(caso: str, url: str, ids: list[int], detalles: int, opciones: dict, cola):
+    """Ejecuta un caso en un proceso limpio y envía sus métricas (o el error) por la cola"""
+    from sqlalchemy import create_engine
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            if caso == "campania_list":
+                resultado = asyncio.run(_medir_campania_list(url, ids, opciones["clientes"], opciones["duracion"]))
+            else:
+                engine = create_engine(url)
+                with sessionmaker(bind=engine)() as db:
+                    if caso == "generate_by_campaign":
+                        resultado = _caso_generate_by_campaign(db, ids, tmp, detalles)
+                    else:
+                        resultado = _caso_generate_by_date(db, tmp)
+                engine.dispose()
+
+        resultado["rss_pico_mb"] = rss_pico_mb()
+        cola.put(resultado)
+    except Exception as e:
+        cola.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _ejecutar_middleware(url: str) -> dict:
+    """El middleware tiene su propio paquete models: se mide en un intérprete aparte"""
+    proceso = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_procesar_reportes",
+         "--url", url, "--fecha", FECHA_BENCHMARK.isoformat(), "--json"],
+        cwd=MIDDLEWARE_DIR, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        return {"error": proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else "sin salida"}
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def ejecutar_suite(tamanos: list[tuple[int, int]], url: str | None, casos: list[str], opciones: dict) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    resultados = {}
+
+    for campanias, detalles in tamanos:
+        clave = f"{campanias}x{detalles}"
+        print(f"→ Sembrando {clave} ({campanias * detalles:,} detalles)")
+        url_dataset, ids = preparar_dataset(url, campanias, detalles, opciones["semilla"])
+        resultados[clave] = {}
+
+        for caso in casos:
+            if caso == "procesar_reportes":
+                resultado = _ejecutar_middleware(url_dataset)
+            else:
+                cola = ctx.Queue()
+                proceso = ctx.Process(target=_ejecutar_caso, args=(caso, url_dataset, ids, detalles, opciones, cola))
+                proceso.start()
+                resultado = cola.get()
+                proceso.join()
+
+            resultados[clave][caso] = resultado
+            print(f"  {caso:<22} {formatear(resultado)}")
+
+        if url is None:
+            os.remove(url_dataset.removeprefix("sqlite:///"))
+
+    return resultados
+
+
+def formatear(resultado: dict) -> str:
+    if "error" in resultado:
+        return f"ERROR {resultado['error']}"
+    return "  ".join(f"{metrica}={resultado[metrica]:,.2f}" for metrica in METRICAS if metrica in resultado)
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> list[str]:
+    """
+    Compara los resultados con los de una ejecución anterior.
+    Retorna las regresiones: métricas que empeoraron más que la tolerancia (fracción).
+    Solo se comparan tamaños y casos presentes en ambas ejecuciones.
+    """
+    regresiones = []
+    for tamano, casos in actual["resultados"].items():
+        for caso, metricas in casos.items():
+            anteriores = base.get("resultados", {}).get(tamano, {}).get(caso)
+            if not anteriores:
+                continue
+            if "error" in metricas and "error" not in anteriores:
+                regresiones.append(f"{tamano} {caso}: {metricas['error']}")
+                continue
+
+            for metrica, mayor_es_mejor in METRICAS.items():
+                valor, anterior = metricas.get(metrica), anteriores.get(metrica)
+                if valor is None or not anterior:
+                    continue
+                cambio = (valor - anterior) / anterior
+                if (-cambio if mayor_es_mejor else cambio) > tolerancia:
+                    regresiones.append(f"{tamano} {caso} {metrica}: {anterior:,.2f} → {valor:,.2f} ({cambio:+.0%})")
+
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=parse_tamano, nargs="+", default=[(10, 1000), (100, 1000)],
+                        help="Tamaños CAMPAÑASxDETALLES a medir (ej. 10x1000 100x10000)")
+    parser.add_argument("--casos", nargs="+", choices=CASOS, default=list(CASOS), help="Casos a medir")
+    parser.add_argument("--url", default=None, help="URL de PostgreSQL dedicada (por defecto SQLite temporal)")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla de los datos sintéticos")
+    parser.add_argument("--clientes", type=int, default=10, help="Clientes concurrentes en campania_list")
+    parser.add_argument("--duracion", type=float, default=5, help="Segundos de carga en campania_list")
+    parser.add_argument("--salida", default=None, help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento permitido por métrica (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    opciones = {"semilla": args.semilla, "clientes": args.clientes, "duracion": args.duracion}
+    resultados = ejecutar_suite(args.tamanos, args.url, args.casos, opciones)
+
+    actual = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "motor": "sqlite" if args.url is None else args.url.split(":", 1)[0],
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "opciones": opciones,
+        "resultados": resultados
+    }
+
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(actual, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"✓ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        regresiones = comparar(actual, base, args.tolerancia)
+        if regresiones:
+            print(f"✗ {len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%}):")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            sys.exit(1)
+        print(f"✓ Sin regresiones respecto de {args.comparar} (tolerancia {args.tolerancia:.0%})")
+
+    if any("error" in caso for casos in resultados.values() for caso in casos.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,29 @@
 import datetime
 from fastapi import Depends, FastAPI
 from utils.fecha import convertir_fecha
-from models.database import Base, engine
+from models.database import Base, engine, async_engine
 from models.ta_sms_detalle import TaSmsDetalle
 from models.ta_sms_maestro import TaSmsMaestro
 from models.report_status import ReporteEstado
+from models.campania_estadistica import CampaniaEstadistica
 from api import setup_services
+from tasks.report_executor import report_executor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Cargar las variables de entorno desde el archivo .env
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Planificar los trabajos que quedaron en la cola (reinicio, intentos fallidos) y
+    # buscarlos periódicamente
+    report_executor.iniciar_recuperacion()
+    yield
+    # Esperar a que terminen los reportes en curso antes de apagar el servidor
+    report_executor.shutdown()
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 setup_services(app)
 Base.metadata.create_all(bind=engine)
\ No newline at end of file
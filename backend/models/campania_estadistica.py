@@ -0,0 +1,26 @@
+from sqlalchemy import ForeignKey, Integer, String, Date, DateTime, func
+from sqlalchemy.orm import mapped_column, Mapped
+from models.database import Base
+
+class CampaniaEstadistica(Base):
+    """
+    Conteo precalculado de mensajes de TA_SMS_DETALLE por campaña y estado.
+    Se mantiene con triggers sobre TA_SMS_DETALLE o con el refresco por fecha de tasks/campaign_stats.py.
+    """
+    __tablename__ = 'campania_estadistica'
+
+    id_maestro: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey('TA_SMS_MAESTRO.id', ondelete="CASCADE"),
+        primary_key=True)
+
+    estado: Mapped[str] = mapped_column(String, primary_key=True)
+
+    # fecha de la campaña (copiada de TA_SMS_MAESTRO) para refrescar y consultar por fecha
+    fecha: Mapped[str] = mapped_column(Date, nullable=False, index=True)
+
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # actualizado: último cambio en los detalles de la campaña con este estado
+    # (forma parte de la huella de la caché de reportes, ver tasks/report_cache.py)
+    actualizado: Mapped[str] = mapped_column(DateTime, nullable=False, server_default=func.now())
@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from models.pool import MonitoredAsyncQueuePool, MonitoredQueuePool
+from utils.metrics import instrumentar_engine
 from dotenv import load_dotenv
 import os
 
@@ -13,16 +16,59 @@ BD_PASS = os.getenv("BD_PASS")
 BD_PORT = os.getenv("BD_PORT")
 BD_HOST = os.getenv("BD_HOST")
 
+# Configuración de los pools de conexiones
+# - API: consultas cortas de los endpoints, con timeout de sentencia
+# - WORKER: generación de reportes, pocas conexiones de larga duración y sin timeout por defecto
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+DB_WORKER_POOL_SIZE = int(os.getenv("DB_WORKER_POOL_SIZE", 2))
+DB_WORKER_MAX_OVERFLOW = int(os.getenv("DB_WORKER_MAX_OVERFLOW", 2))
+DB_WORKER_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_WORKER_STATEMENT_TIMEOUT_MS", 0))
+
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+# Nivel de log de SQL: false (sin log), true (sentencias) o debug (sentencias y filas)
+DB_ECHO = {"true": True, "debug": "debug"}.get(os.getenv("DB_ECHO", "false").lower(), False)
+
 # Base para todos los modelos
 Base = declarative_base()
 
 # Conexión para PostgreSQL
 SQLALCHEMY_DATABASE_URL = f"postgresql://{BD_USER}:{BD_PASS}@{BD_HOST}:{BD_PORT}/{BD_NAME}"
 
+# Conexión asíncrona (asyncpg) para los endpoints de la API
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{BD_USER}:{BD_PASS}@{BD_HOST}:{BD_PORT}/{BD_NAME}"
+
 print("URL:", SQLALCHEMY_DATABASE_URL)
 
-# Creando el motor de conexión
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+
+def _pool_options(pool_size: int, max_overflow: int) -> dict:
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "echo": DB_ECHO
+    }
+
+
+def _statement_timeout_option(statement_timeout_ms: int) -> str:
+    # 0 desactiva el timeout de sentencia en PostgreSQL
+    return f"-c statement_timeout={statement_timeout_ms}"
+
+
+# Creando el motor de conexión (consultas cortas: creación de tablas, seeder, utilidades)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=MonitoredQueuePool,
+    connect_args={"options": _statement_timeout_option(DB_STATEMENT_TIMEOUT_MS)},
+    **_pool_options(DB_POOL_SIZE, DB_MAX_OVERFLOW)
+)
 
 # Creando la sesión de la base de datos
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -34,3 +80,40 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Motor de los workers de reportes y de las tareas de mantenimiento (particiones, estadísticas):
+# sentencias largas que no deben competir con la API
+worker_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=MonitoredQueuePool,
+    connect_args={"options": _statement_timeout_option(DB_WORKER_STATEMENT_TIMEOUT_MS)},
+    **_pool_options(DB_WORKER_POOL_SIZE, DB_WORKER_MAX_OVERFLOW)
+)
+
+WorkerSession = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+
+# Motor y sesión asíncronos: los endpoints async no bloquean el event loop en cada consulta
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=MonitoredAsyncQueuePool,
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+    **_pool_options(DB_POOL_SIZE, DB_MAX_OVERFLOW)
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Función para obtener la sesión asíncrona de la base de datos
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Pools expuestos en las métricas de la API
+ENGINES = {
+    "api": async_engine,
+    "sync": engine,
+    "worker": worker_engine
+}
+
+# Conteo y duración de las sentencias SQL de cada engine (ver /metrics)
+for _nombre, _engine in ENGINES.items():
+    instrumentar_engine(_engine, _nombre)
@@ -1,11 +1,43 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, func
+from sqlalchemy import BigInteger, Column, Float, Integer, String, DateTime, Date, Index, func, text
 from models.database import Base
 
+# Estados de un trabajo que aún no termina: solicitudes nuevas para la misma campaña se unen a él
+ESTADOS_ACTIVOS = ("PENDIENTE", "EN PROCESO")
+
+# Predicado del índice único parcial de trabajos activos (también lo usa el ON CONFLICT del registro)
+TRABAJO_ACTIVO = text("estado IN ('PENDIENTE', 'EN PROCESO')")
+
+# Reportes registrados por el middleware ('Completado'): uno por campaña y fecha
+REPORTE_MIDDLEWARE = text("estado = 'Completado'")
+
 class ReporteEstado(Base):
     """
     Modelo para la tabla 'reporte_estado' que almacena el estado de los reportes generados para cada campaña.
+    Cada fila es además un trabajo de la cola de generación (ver tasks/job_queue.py).
     """
     __tablename__ = 'reporte_estado'  # Nombre de la tabla en la base de datos
+    __table_args__ = (
+        # Búsqueda de trabajos pendientes o con reclamo vencido por los workers
+        Index('ix_reporte_estado_cola', 'estado', 'id'),
+        # Búsqueda de reportes ya generados con la misma huella (caché de reportes)
+        Index('ix_reporte_estado_huella', 'id_campana', 'huella'),
+        # A lo sumo un trabajo activo por campaña, fecha y formato (coalescencia de solicitudes)
+        Index(
+            'ux_reporte_estado_activo', 'id_campana', 'fecha', 'formato',
+            unique=True,
+            postgresql_where=TRABAJO_ACTIVO,
+            sqlite_where=TRABAJO_ACTIVO
+        ),
+        # Último estado de cada campaña (consulta de estado individual y masiva)
+        Index('ix_reporte_estado_campana_fecha_ts', 'id_campana', 'fecha', 'timestamp'),
+        # Registro de reportes del middleware con INSERT ... ON CONFLICT (middleware/models/report_status.py)
+        Index(
+            'ux_reporte_estado_completado', 'id_campana', 'fecha',
+            unique=True,
+            postgresql_where=REPORTE_MIDDLEWARE,
+            sqlite_where=REPORTE_MIDDLEWARE
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
@@ -19,4 +51,39 @@ class ReporteEstado(Base):
 
     ruta_archivo = Column(String(255), nullable=True)
 
-    timestamp = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    timestamp = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # exportador: Motor de exportación solicitado para el reporte (auto, copy o python)
+    exportador = Column(String(10), nullable=False, server_default="auto")
+
+    # formato: Formato del archivo solicitado (csv, csv.gz, csv.zst o parquet); ruta_archivo lleva su extensión
+    formato = Column(String(10), nullable=False, server_default="csv")
+
+    # huella: Huella de los datos de la campaña con los que se generó el archivo (ver tasks/report_cache.py)
+    huella = Column(String(64), nullable=True)
+
+    # worker_id: Worker que tiene reclamado el trabajo (host:pid)
+    worker_id = Column(String(255), nullable=True)
+
+    # lease_expira: Vencimiento del reclamo; vencido, otro worker puede retomar el trabajo
+    lease_expira = Column(DateTime, nullable=True)
+
+    # intentos: Veces que el trabajo ha sido reclamado
+    intentos = Column(Integer, nullable=False, server_default="0")
+
+    # Punto de control de la exportación por tramos (ver REPORT_CHECKPOINT_FILAS): archivo final,
+    # último id de TA_SMS_DETALLE exportado y bytes del archivo parcial hasta ese id.
+    # Un reintento del trabajo continúa desde ahí en lugar de empezar de cero
+    archivo_parcial = Column(String(255), nullable=True)
+    checkpoint_id = Column(Integer, nullable=True)
+    checkpoint_bytes = Column(BigInteger, nullable=True)
+    # checkpoint_filas: Filas exportadas hasta checkpoint_id (base del avance al reanudar)
+    checkpoint_filas = Column(BigInteger, nullable=True)
+
+    # Avance del trabajo en proceso, publicado cada REPORT_PROGRESO_SEGUNDOS (ver ProgressReporter
+    # en tasks/job_queue.py): filas estimadas al empezar, filas y bytes escritos y filas por
+    # segundo del intento actual. /reporte/status/ calcula con ellos el porcentaje y el ETA
+    filas_total = Column(BigInteger, nullable=True)
+    filas_escritas = Column(BigInteger, nullable=True)
+    bytes_escritos = Column(BigInteger, nullable=True)
+    filas_por_segundo = Column(Float, nullable=True)
@@ -1,11 +1,18 @@
-from sqlalchemy import ForeignKey, Integer, String, Text, DateTime
+import os
+from datetime import date
+from sqlalchemy import ForeignKey, Integer, String, Text, DateTime, Date
 from sqlalchemy.orm import declarative_base, mapped_column, Mapped
 from models.database import Base
 from typing import Optional
 
+# TA_SMS_DETALLE particionada por fecha de campaña (ver tasks/detalle_particiones.py).
+# Las consultas de reportes agregan la fecha de la campaña para que PostgreSQL
+# solo lea la partición de ese día (partition pruning)
+DETALLE_PARTICIONADO = os.getenv("DETALLE_PARTICIONADO", "false").lower() == "true"
+
 class TaSmsDetalle(Base):
     __tablename__ = 'TA_SMS_DETALLE'
-    
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
     id_maestro: Mapped[int] = mapped_column(
@@ -14,6 +21,20 @@ class TaSmsDetalle(Base):
         nullable=False,
         index=True)
 
+    # fecha: Fecha de la campaña (copia de TA_SMS_MAESTRO.fecha); clave de partición en el esquema particionado.
+    # Quien inserta detalles debe enviarla: PostgreSQL elige la partición antes de los triggers BEFORE
+    # y no permite que uno mueva la fila a otra partición, así que no se puede completar con un trigger
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+
     mensaje: Mapped[str] = mapped_column(Text, nullable=False)
 
-    estado: Mapped[str] = mapped_column(String, nullable=False)
\ No newline at end of file
+    estado: Mapped[str] = mapped_column(String, nullable=False)
+
+
+def filtro_particion(fecha: date, particionado: bool = DETALLE_PARTICIONADO) -> list:
+    """
+    Condición sobre la fecha de la campaña que permite descartar las demás particiones.
+    Sin particionar no se agrega: en bases que agregaron la columna sin completarla, los
+    detalles anteriores la tienen en NULL (ver bd/readme.md).
+    """
+    return [TaSmsDetalle.fecha == fecha] if particionado else []
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Date
+from sqlalchemy import Integer, String, Date, Index
 from sqlalchemy.orm import declarative_base, mapped_column, Mapped
 from models.database import Base
 from typing import Optional
@@ -6,6 +6,10 @@ from typing import Optional
 
 class TaSmsMaestro(Base):
     __tablename__ = 'TA_SMS_MAESTRO'
+    __table_args__ = (
+        # Listado por fecha con paginación keyset (WHERE fecha = ? AND id > ? ORDER BY id)
+        Index('ix_ta_sms_maestro_fecha_id', 'fecha', 'id'),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     fecha: Mapped[str] = mapped_column(Date, nullable=False)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Generic, TypeVar
+from typing import List, Generic, Optional, TypeVar
 
 T = TypeVar('T')
 
@@ -9,7 +9,9 @@ class PaginationParams(BaseModel):
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int]
     page: int
     page_size: int
-    total_pages: int 
\ No newline at end of file
+    total_pages: Optional[int]
+    # Cursor opaco para pedir la siguiente página en paginación keyset (None si no hay más)
+    next_cursor: Optional[str] = None
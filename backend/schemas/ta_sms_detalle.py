@@ -1,9 +1,11 @@
+from datetime import date
 from pydantic import BaseModel
 
 class TaSmsDetalleBase(BaseModel):
     id_maestro: int
     mensaje: str
     estado: str
+    fecha: date
 
 class TaSmsDetalleCreate(TaSmsDetalleBase):
     pass
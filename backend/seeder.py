@@ -1,9 +1,16 @@
+import argparse
 import os
+import random
+import sys
 from seeder.generate_maestro import seed_database
-from models.database import Base, engine, Session
+from seeder.bulk_copy import seed_database_copy
+from models.database import Base, engine, Session, WorkerSession
 from models.ta_sms_maestro import TaSmsMaestro
-from models.ta_sms_detalle import TaSmsDetalle
+from models.ta_sms_detalle import DETALLE_PARTICIONADO, TaSmsDetalle
 from models.report_status import ReporteEstado
+from models.campania_estadistica import CampaniaEstadistica
+from tasks.campaign_stats import refresh_stats_by_date
+from tasks.detalle_particiones import crear_particiones
 import shutil
 from datetime import datetime
 from sqlalchemy import text
@@ -70,7 +77,49 @@ def limpiar_tablas():
     finally:
         db.close()
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generador de datos de prueba para SMS. Sin argumentos se ejecuta en modo interactivo."
+    )
+    parser.add_argument("--fecha", help="Fecha de los registros (formato: yy/mm/dd); por defecto la actual")
+    parser.add_argument("--maestros", type=int, help="Número de registros maestros a generar")
+    parser.add_argument("--detalles", type=int, help="Número de detalles por cada maestro")
+    parser.add_argument("--modo", choices=["orm", "copy"], default="copy",
+                        help="orm: inserción por objetos (seeder original); copy: lotes con COPY FROM STDIN")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos en paralelo para los detalles (modo copy)")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla aleatoria para datasets reproducibles")
+    parser.add_argument("--no-limpiar", action="store_true", help="Conservar los registros existentes")
+    return parser.parse_args()
+
+def solicitar_parametros():
+    """Solicita fecha, número de maestros y detalles de forma interactiva"""
+    # Fecha actual en formato yy/mm/dd
+    fecha_actual = datetime.now().strftime('%y/%m/%d')
+    
+    print("\nPor favor, ingrese los siguientes valores (o presione Enter para usar el valor por defecto):\n")
+    
+    fecha_str = get_input_with_default(
+        "Fecha para los registros (formato: yy/mm/dd)",
+        fecha_actual,
+        is_date=True
+    )
+    
+    num_maestros = int(get_input_with_default(
+        "Número de registros maestros a generar",
+        "20"
+    ))
+    
+    num_detalles = int(get_input_with_default(
+        "Número de detalles por cada maestro",
+        "20"
+    ))
+
+    return fecha_str, num_maestros, num_detalles
+
 def run_seeder():
+    interactivo = len(sys.argv) == 1
+    args = parse_args()
+
     print("\n=== Generador de Datos de Prueba para SMS ===\n")
     
     try:
@@ -78,32 +127,21 @@ def run_seeder():
         Base.metadata.create_all(bind=engine)
         
         # Limpiar registros existentes
-        limpiar_tablas()
+        if not args.no_limpiar:
+            limpiar_tablas()
 
-        # Eliminar la carpeta y su contenido
-        if os.path.exists("./reports"):
-            shutil.rmtree("./reports")
-        
-        # Fecha actual en formato yy/mm/dd
-        fecha_actual = datetime.now().strftime('%y/%m/%d')
-        
-        print("\nPor favor, ingrese los siguientes valores (o presione Enter para usar el valor por defecto):\n")
-        
-        fecha_str = get_input_with_default(
-            "Fecha para los registros (formato: yy/mm/dd)",
-            fecha_actual,
-            is_date=True
-        )
+            # Eliminar la carpeta y su contenido
+            if os.path.exists("./reports"):
+                shutil.rmtree("./reports")
         
-        num_maestros = int(get_input_with_default(
-            "Número de registros maestros a generar",
-            "20"
-        ))
-        
-        num_detalles = int(get_input_with_default(
-            "Número de detalles por cada maestro",
-            "20"
-        ))
+        if interactivo:
+            fecha_str, num_maestros, num_detalles = solicitar_parametros()
+            modo = "orm"
+        else:
+            fecha_str = args.fecha or datetime.now().strftime('%y/%m/%d')
+            num_maestros = args.maestros if args.maestros is not None else 20
+            num_detalles = args.detalles if args.detalles is not None else 20
+            modo = args.modo
         
         # Convertir string de fecha a objeto datetime
         fecha = datetime.strptime(fecha_str, '%y/%m/%d').date()
@@ -113,8 +151,22 @@ def run_seeder():
         print(f"- {num_maestros} registros maestros")
         print(f"- {num_detalles} detalles por cada maestro\n")
         
+        # Con TA_SMS_DETALLE particionada, los detalles de la fecha van a su propia partición
+        if DETALLE_PARTICIONADO:
+            with WorkerSession() as db:
+                crear_particiones(db, fecha, 1)
+
         # Ejecutar el seeder
-        seed_database(num_maestros, num_detalles, fecha)
+        if modo == "copy":
+            seed_database_copy(num_maestros, num_detalles, fecha, semilla=args.semilla, workers=args.workers)
+        else:
+            if not interactivo:
+                random.seed(args.semilla)
+            seed_database(num_maestros, num_detalles, fecha)
+
+        # Recalcular las estadísticas precalculadas de la fecha
+        with WorkerSession() as db:
+            refresh_stats_by_date(db, fecha)
         
         print("\n¡Proceso completado exitosamente!")
         
@@ -0,0 +1,116 @@
+import csv
+import io
+import multiprocessing
+import random
+import time
+from datetime import date
+
+from sqlalchemy import insert
+
+from models.database import worker_engine
+from models.ta_sms_maestro import TaSmsMaestro
+from seeder.generate_details import estados, productos, tipos_mensajes
+from seeder.generate_maestro import generar_registros
+
+# Filas de detalle por cada COPY FROM STDIN
+LOTE_COPY = 100_000
+
+# Todos los mensajes posibles se calculan una sola vez; cada lote solo elige índices
+MENSAJES = [
+    tipo.format(descuento=descuento, producto=producto)
+    for tipo in tipos_mensajes
+    for descuento in range(10, 71)
+    for producto in productos
+]
+
+
+def generar_lote_detalles(rnd: random.Random, id_maestro: int, num_detalles: int, fecha: date) -> list[tuple]:
+    """
+    Genera un lote de detalles (id_maestro, fecha, mensaje, estado) de una sola vez,
+    sin objetos ORM ni validación Pydantic por fila. fecha es la de la campaña.
+    """
+    mensajes = rnd.choices(MENSAJES, k=num_detalles)
+    estados_lote = rnd.choices(estados, k=num_detalles)
+    return list(zip([id_maestro] * num_detalles, [fecha] * num_detalles, mensajes, estados_lote))
+
+
+def copy_detalles(dbapi_connection, filas: list[tuple]):
+    """Envía un lote de detalles a TA_SMS_DETALLE con COPY FROM STDIN"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(filas)
+    buffer.seek(0)
+
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(
+            'COPY "TA_SMS_DETALLE" (id_maestro, fecha, mensaje, estado) FROM STDIN WITH (FORMAT CSV)',
+            buffer
+        )
+
+
+def seed_detalles_copy(maestros: list[tuple[int, int]], detalles_por_maestro: int, semilla: int, fecha: date) -> int:
+    """
+    Inserta los detalles de los maestros indicados ((posición, id_maestro)) con COPY.
+
+    El generador de cada maestro se inicializa con la semilla y la posición del maestro,
+    así el dataset es el mismo sin importar cuántos workers se usen.
+    """
+    total = 0
+    dbapi_connection = worker_engine.raw_connection()
+    try:
+        for posicion, id_maestro in maestros:
+            rnd = random.Random(semilla * 1_000_003 + posicion)
+            for inicio in range(0, detalles_por_maestro, LOTE_COPY):
+                cantidad = min(LOTE_COPY, detalles_por_maestro - inicio)
+                copy_detalles(dbapi_connection, generar_lote_detalles(rnd, id_maestro, cantidad, fecha))
+                dbapi_connection.commit()
+                total += cantidad
+    finally:
+        dbapi_connection.close()
+
+    return total
+
+
+def seed_database_copy(num_registros: int, detalles_por_maestro: int, fecha: date, semilla: int = 42, workers: int = 1) -> int:
+    """
+    Siembra maestros y detalles en modo masivo: los maestros con un INSERT multi-fila
+    y los detalles con COPY FROM STDIN, repartidos entre varios procesos.
+
+    Retorna el total de detalles insertados.
+    """
+    inicio = time.perf_counter()
+
+    # Maestros: mismos generadores que el seeder interactivo, con semilla fija
+    random.seed(semilla)
+    registros = generar_registros(num_registros, fecha)
+    with worker_engine.begin() as conn:
+        ids = conn.execute(
+            insert(TaSmsMaestro).returning(TaSmsMaestro.id, sort_by_parameter_order=True),
+            [
+                {
+                    "fecha": registro.fecha,
+                    "nombre": registro.nombre,
+                    "estado": registro.estado,
+                    "descripcion": registro.descripcion
+                }
+                for registro in registros
+            ]
+        ).scalars().all()
+    print(f"✓ Se generaron {num_registros} registros maestros exitosamente")
+
+    # Detalles: se reparten los maestros entre los workers (round-robin)
+    maestros = list(enumerate(ids))
+    workers = max(1, min(workers, len(maestros)))
+    repartos = [maestros[i::workers] for i in range(workers)]
+
+    if workers == 1:
+        total = seed_detalles_copy(maestros, detalles_por_maestro, semilla, fecha)
+    else:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            total = sum(pool.starmap(
+                seed_detalles_copy,
+                [(reparto, detalles_por_maestro, semilla, fecha) for reparto in repartos]
+            ))
+
+    segundos = time.perf_counter() - inicio
+    print(f"✓ Total de detalles generados: {total} en {segundos:.1f}s ({total / max(segundos, 1e-9):,.0f} filas/s)")
+    return total
@@ -1,4 +1,5 @@
 import random
+from datetime import date
 from models.database import Session
 from models.ta_sms_detalle import TaSmsDetalle
 from schemas.ta_sms_detalle import TaSmsDetalleCreate
@@ -22,9 +23,10 @@ productos = [
     "ropa deportiva", "calzado", "muebles", "electrodomésticos", "libros"
 ]
 
-def generar_detalles(id_maestro: int, num_detalles: int) -> list[TaSmsDetalle]:
+def generar_detalles(id_maestro: int, num_detalles: int, fecha: date) -> list[TaSmsDetalle]:
     """
-    Genera registros de detalle para un maestro específico
+    Genera registros de detalle para un maestro específico.
+    fecha es la fecha de la campaña (clave de partición de TA_SMS_DETALLE)
     """
     detalles = []
     
@@ -38,7 +40,8 @@ def generar_detalles(id_maestro: int, num_detalles: int) -> list[TaSmsDetalle]:
         detalle_data = {
             'id_maestro': id_maestro,
             'mensaje': mensaje,
-            'estado': random.choice(estados)
+            'estado': random.choice(estados),
+            'fecha': fecha
         }
         
         # Validar datos con Pydantic
@@ -48,19 +51,20 @@ def generar_detalles(id_maestro: int, num_detalles: int) -> list[TaSmsDetalle]:
         detalle = TaSmsDetalle(
             id_maestro=detalle_validado.id_maestro,
             mensaje=detalle_validado.mensaje,
-            estado=detalle_validado.estado
+            estado=detalle_validado.estado,
+            fecha=detalle_validado.fecha
         )
         detalles.append(detalle)
     
     return detalles
 
-def seed_detalles_database(id_maestro: int, num_detalles: int):
+def seed_detalles_database(id_maestro: int, num_detalles: int, fecha: date):
     """
     Inserta los detalles generados en la base de datos
     """
     db = Session()
     try:
-        detalles = generar_detalles(id_maestro, num_detalles)
+        detalles = generar_detalles(id_maestro, num_detalles, fecha)
         db.add_all(detalles)
         db.commit()
         return detalles
@@ -129,7 +129,7 @@ def seed_database(num_registros: int, detalles_por_maestro: int, fecha: datetime
         total_detalles = 0
         for i, registro in enumerate(registros, 1):
             try:
-                seed_detalles_database(registro.id, detalles_por_maestro)
+                seed_detalles_database(registro.id, detalles_por_maestro, registro.fecha)
                 total_detalles += detalles_por_maestro
                 print(f"  → Maestro {i}/{num_registros}: {detalles_por_maestro} detalles generados")
             except Exception as e:
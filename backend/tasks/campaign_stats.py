@@ -0,0 +1,209 @@
+import argparse
+import datetime
+import os
+
+from sqlalchemy import Select, and_, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from models.campania_estadistica import CampaniaEstadistica
+from models.ta_sms_detalle import DETALLE_PARTICIONADO, TaSmsDetalle, filtro_particion
+from models.ta_sms_maestro import TaSmsMaestro
+
+# Estados posibles de un mensaje en TA_SMS_DETALLE
+ESTADOS_DETALLE = ("ENVIADO", "PENDIENTE", "FALLIDO")
+
+# Fuente de los conteos del reporte resumen: la tabla campania_estadistica (true)
+# o el GROUP BY sobre TA_SMS_DETALLE (false). Desactivado por omisión: activarlo solo
+# después de instalar los triggers y calcular la carga inicial (--instalar-triggers),
+# porque sin ellos la tabla está vacía o desactualizada
+ESTADISTICAS_MATERIALIZADAS = os.getenv("ESTADISTICAS_MATERIALIZADAS", "false").lower() == "true"
+
+# Triggers por sentencia (con tablas de transición) que mantienen campania_estadistica
+# al insertar, actualizar o eliminar filas de TA_SMS_DETALLE. Una carga masiva actualiza
+# las estadísticas con un solo GROUP BY en lugar de una vez por fila.
+# Cada cambio marca además la fecha de actualización (incluso si solo cambió el mensaje).
+TRIGGERS_DDL = """
+CREATE OR REPLACE FUNCTION fn_campania_estadistica_sumar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO campania_estadistica (id_maestro, estado, fecha, total, actualizado)
+    SELECT n.id_maestro, n.estado, m.fecha, COUNT(*), now()
+    FROM nuevas n
+    JOIN "TA_SMS_MAESTRO" m ON m.id = n.id_maestro
+    GROUP BY n.id_maestro, n.estado, m.fecha
+    ON CONFLICT (id_maestro, estado) DO UPDATE
+        SET total = campania_estadistica.total + EXCLUDED.total,
+            actualizado = EXCLUDED.actualizado;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_campania_estadistica_restar() RETURNS trigger AS $$
+BEGIN
+    UPDATE campania_estadistica e
+    SET total = e.total - v.total, actualizado = now()
+    FROM (
+        SELECT id_maestro, estado, COUNT(*) AS total
+        FROM viejas
+        GROUP BY id_maestro, estado
+    ) v
+    WHERE e.id_maestro = v.id_maestro AND e.estado = v.estado;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fn_campania_estadistica_actualizar() RETURNS trigger AS $$
+BEGIN
+    UPDATE campania_estadistica e
+    SET total = e.total - v.total, actualizado = now()
+    FROM (
+        SELECT id_maestro, estado, COUNT(*) AS total
+        FROM viejas
+        GROUP BY id_maestro, estado
+    ) v
+    WHERE e.id_maestro = v.id_maestro AND e.estado = v.estado;
+
+    INSERT INTO campania_estadistica (id_maestro, estado, fecha, total, actualizado)
+    SELECT n.id_maestro, n.estado, m.fecha, COUNT(*), now()
+    FROM nuevas n
+    JOIN "TA_SMS_MAESTRO" m ON m.id = n.id_maestro
+    GROUP BY n.id_maestro, n.estado, m.fecha
+    ON CONFLICT (id_maestro, estado) DO UPDATE
+        SET total = campania_estadistica.total + EXCLUDED.total,
+            actualizado = EXCLUDED.actualizado;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_campania_estadistica_insert ON "TA_SMS_DETALLE";
+CREATE TRIGGER trg_campania_estadistica_insert
+    AFTER INSERT ON "TA_SMS_DETALLE"
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_campania_estadistica_sumar();
+
+DROP TRIGGER IF EXISTS trg_campania_estadistica_delete ON "TA_SMS_DETALLE";
+CREATE TRIGGER trg_campania_estadistica_delete
+    AFTER DELETE ON "TA_SMS_DETALLE"
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_campania_estadistica_restar();
+
+DROP TRIGGER IF EXISTS trg_campania_estadistica_update ON "TA_SMS_DETALLE";
+CREATE TRIGGER trg_campania_estadistica_update
+    AFTER UPDATE ON "TA_SMS_DETALLE"
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_campania_estadistica_actualizar();
+"""
+
+
+def stats_by_date_query(
+    date: datetime.date,
+    materializadas: bool = ESTADISTICAS_MATERIALIZADAS,
+    particionado: bool = DETALLE_PARTICIONADO
+) -> Select:
+    """
+    Consulta (id, nombre, estado campaña, estado detalle, total) de las campañas de una fecha.
+
+    Con materializadas lee campania_estadistica (O(campañas)); si no, agrupa TA_SMS_DETALLE
+    con un único GROUP BY (id_maestro, estado) (O(detalles)). Con particionado el GROUP BY
+    lee solo la partición de la fecha.
+    """
+    if materializadas:
+        estado, total = CampaniaEstadistica.estado, CampaniaEstadistica.total
+        query = select(TaSmsMaestro.id, TaSmsMaestro.nombre, TaSmsMaestro.estado, estado, total) \
+            .outerjoin(CampaniaEstadistica, CampaniaEstadistica.id_maestro == TaSmsMaestro.id)
+    else:
+        estado, total = TaSmsDetalle.estado, func.count(TaSmsDetalle.id)
+        query = select(TaSmsMaestro.id, TaSmsMaestro.nombre, TaSmsMaestro.estado, estado, total) \
+            .outerjoin(TaSmsDetalle, and_(TaSmsDetalle.id_maestro == TaSmsMaestro.id, *filtro_particion(date, particionado))) \
+            .group_by(TaSmsMaestro.id, TaSmsMaestro.nombre, TaSmsMaestro.estado, estado)
+
+    return query.where(TaSmsMaestro.fecha == date).order_by(TaSmsMaestro.id)
+
+
+def pivot_stats(rows) -> list[dict]:
+    """Pivota filas (campaña, estado, total) a una fila por campaña con un conteo por estado"""
+    campaigns: dict[int, dict] = {}
+    for id_maestro, nombre, estado_campana, estado_detalle, total in rows:
+        campaign = campaigns.get(id_maestro)
+        if campaign is None:
+            campaign = campaigns[id_maestro] = {
+                "id": id_maestro,
+                "nombre": nombre,
+                "estado": estado_campana,
+                "total": 0,
+                **{estado: 0 for estado in ESTADOS_DETALLE}
+            }
+
+        # Campañas sin detalles llegan con estado NULL por el outer join
+        if estado_detalle is None:
+            continue
+
+        campaign["total"] += total
+        if estado_detalle in ESTADOS_DETALLE:
+            campaign[estado_detalle] += total
+
+    return list(campaigns.values())
+
+
+def refresh_stats_by_date(db: Session, date: datetime.date) -> int:
+    """
+    Recalcula las estadísticas de todas las campañas de una fecha a partir de TA_SMS_DETALLE.
+
+    Sirve para la carga inicial y para reparar una fecha. Bloquea las campañas de la fecha
+    mientras recalcula, de modo que no se pierdan detalles insertados en paralelo.
+    Retorna el número de filas de estadística escritas.
+    """
+    db.execute(
+        select(TaSmsMaestro.id).where(TaSmsMaestro.fecha == date).with_for_update()
+    ).all()
+
+    db.execute(delete(CampaniaEstadistica).where(CampaniaEstadistica.fecha == date))
+    result = db.execute(
+        insert(CampaniaEstadistica).from_select(
+            ["id_maestro", "estado", "fecha", "total"],
+            select(TaSmsDetalle.id_maestro, TaSmsDetalle.estado, TaSmsMaestro.fecha, func.count())
+            .join(TaSmsMaestro, TaSmsMaestro.id == TaSmsDetalle.id_maestro)
+            .where(TaSmsMaestro.fecha == date, *filtro_particion(date))
+            .group_by(TaSmsDetalle.id_maestro, TaSmsDetalle.estado, TaSmsMaestro.fecha)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def install_triggers(db: Session):
+    """Instala (o reemplaza) los triggers que mantienen campania_estadistica en PostgreSQL"""
+    db.execute(text(TRIGGERS_DDL))
+    db.commit()
+
+
+def refresh_all_dates(db: Session) -> int:
+    """Recalcula las estadísticas de todas las fechas con campañas"""
+    fechas = db.execute(select(TaSmsMaestro.fecha).distinct().order_by(TaSmsMaestro.fecha)).scalars().all()
+    for fecha in fechas:
+        filas = refresh_stats_by_date(db, fecha)
+        print(f"  → {fecha}: {filas} filas de estadística")
+    return len(fechas)
+
+
+if __name__ == "__main__":
+    from models.database import Base, WorkerSession, engine
+
+    parser = argparse.ArgumentParser(description="Estadísticas precalculadas por campaña (campania_estadistica)")
+    parser.add_argument("--instalar-triggers", action="store_true", help="Instalar los triggers de mantenimiento incremental")
+    parser.add_argument("--fecha", help="Refrescar solo esta fecha (formato YYYY/MM/DD); por defecto todas")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    # El recálculo de una fecha grande dura más que el timeout de sentencia del pool de la API:
+    # se usa el pool de los workers (DB_WORKER_STATEMENT_TIMEOUT_MS)
+    with WorkerSession() as db:
+        if args.instalar_triggers:
+            install_triggers(db)
+            print("✓ Triggers instalados")
+
+        if args.fecha:
+            fecha = datetime.datetime.strptime(args.fecha, "%Y/%m/%d").date()
+            print(f"✓ {refresh_stats_by_date(db, fecha)} filas de estadística para {fecha}")
+        else:
+            print(f"✓ {refresh_all_dates(db)} fechas refrescadas")
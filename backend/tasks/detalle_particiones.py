@@ -0,0 +1,291 @@
+import argparse
+import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from models.ta_sms_maestro import TaSmsMaestro
+from tasks.campaign_stats import install_triggers
+from utils.report_formats import abrir_binario, formato_de_ruta, ruta_reporte
+
+# Esquema particionado de TA_SMS_DETALLE: una partición por día de campaña (RANGE sobre fecha)
+# y una partición DEFAULT que recibe los días sin partición propia. Los reportes filtran por
+# fecha de campaña (DETALLE_PARTICIONADO=true) y PostgreSQL solo lee la partición de ese día.
+TABLA = "TA_SMS_DETALLE"
+TABLA_LEGACY = "TA_SMS_DETALLE_legacy"
+PARTICION_DEFAULT = "TA_SMS_DETALLE_default"
+
+# Renombra la tabla actual (y sus índices, para liberar los nombres) y crea la particionada
+# con las mismas columnas. La secuencia de id pasa a la tabla nueva, así los ids no se repiten.
+# La clave primaria incluye la fecha: PostgreSQL exige que contenga la clave de partición.
+CONVERSION_DDL = f"""
+ALTER TABLE "{TABLA}" RENAME TO "{TABLA_LEGACY}";
+ALTER INDEX IF EXISTS "{TABLA}_pkey" RENAME TO "{TABLA_LEGACY}_pkey";
+ALTER INDEX IF EXISTS "ix_{TABLA}_id" RENAME TO "ix_{TABLA_LEGACY}_id";
+ALTER INDEX IF EXISTS "ix_{TABLA}_id_maestro" RENAME TO "ix_{TABLA_LEGACY}_id_maestro";
+
+DROP TRIGGER IF EXISTS trg_campania_estadistica_insert ON "{TABLA_LEGACY}";
+DROP TRIGGER IF EXISTS trg_campania_estadistica_delete ON "{TABLA_LEGACY}";
+DROP TRIGGER IF EXISTS trg_campania_estadistica_update ON "{TABLA_LEGACY}";
+
+CREATE TABLE "{TABLA}" (
+    id INTEGER NOT NULL DEFAULT nextval('"{TABLA}_id_seq"'),
+    id_maestro INTEGER NOT NULL REFERENCES "TA_SMS_MAESTRO" (id) ON DELETE CASCADE,
+    fecha DATE NOT NULL,
+    mensaje TEXT NOT NULL,
+    estado VARCHAR NOT NULL,
+    CONSTRAINT "{TABLA}_pkey" PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+CREATE INDEX "ix_{TABLA}_id" ON "{TABLA}" (id);
+CREATE INDEX "ix_{TABLA}_id_maestro" ON "{TABLA}" (id_maestro);
+ALTER SEQUENCE "{TABLA}_id_seq" OWNED BY "{TABLA}".id;
+
+CREATE TABLE "{PARTICION_DEFAULT}" PARTITION OF "{TABLA}" DEFAULT;
+"""
+
+
+def nombre_particion(fecha: datetime.date) -> str:
+    return f"{TABLA}_p{fecha:%Y%m%d}"
+
+
+def _limites(fecha: datetime.date) -> str:
+    return f"FOR VALUES FROM ('{fecha.isoformat()}') TO ('{(fecha + datetime.timedelta(days=1)).isoformat()}')"
+
+
+def esta_particionada(db: Session) -> bool:
+    """Indica si TA_SMS_DETALLE ya es una tabla particionada"""
+    return db.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:tabla)"),
+        {"tabla": f'"{TABLA}"'}
+    ).scalar() == "p"
+
+
+def _existe(db: Session, tabla: str) -> bool:
+    return db.execute(text("SELECT to_regclass(:tabla) IS NOT NULL"), {"tabla": f'"{tabla}"'}).scalar()
+
+
+def _triggers_instalados(db: Session, tabla: str) -> bool:
+    return db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(:tabla) AND tgname LIKE 'trg_campania_estadistica_%')"),
+        {"tabla": f'"{tabla}"'}
+    ).scalar()
+
+
+def crear_particion(db: Session, fecha: datetime.date) -> bool:
+    """
+    Crea la partición del día si no existe. Si la partición DEFAULT ya tiene detalles de ese
+    día, se mueven a la partición nueva antes de adjuntarla (PostgreSQL no permite crear una
+    partición cuyas filas estén en DEFAULT). Los detalles solo cambian de partición, por lo que
+    campania_estadistica no cambia.
+
+    Retorna False si la partición ya existía. No hace commit.
+    """
+    particion = nombre_particion(fecha)
+    if _existe(db, particion):
+        return False
+
+    en_default = db.execute(
+        text(f'SELECT EXISTS (SELECT 1 FROM "{PARTICION_DEFAULT}" WHERE fecha = :fecha)'),
+        {"fecha": fecha}
+    ).scalar()
+
+    if not en_default:
+        db.execute(text(f'CREATE TABLE "{particion}" PARTITION OF "{TABLA}" {_limites(fecha)}'))
+        return True
+
+    db.execute(text(f'CREATE TABLE "{particion}" (LIKE "{TABLA}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.execute(text(f'INSERT INTO "{particion}" SELECT * FROM "{PARTICION_DEFAULT}" WHERE fecha = :fecha'), {"fecha": fecha})
+    db.execute(text(f'DELETE FROM "{PARTICION_DEFAULT}" WHERE fecha = :fecha'), {"fecha": fecha})
+    db.execute(text(f'ALTER TABLE "{TABLA}" ATTACH PARTITION "{particion}" {_limites(fecha)}'))
+    return True
+
+
+def crear_particiones(db: Session, desde: datetime.date, dias: int) -> int:
+    """Crea las particiones de los días [desde, desde + dias) que falten. Retorna cuántas creó"""
+    creadas = sum(
+        crear_particion(db, desde + datetime.timedelta(days=dia))
+        for dia in range(dias)
+    )
+    db.commit()
+    return creadas
+
+
+def completar_fecha(db: Session, lote: int = 100_000, obligatoria: bool = False) -> int:
+    """
+    Migración de la columna fecha en una tabla sin particionar: la agrega si falta y la completa
+    desde TA_SMS_MAESTRO por rangos de lote ids, con un commit por rango para no bloquear la
+    tabla durante toda la copia. Con obligatoria, al terminar la marca como NOT NULL.
+
+    Se ejecuta primero sin obligatoria (los procesos que aún no envían la fecha siguen
+    insertando) y, desplegados los que la envían, con obligatoria para completar los detalles
+    que llegaron entretanto. Retorna los detalles completados.
+    """
+    if esta_particionada(db):
+        raise ValueError(f"{TABLA} ya está particionada: fecha es su clave de partición")
+
+    db.execute(text(f'ALTER TABLE "{TABLA}" ADD COLUMN IF NOT EXISTS fecha DATE'))
+    db.commit()
+
+    minimo, maximo = db.execute(text(f'SELECT min(id), max(id) FROM "{TABLA}" WHERE fecha IS NULL')).one()
+    total = 0
+    for desde in range(minimo or 0, (maximo or -1) + 1, lote):
+        total += db.execute(
+            text(f"""
+                UPDATE "{TABLA}" d SET fecha = m.fecha
+                FROM "TA_SMS_MAESTRO" m
+                WHERE m.id = d.id_maestro AND d.fecha IS NULL AND d.id >= :desde AND d.id < :hasta
+            """),
+            {"desde": desde, "hasta": desde + lote}
+        ).rowcount
+        db.commit()
+
+    if obligatoria:
+        db.execute(text(f'ALTER TABLE "{TABLA}" ALTER COLUMN fecha SET NOT NULL'))
+        db.commit()
+    return total
+
+
+def convertir(db: Session, conservar_legacy: bool = False) -> int:
+    """
+    Convierte TA_SMS_DETALLE en una tabla particionada por fecha de campaña, en una sola
+    transacción: crea una partición por cada fecha con campañas y copia los detalles día por
+    día tomando la fecha de TA_SMS_MAESTRO. Los triggers de campania_estadistica se reinstalan
+    sobre la tabla nueva si estaban instalados.
+
+    Mientras dura, la tabla queda bloqueada para escritura. Retorna los detalles copiados.
+    """
+    if esta_particionada(db):
+        raise ValueError(f"{TABLA} ya está particionada")
+    if _existe(db, TABLA_LEGACY):
+        raise ValueError(f"Ya existe {TABLA_LEGACY}; elimínela antes de convertir")
+
+    con_triggers = _triggers_instalados(db, TABLA)
+    db.execute(text(CONVERSION_DDL))
+
+    fechas = db.execute(select(TaSmsMaestro.fecha).distinct().order_by(TaSmsMaestro.fecha)).scalars().all()
+    total = 0
+    for fecha in fechas:
+        crear_particion(db, fecha)
+        copiados = db.execute(
+            text(f"""
+                INSERT INTO "{TABLA}" (id, id_maestro, fecha, mensaje, estado)
+                SELECT d.id, d.id_maestro, m.fecha, d.mensaje, d.estado
+                FROM "{TABLA_LEGACY}" d
+                JOIN "TA_SMS_MAESTRO" m ON m.id = d.id_maestro
+                WHERE m.fecha = :fecha
+            """),
+            {"fecha": fecha}
+        ).rowcount
+        total += copiados
+        print(f"  → {fecha}: {copiados} detalles copiados")
+
+    if not conservar_legacy:
+        db.execute(text(f'DROP TABLE "{TABLA_LEGACY}"'))
+
+    # Las estadísticas ya contaban estos detalles: los triggers se instalan después de copiarlos
+    if con_triggers:
+        install_triggers(db)
+    db.commit()
+    return total
+
+
+def desacoplar(db: Session, fecha: datetime.date, archivo: Optional[Path] = None) -> str:
+    """
+    Separa la partición de un día de TA_SMS_DETALLE. Sin archivo queda como tabla independiente
+    (se puede volver a adjuntar); con archivo se exporta con COPY (csv, csv.gz o csv.zst según la
+    extensión) y se elimina. Las estadísticas del día en campania_estadistica se conservan.
+
+    Retorna el nombre de la tabla desacoplada o la ruta del archivo.
+    """
+    particion = nombre_particion(fecha)
+    if not _existe(db, particion):
+        raise ValueError(f"No existe la partición {particion}")
+
+    db.execute(text(f'ALTER TABLE "{TABLA}" DETACH PARTITION "{particion}"'))
+
+    if archivo is None:
+        db.commit()
+        return particion
+
+    dbapi_connection = db.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor, abrir_binario(archivo, formato_de_ruta(str(archivo))) as salida:
+        cursor.copy_expert(f'COPY "{particion}" TO STDOUT WITH (FORMAT CSV, HEADER)', salida)
+
+    db.execute(text(f'DROP TABLE "{particion}"'))
+    db.commit()
+    return str(archivo)
+
+
+def adjuntar(db: Session, fecha: datetime.date):
+    """Vuelve a adjuntar la partición de un día desacoplada con desacoplar()"""
+    db.execute(text(f'ALTER TABLE "{TABLA}" ATTACH PARTITION "{nombre_particion(fecha)}" {_limites(fecha)}'))
+    db.commit()
+
+
+def listar_particiones(db: Session) -> list[tuple[str, str, int]]:
+    """(nombre, límites, bytes) de cada partición de TA_SMS_DETALLE"""
+    return db.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), pg_total_relation_size(c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:tabla)
+        ORDER BY c.relname
+    """), {"tabla": f'"{TABLA}"'}).all()
+
+
+def _fecha(valor: str) -> datetime.date:
+    return datetime.datetime.strptime(valor, "%Y/%m/%d").date()
+
+
+if __name__ == "__main__":
+    from models.database import Base, WorkerSession, engine
+
+    parser = argparse.ArgumentParser(description="TA_SMS_DETALLE particionada por fecha de campaña")
+    parser.add_argument("--completar-fecha", action="store_true", help="Agregar y completar la columna fecha de una tabla sin particionar")
+    parser.add_argument("--obligatoria", action="store_true", help="Con --completar-fecha, marcar la columna como NOT NULL al terminar")
+    parser.add_argument("--lote", type=int, default=100_000, help="Ids de detalle por UPDATE de --completar-fecha")
+    parser.add_argument("--convertir", action="store_true", help="Convertir la tabla actual en particionada (una partición por fecha)")
+    parser.add_argument("--conservar-legacy", action="store_true", help="Con --convertir, conservar la tabla original como TA_SMS_DETALLE_legacy")
+    parser.add_argument("--crear-dias", type=int, help="Crear las particiones de hoy y los N-1 días siguientes")
+    parser.add_argument("--crear", type=_fecha, help="Crear la partición de una fecha (YYYY/MM/DD)")
+    parser.add_argument("--desacoplar", type=_fecha, help="Desacoplar la partición de una fecha (YYYY/MM/DD)")
+    parser.add_argument("--archivar", type=Path, help="Con --desacoplar, exportar la partición a este directorio y eliminarla")
+    parser.add_argument("--formato", default="csv.zst", choices=("csv", "csv.gz", "csv.zst"), help="Formato del archivo de --archivar")
+    parser.add_argument("--adjuntar", type=_fecha, help="Volver a adjuntar la partición desacoplada de una fecha (YYYY/MM/DD)")
+    parser.add_argument("--listar", action="store_true", help="Listar las particiones y su tamaño")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    # Convertir, mover días desde DEFAULT y archivar duran más que el timeout de sentencia
+    # del pool de la API: se usa el pool de los workers (DB_WORKER_STATEMENT_TIMEOUT_MS)
+    with WorkerSession() as db:
+        if args.completar_fecha:
+            print(f"✓ {completar_fecha(db, args.lote, args.obligatoria)} detalles con fecha")
+
+        if args.convertir:
+            print(f"✓ {convertir(db, args.conservar_legacy)} detalles en {TABLA} particionada")
+
+        if args.crear_dias:
+            print(f"✓ {crear_particiones(db, datetime.date.today(), args.crear_dias)} particiones creadas")
+
+        if args.crear:
+            print(f"✓ {crear_particiones(db, args.crear, 1)} particiones creadas")
+
+        if args.desacoplar:
+            archivo = None
+            if args.archivar:
+                args.archivar.mkdir(parents=True, exist_ok=True)
+                archivo = ruta_reporte(args.archivar, nombre_particion(args.desacoplar), args.formato)
+            print(f"✓ Partición desacoplada: {desacoplar(db, args.desacoplar, archivo)}")
+
+        if args.adjuntar:
+            adjuntar(db, args.adjuntar)
+            print(f"✓ Partición {nombre_particion(args.adjuntar)} adjuntada")
+
+        if args.listar:
+            for nombre, limites, tamano in listar_particiones(db):
+                print(f"  {nombre:<32} {limites:<60} {tamano / 1024 / 1024:>10.1f} MB")
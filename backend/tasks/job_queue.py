@@ -0,0 +1,554 @@
+import os
+import socket
+import threading
+from pathlib import Path
+from collections import defaultdict
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import Insert, Row, Select, and_, bindparam, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.report_status import ESTADOS_ACTIVOS, TRABAJO_ACTIVO, ReporteEstado
+from models.ta_sms_maestro import TaSmsMaestro
+from tasks.report_cache import (
+    REPORT_CACHE, cached_reports_query, calcular_huellas, evict_reports, find_cached_report,
+    fingerprint_query, huella_campania, select_cached, touch_report
+)
+from tasks.report_generator import ProgresoReporte, PuntoControl, ReportGenerator
+from tasks.report_scheduler import claim_priority
+from utils.report_formats import ruta_parcial
+
+# Duración del reclamo de un trabajo; si el worker no lo renueva (caída, deploy) otro lo retoma
+LEASE_SECONDS = int(os.getenv("REPORT_LEASE_SECONDS", 300))
+
+# Reclamos permitidos por trabajo antes de marcarlo como ERROR definitivo
+MAX_INTENTOS = int(os.getenv("REPORT_MAX_INTENTOS", 3))
+
+# Cada cuánto se publica el avance de un trabajo en proceso (filas, bytes, filas/s) en su fila
+REPORT_PROGRESO_SEGUNDOS = float(os.getenv("REPORT_PROGRESO_SEGUNDOS", 2))
+
+
+def worker_id() -> str:
+    """Identificador del worker actual (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _disponible():
+    """Condición de trabajo reclamable: PENDIENTE, o EN PROCESO con el reclamo vencido"""
+    return and_(
+        ReporteEstado.intentos < MAX_INTENTOS,
+        or_(
+            ReporteEstado.estado == "PENDIENTE",
+            and_(
+                ReporteEstado.estado == "EN PROCESO",
+                ReporteEstado.lease_expira < func.now()
+            )
+        )
+    )
+
+
+def enqueue_jobs_query(dialect_name: str, jobs: list[dict]) -> Insert:
+    """
+    INSERT de trabajos PENDIENTE con ON CONFLICT DO NOTHING sobre el índice único de trabajos
+    activos (campaña, fecha, formato): si la campaña ya tiene un trabajo pendiente o en proceso,
+    no se crea otro. RETURNING entrega solo los trabajos realmente insertados.
+    """
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return dialect_insert(ReporteEstado) \
+        .values([{**job, "estado": "PENDIENTE"} for job in jobs]) \
+        .on_conflict_do_nothing(
+            index_elements=[ReporteEstado.id_campana, ReporteEstado.fecha, ReporteEstado.formato],
+            index_where=TRABAJO_ACTIVO
+        ) \
+        .returning(ReporteEstado.id, ReporteEstado.id_campana)
+
+
+def active_jobs_query(ids_campana: list[int], fecha, formato: str) -> Select:
+    """Trabajos activos (pendientes o en proceso) de las campañas para la fecha y formato"""
+    return select(ReporteEstado.id, ReporteEstado.id_campana, ReporteEstado.estado) \
+        .where(
+            ReporteEstado.id_campana.in_(ids_campana),
+            ReporteEstado.fecha == fecha,
+            ReporteEstado.formato == formato,
+            ReporteEstado.estado.in_(ESTADOS_ACTIVOS)
+        )
+
+
+def finished_jobs_query(ids_campana: list[int], fecha, formato: str) -> Select:
+    """Trabajos terminados (completados o con error) de las campañas para la fecha y formato, el más reciente al final"""
+    return select(ReporteEstado.id, ReporteEstado.id_campana, ReporteEstado.estado) \
+        .where(
+            ReporteEstado.id_campana.in_(ids_campana),
+            ReporteEstado.fecha == fecha,
+            ReporteEstado.formato == formato,
+            ReporteEstado.estado.in_(("COMPLETADO", "ERROR"))
+        ) \
+        .order_by(ReporteEstado.id)
+
+
+def available_jobs_query(limite: int) -> Select:
+    """Trabajos reclamables (ver _disponible), los más antiguos primero, sin reclamarlos"""
+    return select(ReporteEstado.id, ReporteEstado.id_campana, ReporteEstado.fecha) \
+        .where(_disponible()) \
+        .order_by(ReporteEstado.id) \
+        .limit(limite)
+
+
+def latest_reports_query(ids_campana=None, fecha=None) -> Select:
+    """
+    Último reporte (por timestamp) de cada campaña en una sola consulta, para las campañas
+    indicadas o para todas las campañas de la fecha. Con el índice (id_campana, fecha, timestamp)
+    cada campaña se resuelve con un recorrido de índice.
+    """
+    filtros = []
+    if ids_campana is not None:
+        filtros.append(ReporteEstado.id_campana.in_(list(ids_campana)))
+    if fecha is not None:
+        filtros.append(ReporteEstado.fecha == fecha)
+        filtros.append(ReporteEstado.id_campana.in_(select(TaSmsMaestro.id).where(TaSmsMaestro.fecha == fecha)))
+
+    orden = func.row_number().over(
+        partition_by=ReporteEstado.id_campana,
+        order_by=(ReporteEstado.timestamp.desc(), ReporteEstado.id.desc())
+    ).label("orden")
+    recientes = select(ReporteEstado.id, orden).where(*filtros).subquery()
+
+    return select(ReporteEstado) \
+        .join(recientes, recientes.c.id == ReporteEstado.id) \
+        .where(recientes.c.orden == 1) \
+        .order_by(ReporteEstado.id_campana)
+
+
+def claim_job(db: Session, worker: str, id_reporte: Optional[int] = None) -> Optional[ReporteEstado]:
+    """
+    Reclama un trabajo de la cola con SELECT ... FOR UPDATE SKIP LOCKED, de modo que
+    varios workers (en uno o varios nodos) nunca tomen el mismo reporte.
+
+    Sin id_reporte se toma el trabajo disponible de menor prioridad (ver claim_priority): el
+    más corto con envejecimiento, o el más antiguo sin estadísticas materializadas. Con
+    id_reporte solo ese. Retorna None si no hay trabajo disponible.
+    """
+    query = select(ReporteEstado).where(_disponible())
+    if id_reporte is not None:
+        query = query.where(ReporteEstado.id == id_reporte)
+    else:
+        query = query.order_by(claim_priority(ReporteEstado.id_campana, ReporteEstado.timestamp))
+
+    job = db.execute(
+        query.order_by(ReporteEstado.id).limit(1).with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+
+    if job is None:
+        db.rollback()
+        return None
+
+    job.estado = "EN PROCESO"
+    job.worker_id = worker
+    job.lease_expira = func.now() + timedelta(seconds=LEASE_SECONDS)
+    job.intentos = ReporteEstado.intentos + 1
+    db.commit()
+    return job
+
+
+def claim_jobs(db: Session, worker: str, ids_reporte: Iterable[int]) -> list[Row]:
+    """
+    Reclama a la vez los trabajos indicados que sigan disponibles (FOR UPDATE SKIP LOCKED:
+    los que otro worker ya tomó se omiten). Retorna (id, id_campana, fecha, formato, intentos)
+    de los trabajos reclamados.
+    """
+    ids = db.execute(
+        select(ReporteEstado.id)
+        .where(_disponible(), ReporteEstado.id.in_(list(ids_reporte)))
+        .order_by(ReporteEstado.id)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    if not ids:
+        db.rollback()
+        return []
+
+    jobs = db.execute(
+        update(ReporteEstado)
+        .where(ReporteEstado.id.in_(ids))
+        .values(
+            estado="EN PROCESO",
+            worker_id=worker,
+            lease_expira=func.now() + timedelta(seconds=LEASE_SECONDS),
+            intentos=ReporteEstado.intentos + 1
+        )
+        .returning(ReporteEstado.id, ReporteEstado.id_campana, ReporteEstado.fecha, ReporteEstado.formato, ReporteEstado.intentos)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(jobs)
+
+
+def renew_lease(db: Session, id_reporte: int | list[int], worker: str) -> bool:
+    """Extiende el reclamo de los trabajos que sigan perteneciendo al worker"""
+    ids = [id_reporte] if isinstance(id_reporte, int) else list(id_reporte)
+    result = db.execute(
+        update(ReporteEstado)
+        .where(
+            ReporteEstado.id.in_(ids),
+            ReporteEstado.worker_id == worker,
+            ReporteEstado.estado == "EN PROCESO"
+        )
+        .values(lease_expira=func.now() + timedelta(seconds=LEASE_SECONDS))
+    )
+    db.commit()
+    return result.rowcount > 0
+
+
+def finish_job(
+    db: Session,
+    id_reporte: int,
+    worker: str,
+    estado: str,
+    ruta_archivo: Optional[str] = None,
+    huella: Optional[str] = None
+) -> bool:
+    """
+    Registra el resultado del trabajo y libera el reclamo.
+    Si el reclamo ya fue tomado por otro worker el resultado se descarta.
+    El punto de control se conserva solo si el trabajo vuelve a PENDIENTE (para reanudarlo).
+    Del avance se conservan las filas y bytes escritos; las filas por segundo solo tienen
+    sentido mientras el trabajo está en proceso.
+    """
+    valores = {
+        "estado": estado, "ruta_archivo": ruta_archivo, "huella": huella,
+        "worker_id": None, "lease_expira": None, "filas_por_segundo": None
+    }
+    if estado != "PENDIENTE":
+        valores.update(archivo_parcial=None, checkpoint_id=None, checkpoint_bytes=None, checkpoint_filas=None)
+
+    result = db.execute(
+        update(ReporteEstado)
+        .where(ReporteEstado.id == id_reporte, ReporteEstado.worker_id == worker)
+        .values(**valores)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def save_checkpoint(session_factory, id_reporte: int, worker: str, punto: PuntoControl) -> bool:
+    """
+    Guarda el avance de la exportación en la fila del trabajo, en una sesión propia (la sesión
+    del reporte tiene abierto el cursor de la exportación). Retorna False si el trabajo ya no
+    pertenece al worker.
+    """
+    with session_factory() as db:
+        result = db.execute(
+            update(ReporteEstado)
+            .where(ReporteEstado.id == id_reporte, ReporteEstado.worker_id == worker)
+            .values(
+                archivo_parcial=punto.archivo, checkpoint_id=punto.ultimo_id,
+                checkpoint_bytes=punto.tamano, checkpoint_filas=punto.filas
+            )
+        )
+        db.commit()
+        return result.rowcount == 1
+
+
+def save_progress(session_factory, id_reporte: int, worker: str, valores: dict) -> bool:
+    """
+    Publica el avance del trabajo (ProgresoReporte.estado()) en su fila, en una sesión propia.
+    Retorna False si el trabajo ya no pertenece al worker.
+    """
+    with session_factory() as db:
+        result = db.execute(
+            update(ReporteEstado)
+            .where(ReporteEstado.id == id_reporte, ReporteEstado.worker_id == worker)
+            .values(**valores)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+
+def descartar_parcial(archivo: Optional[str]):
+    """Elimina el archivo parcial de una exportación que no se va a reanudar"""
+    if archivo:
+        ruta_parcial(Path(archivo)).unlink(missing_ok=True)
+
+
+def finish_jobs(db: Session, worker: str, resultados: list[dict]):
+    """
+    Registra el resultado de varios trabajos en una sola sentencia (executemany).
+    Cada resultado lleva id, estado, ruta_archivo y huella; como en finish_job, los trabajos
+    cuyo reclamo ya tomó otro worker no se modifican.
+    """
+    if not resultados:
+        return
+
+    tabla = ReporteEstado.__table__
+    db.execute(
+        update(tabla)
+        .where(tabla.c.id == bindparam("b_id"), tabla.c.worker_id == worker)
+        .values(
+            estado=bindparam("b_estado"),
+            ruta_archivo=bindparam("b_ruta_archivo"),
+            huella=bindparam("b_huella"),
+            worker_id=None,
+            lease_expira=None
+        ),
+        [{f"b_{clave}": valor for clave, valor in resultado.items()} for resultado in resultados]
+    )
+    db.commit()
+
+
+def expire_exhausted_jobs(db: Session) -> int:
+    """
+    Marca como ERROR los trabajos con reclamo vencido que agotaron sus intentos
+    y elimina los archivos parciales que ya no se van a reanudar
+    """
+    agotados = db.execute(
+        select(ReporteEstado.id, ReporteEstado.archivo_parcial)
+        .where(
+            ReporteEstado.estado == "EN PROCESO",
+            ReporteEstado.lease_expira < func.now(),
+            ReporteEstado.intentos >= MAX_INTENTOS
+        )
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    if not agotados:
+        db.rollback()
+        return 0
+
+    db.execute(
+        update(ReporteEstado)
+        .where(ReporteEstado.id.in_([id_reporte for id_reporte, _ in agotados]))
+        .values(
+            estado="ERROR", worker_id=None, lease_expira=None,
+            archivo_parcial=None, checkpoint_id=None, checkpoint_bytes=None, checkpoint_filas=None
+        )
+    )
+    db.commit()
+
+    for _, archivo in agotados:
+        descartar_parcial(archivo)
+    return len(agotados)
+
+
+class LeaseHeartbeat:
+    """
+    Renueva periódicamente el reclamo de un trabajo mientras se genera el reporte,
+    en un hilo con su propia sesión.
+    """
+
+    def __init__(self, session_factory, id_reporte: int | list[int], worker: str, interval: float = LEASE_SECONDS / 3):
+        self.session_factory = session_factory
+        self.id_reporte = id_reporte
+        self.worker = worker
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.session_factory() as db:
+                    if not renew_lease(db, self.id_reporte, self.worker):
+                        return
+            except Exception as e:
+                print(f"Error renovando reclamo del reporte {self.id_reporte}: {str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class ProgressReporter:
+    """
+    Publica el avance del reporte en curso cada interval segundos, en un hilo con su propia
+    sesión (como LeaseHeartbeat). Solo escribe si el avance cambió, y una última vez al terminar
+    la exportación, así que el costo es una sentencia UPDATE por intervalo y no depende de las filas.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        id_reporte: int,
+        worker: str,
+        progreso: ProgresoReporte,
+        interval: float = REPORT_PROGRESO_SEGUNDOS
+    ):
+        self.session_factory = session_factory
+        self.id_reporte = id_reporte
+        self.worker = worker
+        self.progreso = progreso
+        self.interval = interval
+        # Filas y bytes de la última publicación (las filas por segundo cambian en cada lectura)
+        self._publicado: Optional[tuple] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _publicar(self) -> bool:
+        valores = self.progreso.estado()
+        if valores is None or (valores["filas_escritas"], valores["bytes_escritos"]) == self._publicado:
+            return True
+        self._publicado = (valores["filas_escritas"], valores["bytes_escritos"])
+        return save_progress(self.session_factory, self.id_reporte, self.worker, valores)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self._publicar():
+                    return
+            except Exception as e:
+                print(f"Error publicando el avance del reporte {self.id_reporte}: {str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        try:
+            self._publicar()
+        except Exception as e:
+            print(f"Error publicando el avance del reporte {self.id_reporte}: {str(e)}")
+
+
+def run_job(session_factory, id_reporte: Optional[int] = None, worker: Optional[str] = None) -> bool:
+    """
+    Reclama y ejecuta un trabajo de la cola. Retorna False si no había trabajo disponible.
+
+    Un fallo devuelve el trabajo a PENDIENTE mientras queden intentos; al agotarlos queda en ERROR.
+    Las campañas grandes se exportan por tramos con puntos de control en la fila del trabajo,
+    así que el siguiente intento continúa desde el último tramo completo.
+
+    Si ya existe un archivo generado con la misma huella de datos y formato, se reutiliza
+    en lugar de generar la campaña otra vez (ver tasks/report_cache.py).
+    """
+    worker = worker or worker_id()
+
+    with session_factory() as db:
+        job = claim_job(db, worker, id_reporte)
+        if job is None:
+            return False
+
+        id_reporte, id_campana, exportador, formato, intentos = job.id, job.id_campana, job.exportador, job.formato, job.intentos
+        punto_control = PuntoControl(
+            job.archivo_parcial, job.checkpoint_id, job.checkpoint_bytes, job.checkpoint_filas,
+            guardar=lambda punto: save_checkpoint(session_factory, id_reporte, worker, punto)
+        )
+
+        try:
+            # La huella se toma antes de exportar: si los datos cambian durante la exportación,
+            # la siguiente solicitud verá otra huella y regenerará el archivo
+            huella = huella_campania(db, id_campana) if REPORT_CACHE else None
+            cached = find_cached_report(db, id_campana, huella, formato) if huella else None
+            if cached:
+                touch_report(cached)
+                descartar_parcial(punto_control.archivo)
+                finish_job(db, id_reporte, worker, "COMPLETADO", cached, huella)
+                print(f"Reporte {id_reporte} (campaña {id_campana}) sin cambios: se reutiliza {cached}")
+                return True
+
+            generator = ReportGenerator(db)
+            progreso = ProgresoReporte()
+            with LeaseHeartbeat(session_factory, id_reporte, worker), \
+                    ProgressReporter(session_factory, id_reporte, worker, progreso):
+                file_path = generator.generate_by_campaign(
+                    id_campana, exportador, formato, punto_control=punto_control, progreso=progreso
+                )
+
+            finish_job(db, id_reporte, worker, "COMPLETADO", file_path, huella)
+            print(f"Reporte {id_reporte} (campaña {id_campana}) completado: {generator.ultima_medicion.resumen()}")
+
+            evict_reports(generator.reports_dir, conservar=[file_path])
+
+        except Exception as e:
+            db.rollback()
+            estado = "ERROR" if intentos >= MAX_INTENTOS else "PENDIENTE"
+            finish_job(db, id_reporte, worker, estado)
+            if estado == "ERROR":
+                descartar_parcial(punto_control.archivo)
+            print(f"Error procesando reporte para campaña {id_campana} (intento {intentos}): {str(e)}")
+
+    return True
+
+
+def run_date_jobs(session_factory, ids_reporte: Iterable[int], worker: Optional[str] = None) -> int:
+    """
+    Reclama los trabajos indicados y los genera con un solo recorrido de detalles por fecha y
+    formato (ReportGenerator.generate_campaigns_by_date) en lugar de una consulta por campaña.
+
+    La huella y la caché se resuelven con una consulta para todas las campañas, y el resultado
+    de los trabajos se registra en bloque al final. Si el recorrido falla, todos sus trabajos
+    vuelven a PENDIENTE (o quedan en ERROR al agotar sus intentos).
+
+    Retorna la cantidad de trabajos reclamados.
+    """
+    worker = worker or worker_id()
+
+    with session_factory() as db:
+        jobs = claim_jobs(db, worker, ids_reporte)
+        if not jobs:
+            return 0
+
+        grupos = defaultdict(list)
+        for job in jobs:
+            grupos[(job.fecha, job.formato)].append(job)
+
+        resultados = []
+        for (fecha, formato), grupo in grupos.items():
+            resultados.extend(_run_date_group(db, session_factory, worker, fecha, formato, grupo))
+
+        finish_jobs(db, worker, resultados)
+
+    return len(jobs)
+
+
+def _run_date_group(db: Session, session_factory, worker: str, fecha, formato: str, jobs: list[Row]) -> list[dict]:
+    """Genera los trabajos de una fecha y formato y retorna sus resultados para finish_jobs"""
+    ids_campana = [job.id_campana for job in jobs]
+
+    try:
+        huellas = calcular_huellas(db.execute(fingerprint_query(ids_campana)).all()) if REPORT_CACHE else {}
+        cached = {}
+        if huellas:
+            cached = {
+                id_campana: ruta_archivo
+                for id_campana, (_, ruta_archivo) in select_cached(
+                    db.execute(cached_reports_query(huellas, formato)).all(), huellas
+                ).items()
+            }
+            for ruta_archivo in cached.values():
+                touch_report(ruta_archivo)
+
+        rutas = {}
+        pendientes = [id_campana for id_campana in ids_campana if id_campana not in cached]
+        if pendientes:
+            generator = ReportGenerator(db)
+            with LeaseHeartbeat(session_factory, [job.id for job in jobs], worker):
+                rutas = generator.generate_campaigns_by_date(fecha, formato, pendientes)
+            print(f"Reportes de {len(rutas)} campañas del {fecha} ({formato}) en un recorrido: {generator.ultima_medicion.resumen()}")
+            evict_reports(generator.reports_dir, conservar=rutas.values())
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error procesando reportes del {fecha} ({len(jobs)} campañas): {str(e)}")
+        cached, rutas, huellas = {}, {}, {}
+
+    resultados = []
+    for job in jobs:
+        ruta_archivo = cached.get(job.id_campana) or rutas.get(job.id_campana)
+        if ruta_archivo:
+            estado = "COMPLETADO"
+        else:
+            estado = "ERROR" if job.intentos >= MAX_INTENTOS else "PENDIENTE"
+        resultados.append({
+            "id": job.id,
+            "estado": estado,
+            "ruta_archivo": ruta_archivo,
+            "huella": huellas.get(job.id_campana) if ruta_archivo else None
+        })
+    return resultados
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from models.campania_estadistica import CampaniaEstadistica
+from models.report_status import ReporteEstado
+from models.ta_sms_maestro import TaSmsMaestro
+from tasks.campaign_stats import ESTADISTICAS_MATERIALIZADAS
+from utils.report_formats import SUFIJO_MANIFIESTO, SUFIJO_PARCIAL, partes_de_manifiesto, reporte_de_archivo
+
+# Reutilizar el archivo de un reporte anterior cuando los datos de la campaña no cambiaron.
+# La huella solo detecta todos los cambios (también de mensaje) con la fecha de actualización
+# que los triggers de campania_estadistica registran, así que la caché requiere además
+# ESTADISTICAS_MATERIALIZADAS (que se activa una vez instalados los triggers)
+REPORT_CACHE = os.getenv("REPORT_CACHE", "true").lower() == "true" and ESTADISTICAS_MATERIALIZADAS
+
+# Límites del directorio reports/: al superarlos se eliminan los archivos usados hace más tiempo (LRU)
+REPORTS_MAX_BYTES = int(os.getenv("REPORTS_MAX_BYTES", 10 * 1024 ** 3))
+REPORTS_MAX_ARCHIVOS = int(os.getenv("REPORTS_MAX_ARCHIVOS", 0))
+
+# Se incrementa cuando cambia el contenido de los reportes (columnas, formato de fecha...)
+# para invalidar los archivos generados por versiones anteriores
+VERSION_REPORTE = 1
+
+
+def fingerprint_query(ids_campana: Iterable[int]) -> Select:
+    """
+    Consulta (id, nombre, estado, fecha, estado detalle, total, actualizado) de las campañas indicadas.
+
+    Se lee campania_estadistica: conteo por estado y fecha del último cambio (mantenida por
+    triggers, que la marcan en cualquier INSERT, UPDATE o DELETE de TA_SMS_DETALLE), sin
+    recorrer TA_SMS_DETALLE. Sin triggers la huella no es confiable (ver REPORT_CACHE).
+    """
+    maestro = (TaSmsMaestro.id, TaSmsMaestro.nombre, TaSmsMaestro.estado, TaSmsMaestro.fecha)
+    return select(*maestro, CampaniaEstadistica.estado, CampaniaEstadistica.total, CampaniaEstadistica.actualizado) \
+        .outerjoin(CampaniaEstadistica, CampaniaEstadistica.id_maestro == TaSmsMaestro.id) \
+        .where(TaSmsMaestro.id.in_(list(ids_campana))) \
+        .order_by(TaSmsMaestro.id, CampaniaEstadistica.estado)
+
+
+def calcular_huellas(rows) -> dict[int, str]:
+    """Huella (sha256) de los datos de cada campaña a partir de las filas de fingerprint_query"""
+    partes: dict[int, list[str]] = defaultdict(lambda: [f"v{VERSION_REPORTE}"])
+    for id_maestro, *valores in rows:
+        partes[id_maestro].append("|".join(str(valor) for valor in valores))
+
+    return {
+        id_maestro: hashlib.sha256("\n".join(lineas).encode()).hexdigest()
+        for id_maestro, lineas in partes.items()
+    }
+
+
+def cached_reports_query(huellas: dict[int, str], formato: str) -> Select:
+    """Reportes completados con la misma huella y formato (el más reciente primero)"""
+    return select(ReporteEstado.id_campana, ReporteEstado.huella, ReporteEstado.ruta_archivo, ReporteEstado.id) \
+        .where(
+            ReporteEstado.id_campana.in_(list(huellas)),
+            ReporteEstado.huella.in_(set(huellas.values())),
+            ReporteEstado.formato == formato,
+            ReporteEstado.estado == "COMPLETADO"
+        ) \
+        .order_by(ReporteEstado.id.desc())
+
+
+def select_cached(rows, huellas: dict[int, str]) -> dict[int, tuple[int, str]]:
+    """
+    Reporte reutilizable por campaña a partir de las filas de cached_reports_query:
+    (id_reporte, ruta_archivo) del más reciente cuyo archivo sigue en disco (pudo ser
+    eliminado por la política LRU). El id identifica el archivo exacto para la descarga.
+    Un manifiesto solo se reutiliza si todas sus partes siguen en disco.
+    """
+    archivos: dict[int, tuple[int, str]] = {}
+    for id_campana, huella, ruta_archivo, id_reporte in rows:
+        if id_campana in archivos or huella != huellas.get(id_campana) or not ruta_archivo:
+            continue
+        if reporte_en_disco(ruta_archivo):
+            archivos[id_campana] = (id_reporte, ruta_archivo)
+    return archivos
+
+
+def reporte_en_disco(ruta_archivo: str) -> bool:
+    """Si el archivo del reporte existe y, para un manifiesto, también cada una de sus partes"""
+    if not os.path.isfile(ruta_archivo):
+        return False
+    if not ruta_archivo.endswith(SUFIJO_MANIFIESTO):
+        return True
+    try:
+        return all(parte.is_file() for parte in partes_de_manifiesto(Path(ruta_archivo)))
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+def huella_campania(db: Session, id_campana: int) -> Optional[str]:
+    """Huella actual de los datos de una campaña (None si la campaña no existe)"""
+    return calcular_huellas(db.execute(fingerprint_query([id_campana])).all()).get(id_campana)
+
+
+def find_cached_report(db: Session, id_campana: int, huella: str, formato: str) -> Optional[str]:
+    """Ruta de un reporte ya generado con la misma huella y formato, si su archivo existe"""
+    rows = db.execute(cached_reports_query({id_campana: huella}, formato)).all()
+    _, ruta_archivo = select_cached(rows, {id_campana: huella}).get(id_campana, (None, None))
+    return ruta_archivo
+
+
+def touch_report(ruta_archivo: str):
+    """
+    Marca el archivo como usado para la política LRU. Solo se cambia el tiempo de acceso:
+    el de modificación forma parte del ETag de la descarga y no debe cambiar.
+    """
+    try:
+        stat_result = os.stat(ruta_archivo)
+        os.utime(ruta_archivo, ns=(time.time_ns(), stat_result.st_mtime_ns))
+    except FileNotFoundError:
+        pass
+
+
+def evict_reports(
+    reports_dir: Path,
+    max_bytes: int = REPORTS_MAX_BYTES,
+    max_archivos: int = REPORTS_MAX_ARCHIVOS,
+    conservar: Iterable[str] = ()
+) -> list[str]:
+    """
+    Elimina los reportes de reports_dir usados hace más tiempo (tiempo de acceso) hasta
+    quedar dentro de max_bytes y max_archivos (0 = sin límite). Los reportes de conservar
+    (por ejemplo, el recién generado) nunca se eliminan, como tampoco los archivos parciales
+    de exportaciones en curso o por reanudar.
+
+    Un manifiesto y sus partes se eliminan juntos, con el tiempo de acceso del manifiesto
+    (el archivo que se sirve). Las partes sin manifiesto aún se están promoviendo y se conservan.
+
+    Retorna las rutas eliminadas.
+    """
+    conservar = {os.path.abspath(ruta) for ruta in conservar}
+    reportes: dict[str, dict] = defaultdict(lambda: {"atime": None, "bytes": 0, "rutas": []})
+    for entrada in os.scandir(reports_dir):
+        if entrada.is_file() and not entrada.name.endswith(SUFIJO_PARCIAL):
+            stat_result = entrada.stat()
+            nombre = reporte_de_archivo(entrada.name)
+            reporte = reportes[nombre]
+            reporte["bytes"] += stat_result.st_size
+            reporte["rutas"].append(entrada.path)
+            # Solo el archivo que se sirve (reporte o manifiesto) define su uso; una parte no
+            if nombre == entrada.name or entrada.name.endswith(SUFIJO_MANIFIESTO):
+                reporte["atime"] = stat_result.st_atime
+
+    total_bytes = sum(reporte["bytes"] for reporte in reportes.values())
+    total_archivos = sum(len(reporte["rutas"]) for reporte in reportes.values())
+    eliminados = []
+
+    candidatos = sorted(
+        (reporte for reporte in reportes.values() if reporte["atime"] is not None),
+        key=lambda reporte: reporte["atime"]
+    )
+    for reporte in candidatos:
+        excede = (max_bytes and total_bytes > max_bytes) or (max_archivos and total_archivos > max_archivos)
+        if not excede:
+            break
+        if any(os.path.abspath(ruta) in conservar for ruta in reporte["rutas"]):
+            continue
+
+        # El manifiesto primero: sin él, las partes que queden ya no se consideran un reporte servible
+        for ruta in sorted(reporte["rutas"], key=lambda ruta: (not ruta.endswith(SUFIJO_MANIFIESTO), ruta)):
+            try:
+                tamano = os.path.getsize(ruta)
+                os.remove(ruta)
+            except OSError:
+                continue
+            total_bytes -= tamano
+            total_archivos -= 1
+            eliminados.append(ruta)
+
+    return eliminados
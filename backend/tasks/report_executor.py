@@ -0,0 +1,286 @@
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Hashable, Optional
+
+from models.database import Session, WorkerSession
+from tasks.campaign_stats import ESTADISTICAS_MATERIALIZADAS
+from tasks.job_queue import available_jobs_query, expire_exhausted_jobs, run_date_jobs, run_job
+from tasks.report_scheduler import PlanificadorReportes, costo_estimado, estimate_rows_query
+from utils.metrics import registry
+
+# Número de procesos que generan reportes en paralelo dentro de la API (por defecto, uno por núcleo).
+# Con 0 la API solo encola los trabajos y los procesan los workers independientes (worker.py)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", os.cpu_count() or 1))
+
+# Cada cuántos segundos el pool de la API busca en reporte_estado trabajos disponibles que no
+# tiene planificados: PENDIENTE de un reinicio o de un intento fallido, o EN PROCESO con el
+# reclamo vencido. Con 0 solo se buscan al iniciar la API
+REPORT_RECUPERAR_SEGUNDOS = float(os.getenv("REPORT_RECUPERAR_SEGUNDOS", 30))
+
+# Trabajos disponibles que se planifican por búsqueda
+REPORT_RECUPERAR_LOTE = int(os.getenv("REPORT_RECUPERAR_LOTE", 1000))
+
+registry.gauge("reportes_planificador_trabajos", "Trabajos del planificador de reportes de la API por estado (pendiente, en_curso)")
+registry.gauge("reportes_finalizacion_media_segundos", "Media del tiempo desde que se planifica un reporte hasta que termina")
+registry.gauge("reportes_finalizacion_p95_segundos", "Percentil 95 del tiempo desde que se planifica un reporte hasta que termina")
+
+
+def process_campaign_report(id_reporte: int) -> dict:
+    """
+    Genera el reporte de una campaña dentro de un proceso del pool.
+
+    El trabajo se reclama en la cola de reporte_estado (ver tasks/job_queue.py), por lo que
+    si un worker independiente ya lo tomó no se genera dos veces. Cada trabajo abre su propia
+    sesión del pool de workers del proceso y deja el resultado en su fila de reporte_estado.
+
+    Retorna las métricas acumuladas por el proceso hijo (fases del reporte y sentencias SQL)
+    para que la API las sume a su registro.
+    """
+    run_job(WorkerSession, id_reporte)
+    return registry.drain()
+
+
+def process_date_report(ids_reporte: list[int]) -> dict:
+    """
+    Genera en un proceso del pool los reportes de varias campañas de una fecha con un solo
+    recorrido de detalles (ver run_date_jobs). Retorna las métricas del proceso hijo.
+    """
+    run_date_jobs(WorkerSession, ids_reporte)
+    return registry.drain()
+
+
+class ReportExecutor:
+    """
+    Pool de procesos que ejecuta la generación de reportes fuera del proceso de la API.
+
+    El pool se crea al primer envío. Los procesos se inician con 'spawn' para que cada uno
+    construya su propio engine y pool de conexiones en lugar de heredar sockets del padre.
+
+    Los trabajos no se envían al pool en el orden en que llegan: esperan en el planificador
+    (ver tasks/report_scheduler.py), que entrega primero los más cortos con envejecimiento y
+    reparte los turnos entre fechas o solicitantes. En el pool hay a lo sumo max_workers
+    trabajos; al terminar uno se envía el siguiente que indique el planificador.
+
+    Un trabajo que falla vuelve a PENDIENTE en reporte_estado, y uno planificado se pierde si la
+    API se reinicia. iniciar_recuperacion planifica esos trabajos al iniciar y después cada
+    REPORT_RECUPERAR_SEGUNDOS (ver recuperar), así que la API no depende de worker.py.
+    """
+
+    def __init__(self, max_workers: int = REPORT_WORKERS, planificador: Optional[PlanificadorReportes] = None):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.planificador = planificador or PlanificadorReportes()
+        # Función y argumento de cada trabajo planificado, por clave
+        self._tareas: dict[int, tuple[Callable, object]] = {}
+        # Ids de reporte de cada trabajo planificado o en curso, por clave, y todos juntos
+        self._reportes: dict[int, list[int]] = {}
+        self._ids: set[int] = set()
+        self._recuperador: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self._claves = itertools.count()
+        self._en_vuelo = 0
+        self._detenido = False
+        # RLock: el callback de un future ya terminado se ejecuta en el mismo hilo que lo registra
+        self._lock = threading.RLock()
+        self._libre = threading.Condition(self._lock)
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def submit(self, id_reporte: int, costo: Optional[float] = None, grupo: Hashable = None) -> bool:
+        """
+        Planifica la generación del reporte sin bloquear al llamador. costo son los segundos
+        estimados (ver costo_estimado) y grupo, la fecha o el solicitante que comparte turnos.
+        """
+        return self.submit_lote([(id_reporte, costo)], grupo)
+
+    def submit_lote(self, trabajos: list[tuple[int, Optional[float]]], grupo: Hashable = None) -> bool:
+        """
+        Planifica (id_reporte, costo) de una misma solicitud. Se envían al pool después de
+        agregarlos todos, así los primeros por id no se adelantan a los más cortos.
+        """
+        return self._planificar([(process_campaign_report, id_reporte, costo) for id_reporte, costo in trabajos], grupo)
+
+    def submit_fecha(self, ids_reporte: list[int], costo: Optional[float] = None, grupo: Hashable = None) -> bool:
+        """Planifica los reportes de una fecha como un solo trabajo de un recorrido"""
+        if not ids_reporte:
+            return False
+        return self._planificar([(process_date_report, ids_reporte, costo)], grupo)
+
+    def _planificar(self, tareas: list[tuple[Callable, object, Optional[float]]], grupo: Hashable) -> bool:
+        if self.max_workers <= 0 or not tareas:
+            return False
+
+        with self._lock:
+            lote = []
+            for funcion, argumento, costo in tareas:
+                # Un reporte ya planificado (por la solicitud o por recuperar) no se repite
+                ids = [i for i in (argumento if isinstance(argumento, list) else [argumento]) if i not in self._ids]
+                if not ids:
+                    continue
+                if isinstance(argumento, list):
+                    argumento = ids
+
+                clave = next(self._claves)
+                self._tareas[clave] = (funcion, argumento)
+                self._reportes[clave] = ids
+                self._ids.update(ids)
+                lote.append((clave, costo if costo is not None else costo_estimado(None)))
+            self.planificador.agregar_lote(lote, grupo)
+            self._despachar()
+        return bool(lote)
+
+    def _liberar(self, clave: int):
+        """Olvida los ids de reporte de un trabajo terminado o descartado (con el lock)"""
+        self._ids.difference_update(self._reportes.pop(clave, ()))
+
+    def recuperar(self) -> int:
+        """
+        Planifica los trabajos disponibles de la cola (PENDIENTE, o EN PROCESO con el reclamo
+        vencido) que este pool no tiene planificados, agrupados por fecha, y cierra como ERROR
+        los que agotaron sus intentos. Si otro proceso los reclama antes, run_job no los repite.
+
+        Retorna la cantidad de trabajos planificados.
+        """
+        if self.max_workers <= 0:
+            return 0
+
+        with Session() as db:
+            expire_exhausted_jobs(db)
+            jobs = db.execute(available_jobs_query(REPORT_RECUPERAR_LOTE)).all()
+            with self._lock:
+                jobs = [job for job in jobs if job.id not in self._ids]
+
+            filas = {}
+            if jobs and ESTADISTICAS_MATERIALIZADAS:
+                filas = dict(db.execute(estimate_rows_query({job.id_campana for job in jobs})).all())
+
+        por_fecha = defaultdict(list)
+        for job in jobs:
+            por_fecha[job.fecha].append((job.id, costo_estimado(filas.get(job.id_campana))))
+        for fecha, trabajos in por_fecha.items():
+            self.submit_lote(trabajos, fecha)
+        return len(jobs)
+
+    def iniciar_recuperacion(self, intervalo: float = REPORT_RECUPERAR_SEGUNDOS):
+        """Ejecuta recuperar en un hilo: al iniciar y después cada intervalo segundos (con 0, una vez)"""
+        if self.max_workers <= 0 or self._recuperador is not None:
+            return
+
+        self._parar.clear()
+        self._recuperador = threading.Thread(
+            target=self._recuperar_periodicamente, args=(intervalo,), name="recuperar-reportes", daemon=True
+        )
+        self._recuperador.start()
+
+    def _recuperar_periodicamente(self, intervalo: float):
+        while not self._parar.is_set():
+            try:
+                recuperados = self.recuperar()
+                if recuperados:
+                    print(f"{recuperados} reportes disponibles en la cola planificados en el pool de la API")
+            except Exception as e:
+                print(f"Error recuperando reportes de la cola: {str(e)}")
+
+            if intervalo <= 0 or self._parar.wait(intervalo):
+                return
+
+    def _despachar(self):
+        """Envía al pool los siguientes trabajos del planificador hasta ocupar max_workers (con el lock)"""
+        while not self._detenido and self._en_vuelo < self.max_workers:
+            trabajo = self.planificador.siguiente()
+            if trabajo is None:
+                return
+
+            funcion, argumento = self._tareas.pop(trabajo.clave)
+            try:
+                future = self.pool.submit(funcion, argumento)
+            except Exception as e:
+                # Pool roto: el trabajo sigue PENDIENTE en reporte_estado para los workers
+                self.planificador.cancelar(trabajo.clave)
+                self._liberar(trabajo.clave)
+                print(f"Error enviando un reporte al pool: {str(e)}")
+                continue
+
+            self._en_vuelo += 1
+            future.add_done_callback(partial(self._terminar, trabajo.clave))
+
+    def _terminar(self, clave: int, future: Future):
+        with self._lock:
+            self._en_vuelo -= 1
+            self.planificador.terminar(clave)
+            self._liberar(clave)
+            self._despachar()
+            self._libre.notify_all()
+
+        self._collect_result(future)
+
+    def estado(self) -> dict:
+        """Trabajos pendientes y en curso, y media y p95 del tiempo de finalización"""
+        with self._lock:
+            return self.planificador.resumen()
+
+    def shutdown(self, wait: bool = True):
+        """
+        Con wait se generan antes los trabajos ya planificados. Sin wait se descartan; siguen
+        PENDIENTE en reporte_estado y los toman los workers independientes (worker.py) o la
+        API al volver a iniciar.
+        """
+        self._parar.set()
+        if self._recuperador is not None:
+            self._recuperador.join()
+            self._recuperador = None
+
+        with self._lock:
+            if wait:
+                while self._en_vuelo or self.planificador.pendientes:
+                    self._libre.wait()
+            self._detenido = True
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+            self._pool = None
+
+    @staticmethod
+    def _collect_result(future: Future):
+        if future.cancelled():
+            return
+
+        # Los errores de generación se registran en el proceso hijo; aquí solo llegan
+        # fallos del propio pool (proceso terminado abruptamente, error al serializar, etc.)
+        if future.exception() is not None:
+            print(f"Error en el pool de reportes: {future.exception()}")
+            return
+
+        registry.merge(future.result())
+
+
+# Instancia compartida por la API
+report_executor = ReportExecutor()
+
+
+def planificador_gauges() -> list[tuple[str, dict, float]]:
+    """Estado del planificador de la API como gauges de Prometheus"""
+    estado = report_executor.estado()
+    gauges = [
+        ("reportes_planificador_trabajos", {"estado": "pendiente"}, estado["pendientes"]),
+        ("reportes_planificador_trabajos", {"estado": "en_curso"}, estado["en_curso"])
+    ]
+    if estado["media_segundos"] is not None:
+        gauges.append(("reportes_finalizacion_media_segundos", {}, estado["media_segundos"]))
+        gauges.append(("reportes_finalizacion_p95_segundos", {}, estado["p95_segundos"]))
+    return gauges
+
+
+registry.gauge_callback(planificador_gauges)
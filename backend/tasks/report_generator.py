@@ -1,127 +1,823 @@
-import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
+from typing import Callable, Iterable, Optional
+from sqlalchemy import create_engine, func, select, text
 from sqlalchemy.orm import Session
+from models.campania_estadistica import CampaniaEstadistica
 from models.ta_sms_maestro import TaSmsMaestro
-from models.ta_sms_detalle import TaSmsDetalle
+from models.ta_sms_detalle import DETALLE_PARTICIONADO, TaSmsDetalle, filtro_particion
+from tasks.campaign_stats import ESTADISTICAS_MATERIALIZADAS, pivot_stats, stats_by_date_query
+from utils.csv_export import copy_to_csv, resolver_exportador
+from utils.metrics import MedicionReporte, instrumentar_engine, registry
+from utils.pipeline import REPORT_PIPELINE, TuberiaLotes
+from utils.report_formats import (
+    DemuxEscritores, abrir_escritor, ruta_manifiesto, ruta_parcial, ruta_parte, ruta_reporte, unir_partes, validar_formato
+)
 from fastapi import HTTPException
 
+# Filas que se traen del cursor del servidor por cada lote
+BATCH_SIZE = 1000
+
+# Exportación fragmentada de campañas grandes: el rango de ids de detalle se divide en
+# REPORT_FRAGMENTOS partes que se exportan en paralelo, cada una en su proceso y conexión
+REPORT_FRAGMENTOS = int(os.getenv("REPORT_FRAGMENTOS", 1))
+
+# Detalles mínimos de una campaña para fragmentar su exportación
+REPORT_FRAGMENTO_MIN_FILAS = int(os.getenv("REPORT_FRAGMENTO_MIN_FILAS", 1_000_000))
+
+# Exportación con puntos de control: las campañas cuyo rango de ids de detalle supera
+# REPORT_CHECKPOINT_FILAS se exportan en tramos consecutivos de ese ancho. Al cerrar cada tramo
+# se registra el último id exportado y el tamaño del archivo parcial; un reintento del trabajo
+# continúa desde ahí (0 = sin puntos de control)
+REPORT_CHECKPOINT_FILAS = int(os.getenv("REPORT_CHECKPOINT_FILAS", 1_000_000))
+
+# Encabezado del reporte de detalle por campaña
+CAMPAIGN_HEADER = ("ID Campaña", "Nombre Campaña", "Fecha Campaña", "Mensaje", "Estado Mensaje")
+CAMPAIGN_COLUMNS = list(zip(CAMPAIGN_HEADER, ("int", "str", "str", "str", "str")))
+
+# Columnas del reporte resumen por fecha
+DATE_COLUMNS = [
+    ("ID Campaña", "int"), ("Nombre Campaña", "str"), ("Estado Campaña", "str"),
+    ("Total Mensajes", "int"), ("Enviados", "int"), ("Pendientes", "int"), ("Fallidos", "int")
+]
+
+class PuntoControl:
+    """
+    Avance de una exportación por tramos: archivo final del reporte, último id de detalle
+    exportado, bytes del archivo parcial y filas exportadas hasta ese id (ultimo_id 0: archivo
+    asignado, sin filas).
+
+    guardar(punto) persiste cada avance (run_job lo guarda en la fila del trabajo) y retorna
+    False si el trabajo ya no pertenece al worker, en cuyo caso la exportación se detiene.
+    """
+
+    def __init__(
+        self,
+        archivo: Optional[str] = None,
+        ultimo_id: Optional[int] = None,
+        tamano: int = 0,
+        filas: int = 0,
+        guardar: Optional[Callable[["PuntoControl"], bool]] = None
+    ):
+        self.archivo = archivo
+        self.ultimo_id = ultimo_id
+        self.tamano = tamano or 0
+        self.filas = filas or 0
+        self.guardar = guardar
+
+    def avanzar(self, archivo: Path, ultimo_id: int, tamano: int, filas: int):
+        self.archivo, self.ultimo_id, self.tamano, self.filas = str(archivo), ultimo_id, tamano, filas
+        if self.guardar is not None and not self.guardar(self):
+            raise RuntimeError("El trabajo ya no pertenece a este worker: se detiene la exportación")
+
+    def reanudable(self, formato: str) -> bool:
+        """Hay un archivo parcial del mismo formato con al menos los bytes registrados"""
+        if not self.archivo or self.ultimo_id is None or not self.archivo.endswith(f".{formato}"):
+            return False
+        parcial = ruta_parcial(Path(self.archivo))
+        return self.tamano == 0 or (parcial.is_file() and parcial.stat().st_size >= self.tamano)
+
+
+class ProgresoReporte:
+    """
+    Avance del reporte de campaña en curso, para leerlo desde otro hilo (ProgressReporter en
+    tasks/job_queue.py lo publica cada cierto intervalo). El generador no hace trabajo extra
+    por fila: solo registra la estimación inicial y el archivo que escribe; las filas son las
+    que la medición ya suma por lote y los bytes, el tamaño del archivo al momento de leerlo.
+
+    En la exportación fragmentada el archivo final solo existe al unir las partes: los bytes son
+    la suma de los archivos de parte, y las filas se suman al terminar cada fragmento.
+    """
+
+    def __init__(self):
+        self.filas_total: Optional[int] = None
+        # Filas exportadas por intentos anteriores (exportación reanudada desde un punto de control)
+        self.filas_previas = 0
+        self.archivo: Optional[Path] = None
+        # Archivos de parte de la exportación fragmentada (ver _write_campaign_sharded)
+        self.partes: list[Path] = []
+        self._medicion: Optional[MedicionReporte] = None
+        self._inicio = 0.0
+
+    def iniciar(self, medicion: MedicionReporte, filas_total: Optional[int]):
+        self.filas_total = filas_total
+        self._medicion = medicion
+        self._inicio = time.monotonic()
+
+    def estado(self) -> Optional[dict]:
+        """Valores de las columnas de avance de reporte_estado, o None si el reporte aún no empieza"""
+        medicion = self._medicion
+        if medicion is None:
+            return None
+
+        filas = medicion.filas
+        try:
+            # Con buffers y compresión el tamaño en disco va un poco por detrás de lo escrito
+            bytes_escritos = self.archivo.stat().st_size if self.archivo is not None else medicion.bytes
+        except FileNotFoundError:
+            # El archivo parcial ya se promovió: la medición tiene el tamaño final
+            bytes_escritos = medicion.bytes
+        if self.partes:
+            # Mientras se unen, las partes siguen en disco y el archivo final aún es menor
+            bytes_escritos = max(bytes_escritos, sum(_tamano(parte) for parte in self.partes))
+
+        segundos = time.monotonic() - self._inicio
+        return {
+            "filas_total": self.filas_total,
+            "filas_escritas": self.filas_previas + filas,
+            "bytes_escritos": bytes_escritos,
+            "filas_por_segundo": round(filas / segundos, 1) if segundos > 0 else None
+        }
+
+
 class ReportGenerator:
     def __init__(self, db: Session):
         self.db = db
         # Crear directorio para reportes si no existe
         self.reports_dir = Path("reports")
         self.reports_dir.mkdir(exist_ok=True)
+        # Leer conteos de campania_estadistica o agruparlos desde TA_SMS_DETALLE
+        self.stats_materializadas = ESTADISTICAS_MATERIALIZADAS
+        # Filtrar los detalles también por fecha de campaña (TA_SMS_DETALLE particionada)
+        self.detalle_particionado = DETALLE_PARTICIONADO
+        # Tiempos por fase del último reporte generado (ver utils/metrics.py)
+        self.ultima_medicion: MedicionReporte | None = None
+        # Partes en paralelo de los reportes de campañas grandes (1 = un solo cursor)
+        self.fragmentos = REPORT_FRAGMENTOS
+        self.fragmento_min_filas = REPORT_FRAGMENTO_MIN_FILAS
+        # Traer el siguiente lote mientras se escribe el anterior (ver utils/pipeline.py)
+        self.tuberia = REPORT_PIPELINE
+        # Ancho (ids de detalle) de los tramos de una exportación con puntos de control
+        self.checkpoint_filas = REPORT_CHECKPOINT_FILAS
 
-    def generate_by_date(self, date: datetime.date) -> str:
+    def generate_by_date(self, date: datetime.date, formato: str = "csv") -> str:
         """
-        Genera un reporte CSV con todas las campañas de una fecha específica
+        Genera un reporte con todas las campañas de una fecha específica
+        en el formato indicado (csv, csv.gz, csv.zst o parquet)
         """
         try:
-            # Crear nombre de archivo con timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"report_date_{date.strftime('%Y%m%d')}_{timestamp}.csv"
-            filepath = self.reports_dir / filename
+            with MedicionReporte("fecha") as medicion:
+                self.ultima_medicion = medicion
+                return self._generate_by_date(date, formato, medicion)
+
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error generando reporte por fecha: {str(e)}"
+            )
 
-            print("Buscando campañas para la fecha", date)
+    def _generate_by_date(self, date: datetime.date, formato: str, medicion: MedicionReporte) -> str:
+        # Crear nombre de archivo con timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = ruta_reporte(self.reports_dir, f"report_date_{date.strftime('%Y%m%d')}_{timestamp}", formato)
 
-            # Obtener campañas de la fecha
-            campaigns = self.db.query(TaSmsMaestro).filter(
-                TaSmsMaestro.fecha == date
-            ).all()
+        # Obtener campañas de la fecha con sus conteos por estado (una sola consulta)
+        with medicion.fase("consulta"):
+            campaigns = self.campaign_stats_by_date(date)
+        medicion.filas = len(campaigns)
+
+        if not campaigns:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No se encontraron campañas para la fecha {date.strftime('%Y-%m-%d')}"
+            )
+
+        with medicion.fase("escritura"):
+            writer = abrir_escritor(filepath, formato, DATE_COLUMNS)
 
-            if not campaigns:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No se encontraron campañas para la fecha {date.strftime('%Y-%m-%d')}"
+            # Escribir datos de cada campaña
+            writer.escribir(
+                (
+                    campaign["id"],
+                    campaign["nombre"],
+                    campaign["estado"],
+                    campaign["total"],
+                    campaign["ENVIADO"],
+                    campaign["PENDIENTE"],
+                    campaign["FALLIDO"]
                 )
+                for campaign in campaigns
+            )
+            writer.close()
+
+        self._fsync(filepath, medicion)
+        return str(filepath)
+
+    def campaign_stats_by_date(self, date: datetime.date) -> list[dict]:
+        """
+        Obtiene las campañas de una fecha con el conteo de sus mensajes por estado.
+
+        Con ESTADISTICAS_MATERIALIZADAS los conteos se leen de campania_estadistica (ver
+        tasks/campaign_stats.py) y el costo depende del número de campañas, no del de detalles.
+        Por defecto se calculan con un GROUP BY sobre TA_SMS_DETALLE.
+        """
+        return pivot_stats(self.db.execute(
+            stats_by_date_query(date, self.stats_materializadas, self.detalle_particionado)
+        ).all())
+
+    def generate_by_campaign(
+        self,
+        campaign_id: int,
+        exportador: str = "auto",
+        formato: str = "csv",
+        partes: bool = False,
+        punto_control: Optional[PuntoControl] = None,
+        progreso: Optional[ProgresoReporte] = None
+    ) -> str:
+        """
+        Genera un reporte con los detalles de una campaña específica.
 
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Escribir encabezado
-                writer.writerow([
-                    "ID Campaña", "Nombre Campaña", "Estado Campaña",
-                    "Total Mensajes", "Enviados", "Pendientes", "Fallidos"
-                ])
-                
-                # Escribir datos de cada campaña
-                for campaign in campaigns:
-                    details = self.db.query(TaSmsDetalle).filter(
-                        TaSmsDetalle.id_maestro == campaign.id
+        exportador: 'copy' (COPY TO STDOUT de PostgreSQL), 'python' (csv.writer)
+        o 'auto' (copy cuando el motor lo soporta).
+        formato: 'csv', 'csv.gz', 'csv.zst' o 'parquet'. Parquet se escribe siempre
+        con el exportador de Python, ya que COPY solo produce texto.
+
+        Con self.fragmentos > 1, las campañas de al menos self.fragmento_min_filas detalles se
+        exportan en paralelo por rangos de id y las partes se unen en orden en el archivo final.
+        Con partes se conservan las partes y se retorna un manifiesto JSON en su lugar.
+
+        Con punto_control, las campañas de más de self.checkpoint_filas ids de detalle (CSV)
+        se exportan por tramos en un archivo parcial que se promueve al terminar. Si punto_control
+        trae el avance de un intento anterior, la exportación continúa desde su último id.
+
+        Con progreso se registra la estimación de filas del reporte y el archivo en escritura,
+        para consultar el avance desde otro hilo mientras se exporta (ver ProgresoReporte).
+        """
+        try:
+            validar_formato(formato)
+
+            with MedicionReporte("campania") as medicion:
+                self.ultima_medicion = medicion
+
+                # Obtener información de la campaña
+                with medicion.fase("consulta"):
+                    campaign = self.db.query(TaSmsMaestro).filter(
+                        TaSmsMaestro.id == campaign_id
+                    ).first()
+
+                if not campaign:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"No se encontró la campaña con ID {campaign_id}"
                     )
-                    
-                    total = details.count()
-                    enviados = details.filter(TaSmsDetalle.estado == 'ENVIADO').count()
-                    pendientes = details.filter(TaSmsDetalle.estado == 'PENDIENTE').count()
-                    fallidos = details.filter(TaSmsDetalle.estado == 'FALLIDO').count()
-
-                    writer.writerow([
-                        campaign.id,
-                        campaign.nombre,
-                        campaign.estado,
-                        total,
-                        enviados,
-                        pendientes,
-                        fallidos
-                    ])
 
-            return str(filepath)
+                # Crear nombre de archivo (la extensión indica el formato). Los microsegundos evitan
+                # sobrescribir un archivo de la misma campaña que la caché de reportes aún referencia
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                nombre = f"report_campaign_{campaign_id}_{timestamp}"
+                filepath = ruta_reporte(self.reports_dir, nombre, formato)
+                exportador = "python" if formato == "parquet" else resolver_exportador(self.db, exportador)
+
+                if progreso is not None:
+                    with medicion.fase("consulta"):
+                        progreso.iniciar(medicion, self._estimar_filas(campaign))
+                    progreso.archivo = filepath
 
+                if self.fragmentos > 1:
+                    with self._snapshot_exportacion() as (conn, snapshot):
+                        with medicion.fase("consulta"):
+                            rangos = self._rangos_fragmentos(conn, campaign)
+                        if rangos:
+                            return self._write_campaign_sharded(
+                                campaign, nombre, formato, exportador, rangos, snapshot, medicion, partes, progreso
+                            )
+
+                if punto_control is not None and self.checkpoint_filas > 0 and formato != "parquet":
+                    if punto_control.reanudable(formato):
+                        filepath = Path(punto_control.archivo)
+                    else:
+                        punto_control.ultimo_id, punto_control.tamano, punto_control.filas = None, 0, 0
+
+                    with medicion.fase("consulta"):
+                        tramos = self._tramos_checkpoint(campaign, punto_control.ultimo_id or 0)
+                    if punto_control.ultimo_id is not None or len(tramos) > 1:
+                        if progreso is not None:
+                            progreso.archivo = ruta_parcial(filepath)
+                            progreso.filas_previas = punto_control.filas
+                        return self._write_campaign_checkpointed(
+                            campaign, filepath, formato, exportador, tramos, punto_control, medicion
+                        )
+
+                if exportador == "copy":
+                    self._write_campaign_copy(campaign, filepath, formato, medicion)
+                else:
+                    self._write_campaign_python(campaign, filepath, formato, medicion)
+
+                self._fsync(filepath, medicion)
+                return str(filepath)
+
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
-                detail=f"Error generando reporte por fecha: {str(e)}"
+                detail=f"Error generando reporte de campaña: {str(e)}"
             )
 
-    def generate_by_campaign(self, campaign_id: int) -> str:
-        """
-        Genera un reporte CSV con los detalles de una campaña específica
+    def generate_campaigns_by_date(
+        self,
+        date: datetime.date,
+        formato: str = "csv",
+        ids_campana: Optional[Iterable[int]] = None
+    ) -> dict[int, str]:
         """
-        try:
-            # Obtener información de la campaña
-            campaign = self.db.query(TaSmsMaestro).filter(
-                TaSmsMaestro.id == campaign_id
-            ).first()
-
-            if not campaign:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No se encontró la campaña con ID {campaign_id}"
-                )
+        Genera el reporte de detalle de cada campaña de una fecha (o solo de ids_campana) con un
+        único recorrido de TA_SMS_DETALLE ordenado por campaña, en lugar de una consulta por campaña.
 
-            # Crear nombre de archivo
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"report_campaign_{campaign_id}_{timestamp}.csv"
-            filepath = self.reports_dir / filename
+        Las filas se reparten en el archivo de su campaña conforme llegan del cursor, con un solo
+        archivo abierto a la vez. Cada archivo es igual al de generate_by_campaign con el exportador
+        python (COPY no separa la salida por campaña). Si el recorrido falla se eliminan los archivos.
 
-            # Obtener detalles de la campaña
-            details = self.db.query(TaSmsDetalle).filter(
-                TaSmsDetalle.id_maestro == campaign_id
-            ).all()
-
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([
-                    "ID Campaña", "Nombre Campaña", "Fecha Campaña",
-                    "Mensaje", "Estado Mensaje"
-                ])
-                
-                for detail in details:
-                    writer.writerow([
-                        campaign.id,
-                        campaign.nombre,
-                        campaign.fecha.strftime("%Y-%m-%d"),
-                        detail.mensaje,
-                        detail.estado
-                    ])
+        Retorna {id_campana: ruta del archivo}.
+        """
+        try:
+            validar_formato(formato)
 
-            return str(filepath)
+            with MedicionReporte("campanias_fecha") as medicion:
+                self.ultima_medicion = medicion
+                return self._generate_campaigns_by_date(date, formato, ids_campana, medicion)
 
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
-                detail=f"Error generando reporte de campaña: {str(e)}"
-            )
\ No newline at end of file
+                detail=f"Error generando reportes de campañas por fecha: {str(e)}"
+            )
+
+    def _generate_campaigns_by_date(
+        self,
+        date: datetime.date,
+        formato: str,
+        ids_campana: Optional[Iterable[int]],
+        medicion: MedicionReporte
+    ) -> dict[int, str]:
+        filtros = [TaSmsMaestro.fecha == date]
+        if ids_campana is not None:
+            filtros.append(TaSmsMaestro.id.in_(list(ids_campana)))
+
+        with medicion.fase("consulta"):
+            campaigns = self.db.execute(
+                select(TaSmsMaestro.id, TaSmsMaestro.nombre, TaSmsMaestro.fecha)
+                .where(*filtros)
+                .order_by(TaSmsMaestro.id)
+            ).all()
+
+        if not campaigns:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No se encontraron campañas para la fecha {date.strftime('%Y-%m-%d')}"
+            )
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        rutas = {
+            campaign.id: ruta_reporte(self.reports_dir, f"report_campaign_{campaign.id}_{timestamp}", formato)
+            for campaign in campaigns
+        }
+        prefixes = {
+            campaign.id: (campaign.id, campaign.nombre, campaign.fecha.strftime("%Y-%m-%d"))
+            for campaign in campaigns
+        }
+
+        # Un solo recorrido de los detalles de la fecha; el orden por campaña permite cerrar
+        # cada archivo en cuanto empieza la campaña siguiente
+        with medicion.fase("consulta"):
+            details = self.db.execute(
+                select(TaSmsDetalle.id_maestro, TaSmsDetalle.mensaje, TaSmsDetalle.estado)
+                .join(TaSmsMaestro, TaSmsMaestro.id == TaSmsDetalle.id_maestro)
+                .where(*filtros, *filtro_particion(date, self.detalle_particionado))
+                .order_by(TaSmsDetalle.id_maestro, TaSmsDetalle.id)
+                .execution_options(stream_results=True, yield_per=BATCH_SIZE)
+            )
+
+        demux = DemuxEscritores(lambda id_campana: abrir_escritor(rutas[id_campana], formato, CAMPAIGN_COLUMNS))
+        completado = False
+
+        def escribir(batch):
+            # Un lote puede abarcar el final de una campaña y el inicio de la siguiente
+            for id_campana, filas in groupby(batch, key=itemgetter(0)):
+                prefix = prefixes[id_campana]
+                demux.escribir(id_campana, [(*prefix, mensaje, estado) for _, mensaje, estado in filas])
+
+        try:
+            self._write_batches(details.partitions(), escribir, medicion)
+
+            with medicion.fase("escritura"):
+                # Las campañas sin detalles quedan con un archivo con solo el encabezado
+                for id_campana in rutas:
+                    if id_campana not in demux.cerrados:
+                        demux.escribir(id_campana, [])
+                demux.close()
+
+            for ruta in rutas.values():
+                self._fsync(ruta, medicion)
+            completado = True
+            return {id_campana: str(ruta) for id_campana, ruta in rutas.items()}
+
+        finally:
+            demux.close()
+            if not completado:
+                for ruta in rutas.values():
+                    ruta.unlink(missing_ok=True)
+
+    def _condiciones_detalle(self, campaign: TaSmsMaestro, rango: Optional[tuple[int, int]] = None) -> list:
+        """Condiciones de los detalles de la campaña (y de un rango de ids [desde, hasta])"""
+        condiciones = [TaSmsDetalle.id_maestro == campaign.id, *filtro_particion(campaign.fecha, self.detalle_particionado)]
+        if rango is not None:
+            condiciones.append(TaSmsDetalle.id.between(*rango))
+        return condiciones
+
+    def _write_campaign_python(
+        self,
+        campaign: TaSmsMaestro,
+        filepath: Path,
+        formato: str,
+        medicion: MedicionReporte,
+        rango: Optional[tuple[int, int]] = None,
+        encabezado: bool = True,
+        anexar: bool = False
+    ):
+        """Escribe el detalle de la campaña con el codificador del formato desde un cursor del servidor"""
+        # Obtener detalles de la campaña como tuplas de columnas, en lotes
+        # desde un cursor del lado del servidor (no se materializa la campaña completa)
+        with medicion.fase("consulta"):
+            details = self.db.execute(
+                select(TaSmsDetalle.mensaje, TaSmsDetalle.estado)
+                .where(*self._condiciones_detalle(campaign, rango))
+                .order_by(TaSmsDetalle.id)
+                .execution_options(stream_results=True, yield_per=BATCH_SIZE)
+            )
+
+        # Columnas constantes de la campaña que se repiten en cada fila
+        prefix = (campaign.id, campaign.nombre, campaign.fecha.strftime("%Y-%m-%d"))
+
+        writer = abrir_escritor(filepath, formato, CAMPAIGN_COLUMNS, encabezado, anexar)
+        try:
+            self._write_batches(
+                details.partitions(),
+                lambda batch: writer.escribir([(*prefix, mensaje, estado) for mensaje, estado in batch]),
+                medicion
+            )
+        finally:
+            # Vaciar los buffers (y el último row group) forma parte de la escritura
+            with medicion.fase("escritura"):
+                writer.close()
+
+    def _write_batches(self, batches, escribir, medicion: MedicionReporte):
+        """
+        Recorre los lotes del cursor y escribe cada uno con escribir(batch).
+
+        Con self.tuberia un hilo trae los siguientes lotes mientras se escribe (cola acotada):
+        consulta es el tiempo del lector y espera el del escritor sin lotes listos; como ocurren
+        en paralelo, consulta + escritura puede superar el total.
+        """
+        if self.tuberia:
+            with TuberiaLotes(batches) as lotes:
+                for batch in lotes:
+                    medicion.filas += len(batch)
+                    with medicion.fase("escritura"):
+                        escribir(batch)
+
+            medicion.fases["consulta"] = medicion.fases.get("consulta", 0.0) + lotes.segundos_lectura
+            medicion.fases["espera"] = medicion.fases.get("espera", 0.0) + lotes.segundos_espera
+            return
+
+        # El tiempo de traer cada lote (consulta) se mide aparte del de escribirlo
+        while True:
+            with medicion.fase("consulta"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+
+            medicion.filas += len(batch)
+            with medicion.fase("escritura"):
+                escribir(batch)
+
+    def _write_campaign_copy(
+        self,
+        campaign: TaSmsMaestro,
+        filepath: Path,
+        formato: str,
+        medicion: MedicionReporte,
+        rango: Optional[tuple[int, int]] = None,
+        encabezado: bool = True,
+        anexar: bool = False
+    ):
+        """
+        Escribe el detalle de la campaña con COPY TO STDOUT; PostgreSQL genera el CSV
+        (comprimido al recibirlo si el formato es csv.gz o csv.zst).
+        La consulta y la escritura ocurren a la vez, por lo que se miden como una sola fase (copy).
+        """
+        query = (
+            select(
+                TaSmsMaestro.id.label(CAMPAIGN_HEADER[0]),
+                TaSmsMaestro.nombre.label(CAMPAIGN_HEADER[1]),
+                func.to_char(TaSmsMaestro.fecha, "YYYY-MM-DD").label(CAMPAIGN_HEADER[2]),
+                TaSmsDetalle.mensaje.label(CAMPAIGN_HEADER[3]),
+                TaSmsDetalle.estado.label(CAMPAIGN_HEADER[4])
+            )
+            .join(TaSmsMaestro, TaSmsMaestro.id == TaSmsDetalle.id_maestro)
+            .where(*self._condiciones_detalle(campaign, rango))
+            .order_by(TaSmsDetalle.id)
+        )
+
+        with medicion.fase("copy"):
+            medicion.filas += copy_to_csv(self.db, query, filepath, formato, encabezado, anexar)
+
+    @contextmanager
+    def _snapshot_exportacion(self):
+        """
+        Conexión en la que se calculan los rangos de los fragmentos y snapshot que comparten sus
+        procesos. En PostgreSQL se exporta el snapshot de una transacción REPEATABLE READ
+        (pg_export_snapshot, como pg_dump -j): todas las partes ven los mismos datos aunque se
+        lean en conexiones distintas. La transacción sigue abierta hasta que terminan las partes.
+        """
+        bind = self.db.get_bind()
+        with bind.connect() as conn:
+            if bind.dialect.name != "postgresql":
+                yield conn, None
+                return
+
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+            with conn.begin():
+                yield conn, conn.execute(text("SELECT pg_export_snapshot()")).scalar()
+
+    def _rangos_fragmentos(self, conn, campaign: TaSmsMaestro) -> list[tuple[int, int]]:
+        """
+        Divide el rango de ids de detalle de la campaña en self.fragmentos rangos [desde, hasta]
+        de igual ancho. Los detalles de una campaña se insertan en bloque, por lo que sus ids son
+        casi contiguos y cada rango queda con una cantidad de filas similar.
+        Retorna [] si la campaña tiene menos de self.fragmento_min_filas detalles.
+        """
+        total, minimo, maximo = conn.execute(
+            select(func.count(), func.min(TaSmsDetalle.id), func.max(TaSmsDetalle.id))
+            .where(*self._condiciones_detalle(campaign))
+        ).one()
+        if total < max(self.fragmento_min_filas, self.fragmentos, 1):
+            return []
+
+        ancho = -(-(maximo - minimo + 1) // self.fragmentos)
+        return [(desde, min(desde + ancho - 1, maximo)) for desde in range(minimo, maximo + 1, ancho)]
+
+    def _estimar_filas(self, campaign: TaSmsMaestro) -> Optional[int]:
+        """
+        Filas del reporte de la campaña sin recorrer sus detalles: la suma de sus conteos en
+        campania_estadistica o, sin estadísticas, el ancho de su rango de ids (min/max del índice)
+        """
+        if self.stats_materializadas:
+            total = self.db.execute(
+                select(func.sum(CampaniaEstadistica.total)).where(CampaniaEstadistica.id_maestro == campaign.id)
+            ).scalar()
+            if total is not None:
+                return int(total)
+
+        minimo, maximo = self.db.execute(
+            select(func.min(TaSmsDetalle.id), func.max(TaSmsDetalle.id)).where(*self._condiciones_detalle(campaign))
+        ).one()
+        return 0 if minimo is None else maximo - minimo + 1
+
+    def _tramos_checkpoint(self, campaign: TaSmsMaestro, desde_id: int) -> list[tuple[int, int]]:
+        """
+        Rangos [desde, hasta] de self.checkpoint_filas ids que cubren los detalles de la campaña
+        con id mayor que desde_id (la parte aún no exportada)
+        """
+        minimo, maximo = self.db.execute(
+            select(func.min(TaSmsDetalle.id), func.max(TaSmsDetalle.id))
+            .where(*self._condiciones_detalle(campaign), TaSmsDetalle.id > desde_id)
+        ).one()
+        if minimo is None:
+            return []
+
+        ancho = self.checkpoint_filas
+        return [(desde, min(desde + ancho - 1, maximo)) for desde in range(minimo, maximo + 1, ancho)]
+
+    def _write_campaign_checkpointed(
+        self,
+        campaign: TaSmsMaestro,
+        filepath: Path,
+        formato: str,
+        exportador: str,
+        tramos: list[tuple[int, int]],
+        punto_control: PuntoControl,
+        medicion: MedicionReporte
+    ) -> str:
+        """
+        Exporta los tramos en orden, agregándolos al archivo parcial (en gzip y zstd cada tramo es
+        un miembro o frame nuevo). Al cerrar cada tramo el archivo se lleva a disco y se registra
+        el avance; al reanudar se descarta lo escrito después del último punto de control.
+        Al terminar, el archivo parcial se renombra a filepath.
+        """
+        parcial = ruta_parcial(filepath)
+
+        if punto_control.ultimo_id is None:
+            parcial.unlink(missing_ok=True)
+            punto_control.avanzar(filepath, 0, 0, 0)
+        elif parcial.exists():
+            with medicion.fase("escritura"):
+                os.truncate(parcial, punto_control.tamano)
+
+        # El encabezado va solo al inicio del archivo
+        encabezado = punto_control.tamano == 0
+        # Filas de los intentos anteriores; medicion.filas cuenta las de este intento
+        filas_previas = punto_control.filas
+        for tramo in tramos:
+            if exportador == "copy":
+                self._write_campaign_copy(campaign, parcial, formato, medicion, tramo, encabezado, anexar=True)
+            else:
+                self._write_campaign_python(campaign, parcial, formato, medicion, tramo, encabezado, anexar=True)
+            encabezado = False
+
+            with medicion.fase("fsync"):
+                self._fsync_archivo(parcial)
+            with medicion.fase("checkpoint"):
+                punto_control.avanzar(filepath, tramo[1], parcial.stat().st_size, filas_previas + medicion.filas)
+
+        # Una campaña sin detalles nuevos al reanudar aún puede no tener el archivo parcial
+        if not parcial.exists():
+            abrir_escritor(parcial, formato, CAMPAIGN_COLUMNS).close()
+
+        self._promover(parcial, filepath, medicion)
+        return str(filepath)
+
+    def _promover(self, parcial: Path, filepath: Path, medicion: MedicionReporte):
+        """Renombra el archivo parcial a su nombre final (os.replace es atómico) y lo lleva a disco"""
+        with medicion.fase("fsync"):
+            self._fsync_archivo(parcial)
+            os.replace(parcial, filepath)
+            # El renombre queda en disco al sincronizar el directorio
+            self._fsync_archivo(filepath.parent)
+        medicion.bytes += filepath.stat().st_size
+
+    def _write_campaign_sharded(
+        self,
+        campaign: TaSmsMaestro,
+        nombre: str,
+        formato: str,
+        exportador: str,
+        rangos: list[tuple[int, int]],
+        snapshot: Optional[str],
+        medicion: MedicionReporte,
+        partes: bool,
+        progreso: Optional[ProgresoReporte] = None
+    ) -> str:
+        """
+        Exporta cada rango de ids en un proceso con su propia conexión (ver exportar_fragmento)
+        y une las partes en orden: solo la primera lleva encabezado. Con partes se conservan los
+        archivos de cada parte y se escribe un manifiesto JSON con su orden, filas y tamaño.
+
+        Las partes se escriben como archivos parciales (la política LRU no los elimina) y solo se
+        renombran a su nombre final, antes del manifiesto, cuando todas terminaron.
+
+        Con progreso, el avance se mide con los archivos de parte y las filas de cada fragmento
+        se suman a la medición cuando termina.
+        """
+        url = self.db.get_bind().url.render_as_string(hide_password=False)
+        rutas = [ruta_parte(self.reports_dir, nombre, numero, formato) for numero in range(len(rangos))]
+        parciales = [ruta_parcial(ruta) for ruta in rutas]
+        completado = False
+        if progreso is not None:
+            progreso.partes = parciales
+
+        try:
+            with medicion.fase("fragmentos"):
+                pool = pool_fragmentos(self.fragmentos)
+                futures = [
+                    pool.submit(
+                        exportar_fragmento, url, snapshot, campaign.id, rango, ruta,
+                        exportador, formato, self.detalle_particionado, numero == 0
+                    )
+                    for numero, (rango, ruta) in enumerate(zip(rangos, parciales))
+                ]
+                numeros = {future: numero for numero, future in enumerate(futures)}
+                try:
+                    filas = [0] * len(futures)
+                    for future in as_completed(futures):
+                        filas_parte, metricas = future.result()
+                        filas[numeros[future]] = filas_parte
+                        medicion.filas += filas_parte
+                        registry.merge(metricas)
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            if partes:
+                for parcial, ruta in zip(parciales, rutas):
+                    self._fsync(parcial, medicion)
+                    os.replace(parcial, ruta)
+                # El manifiesto también se escribe aparte y se renombra: un manifiesto visible
+                # siempre está completo y sus partes ya tienen su nombre final
+                manifiesto = ruta_manifiesto(self.reports_dir, nombre)
+                with open(ruta_parcial(manifiesto), 'w', encoding='utf-8') as archivo:
+                    json.dump({
+                        "id_campana": campaign.id,
+                        "formato": formato,
+                        "filas": medicion.filas,
+                        "partes": [
+                            {"archivo": ruta.name, "filas": filas_parte, "bytes": ruta.stat().st_size}
+                            for ruta, filas_parte in zip(rutas, filas)
+                        ]
+                    }, archivo, ensure_ascii=False, indent=2)
+                os.replace(ruta_parcial(manifiesto), manifiesto)
+                medicion.bytes = sum(ruta.stat().st_size for ruta in rutas)
+                completado = True
+                return str(manifiesto)
+
+            filepath = ruta_reporte(self.reports_dir, nombre, formato)
+            with medicion.fase("union"):
+                unir_partes(parciales, filepath, formato)
+            self._fsync(filepath, medicion)
+            return str(filepath)
+
+        finally:
+            # Las partes se eliminan una vez unidas (o si alguna falló)
+            if not completado:
+                for ruta in parciales + rutas:
+                    ruta.unlink(missing_ok=True)
+
+    @staticmethod
+    def _fsync(filepath: Path, medicion: MedicionReporte):
+        """Fuerza el archivo a disco antes de darlo por terminado y suma su tamaño a la medición"""
+        with medicion.fase("fsync"):
+            ReportGenerator._fsync_archivo(filepath)
+        medicion.bytes += filepath.stat().st_size
+
+    @staticmethod
+    def _fsync_archivo(filepath: Path):
+        fd = os.open(filepath, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def _tamano(ruta: Path) -> int:
+    """Tamaño del archivo, 0 si aún no existe o ya se eliminó"""
+    try:
+        return ruta.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+# Pool de procesos de la exportación fragmentada (se crea al primer uso y se reutiliza)
+_pool_fragmentos: Optional[ProcessPoolExecutor] = None
+
+# Engines de los procesos de fragmentos, por URL
+_engines_fragmento: dict = {}
+
+
+def pool_fragmentos(procesos: int) -> ProcessPoolExecutor:
+    global _pool_fragmentos
+    if _pool_fragmentos is None or _pool_fragmentos._max_workers != procesos:
+        if _pool_fragmentos is not None:
+            _pool_fragmentos.shutdown(wait=False)
+        _pool_fragmentos = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+    return _pool_fragmentos
+
+
+def exportar_fragmento(
+    url: str,
+    snapshot: Optional[str],
+    campaign_id: int,
+    rango: tuple[int, int],
+    filepath: Path,
+    exportador: str,
+    formato: str,
+    particionado: bool,
+    encabezado: bool
+) -> tuple[int, dict]:
+    """
+    Exporta un rango de ids de detalle de la campaña a un archivo de parte, en un proceso del
+    pool de fragmentos y con su propia conexión. Con snapshot, la transacción adopta el snapshot
+    exportado por el proceso que reparte los rangos.
+
+    Retorna las filas exportadas y las métricas del proceso (para sumarlas en el padre).
+    """
+    engine = _engines_fragmento.get(url)
+    if engine is None:
+        engine = _engines_fragmento[url] = create_engine(url)
+        instrumentar_engine(engine, "fragmento")
+
+    with Session(engine) as db:
+        if snapshot is not None:
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            db.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+
+        generator = ReportGenerator(db)
+        generator.detalle_particionado = particionado
+        campaign = db.get(TaSmsMaestro, campaign_id)
+        medicion = MedicionReporte("fragmento")
+
+        if exportador == "copy":
+            generator._write_campaign_copy(campaign, filepath, formato, medicion, rango, encabezado)
+        else:
+            generator._write_campaign_python(campaign, filepath, formato, medicion, rango, encabezado)
+
+    return medicion.filas, registry.drain()
@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Hashable, Iterable, Optional
+
+from sqlalchemy import ColumnElement, Select, extract, func, select
+
+from models.campania_estadistica import CampaniaEstadistica
+from tasks.campaign_stats import ESTADISTICAS_MATERIALIZADAS
+
+# Costo estimado de un reporte en segundos: REPORT_SJF_COSTO_FIJO (consulta de la campaña,
+# fsync, registro del trabajo) más sus detalles a REPORT_SJF_FILAS_POR_SEGUNDO
+REPORT_SJF_FILAS_POR_SEGUNDO = float(os.getenv("REPORT_SJF_FILAS_POR_SEGUNDO", 100_000))
+REPORT_SJF_COSTO_FIJO = float(os.getenv("REPORT_SJF_COSTO_FIJO", 0.05))
+
+# Envejecimiento: segundos de costo que se descuentan a un trabajo por cada segundo que espera.
+# Con 0 siempre va primero el más corto (un reporte grande puede esperar indefinidamente);
+# con valores altos el orden se acerca al de llegada
+REPORT_SJF_ENVEJECIMIENTO = float(os.getenv("REPORT_SJF_ENVEJECIMIENTO", 1.0))
+
+# Trabajos terminados con los que se calculan la media y el p95 del tiempo de finalización
+REPORT_PLANIFICADOR_VENTANA = int(os.getenv("REPORT_PLANIFICADOR_VENTANA", 1000))
+
+
+def costo_estimado(filas: Optional[int]) -> float:
+    """Segundos estimados del reporte de una campaña con filas detalles (sin estimación: el costo fijo)"""
+    return REPORT_SJF_COSTO_FIJO + (filas or 0) / REPORT_SJF_FILAS_POR_SEGUNDO
+
+
+def estimate_rows_query(ids_campana: Iterable[int]) -> Select:
+    """(id_maestro, filas) de las campañas indicadas según campania_estadistica, sin recorrer TA_SMS_DETALLE"""
+    return select(CampaniaEstadistica.id_maestro, func.sum(CampaniaEstadistica.total)) \
+        .where(CampaniaEstadistica.id_maestro.in_(list(ids_campana))) \
+        .group_by(CampaniaEstadistica.id_maestro)
+
+
+def claim_priority(
+    id_campana: ColumnElement,
+    llegada: ColumnElement,
+    materializadas: bool = ESTADISTICAS_MATERIALIZADAS,
+    envejecimiento: float = REPORT_SJF_ENVEJECIMIENTO
+) -> ColumnElement:
+    """
+    Prioridad SQL con la que los workers independientes reclaman trabajos de la cola: el mismo
+    criterio que PlanificadorReportes dentro de un grupo, costo + envejecimiento * llegada
+    (segundos desde epoch). Sin estadísticas materializadas todos tienen el costo fijo y el
+    orden es el de llegada. No hay turnos por grupo: cada reclamo solo ve la cola.
+    """
+    llegada = extract("epoch", llegada)
+    if not materializadas:
+        return llegada
+
+    filas = select(func.coalesce(func.sum(CampaniaEstadistica.total), 0)) \
+        .where(CampaniaEstadistica.id_maestro == id_campana) \
+        .scalar_subquery()
+    return REPORT_SJF_COSTO_FIJO + filas / REPORT_SJF_FILAS_POR_SEGUNDO + envejecimiento * llegada
+
+
+def percentil(valores: list[float], p: float) -> Optional[float]:
+    """Percentil p (0-100) por rango más cercano: el menor valor con al menos p% de los valores a su izquierda"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)), 1) - 1]
+
+
+class TrabajoPlanificado:
+    """Trabajo en el planificador: clave del llamador, costo estimado, grupo y marcas de tiempo"""
+
+    def __init__(self, clave: Hashable, costo: float, grupo: Hashable, llegada: float):
+        self.clave = clave
+        self.costo = costo
+        self.grupo = grupo
+        self.llegada = llegada
+        self.inicio: Optional[float] = None
+
+
+class PlanificadorReportes:
+    """
+    Orden de ejecución de los trabajos de reporte.
+
+    - Dentro de un grupo va primero el trabajo más corto (costo estimado), con envejecimiento:
+      la prioridad es costo + envejecimiento * llegada, es decir, el costo menos lo que el
+      trabajo lleva esperando. Un trabajo de costo c solo puede ser adelantado por trabajos
+      que llegan hasta c / envejecimiento segundos después que él, así que no espera sin límite.
+      Como la prioridad no cambia con el tiempo, cada grupo es un heap.
+    - Los grupos (fechas o solicitantes) se atienden por turnos ponderados por costo: el
+      siguiente trabajo es del grupo con pendientes que menos costo ha recibido (empates, por
+      orden de llegada del grupo). Un grupo que llega empieza con el menor costo recibido entre
+      los activos, para que no acapare los turnos por lo que no usó. Una fecha con miles de
+      campañas o con campañas grandes no bloquea las solicitudes de otras fechas.
+
+    Es determinista: el reloj se inyecta (time.monotonic por defecto, uno simulado en
+    benchmarks/bench_scheduler.py) y los empates se resuelven por orden de llegada.
+    No es seguro entre hilos; ReportExecutor lo usa bajo su lock.
+
+    Con por_costo=False el orden dentro del grupo es el de llegada, y con por_grupo=False
+    todos los trabajos comparten un solo grupo.
+    """
+
+    def __init__(
+        self,
+        reloj: Callable[[], float] = time.monotonic,
+        envejecimiento: float = REPORT_SJF_ENVEJECIMIENTO,
+        por_costo: bool = True,
+        por_grupo: bool = True,
+        ventana: int = REPORT_PLANIFICADOR_VENTANA
+    ):
+        self.reloj = reloj
+        self.envejecimiento = envejecimiento
+        self.por_costo = por_costo
+        self.por_grupo = por_grupo
+        # Heap de (prioridad, secuencia, trabajo) por grupo con pendientes, en orden de llegada,
+        # y costo entregado a cada uno
+        self._colas: OrderedDict[Hashable, list] = OrderedDict()
+        self._servicio: dict[Hashable, float] = {}
+        self._secuencia = itertools.count()
+        self._en_curso: dict[Hashable, TrabajoPlanificado] = {}
+        # Tiempo de finalización (llegada → fin) de los últimos trabajos terminados
+        self._tiempos: deque[float] = deque(maxlen=ventana)
+        self.completados = 0
+
+    @property
+    def pendientes(self) -> int:
+        return sum(len(cola) for cola in self._colas.values())
+
+    @property
+    def en_curso(self) -> int:
+        return len(self._en_curso)
+
+    def agregar(self, clave: Hashable, costo: float, grupo: Hashable = None) -> TrabajoPlanificado:
+        ahora = self.reloj()
+        trabajo = TrabajoPlanificado(clave, costo, grupo if self.por_grupo else None, ahora)
+        prioridad = costo + self.envejecimiento * ahora if self.por_costo else ahora
+
+        if trabajo.grupo not in self._colas:
+            self._servicio[trabajo.grupo] = min(self._servicio.values(), default=0.0)
+            self._colas[trabajo.grupo] = []
+        heapq.heappush(self._colas[trabajo.grupo], (prioridad, next(self._secuencia), trabajo))
+        return trabajo
+
+    def agregar_lote(self, trabajos: Iterable[tuple[Hashable, float]], grupo: Hashable = None):
+        """
+        Agrega (clave, costo) de una misma solicitud. El llamador debe pedir los trabajos a
+        ejecutar después de agregar el lote completo: si no, los primeros se entregan antes de
+        conocer a los más cortos.
+        """
+        for clave, costo in trabajos:
+            self.agregar(clave, costo, grupo)
+
+    def siguiente(self) -> Optional[TrabajoPlanificado]:
+        """Entrega el próximo trabajo a ejecutar (None si no hay pendientes) y pasa el turno"""
+        if not self._colas:
+            return None
+
+        # min conserva el primero en orden de llegada cuando hay empate
+        grupo = min(self._colas, key=self._servicio.__getitem__)
+        cola = self._colas[grupo]
+        _, _, trabajo = heapq.heappop(cola)
+        self._servicio[grupo] += trabajo.costo
+        if not cola:
+            del self._colas[grupo], self._servicio[grupo]
+
+        trabajo.inicio = self.reloj()
+        self._en_curso[trabajo.clave] = trabajo
+        return trabajo
+
+    def terminar(self, clave: Hashable) -> Optional[float]:
+        """Registra el fin de un trabajo entregado y retorna su tiempo de finalización (segundos)"""
+        trabajo = self._en_curso.pop(clave, None)
+        if trabajo is None:
+            return None
+
+        tiempo = self.reloj() - trabajo.llegada
+        self._tiempos.append(tiempo)
+        self.completados += 1
+        return tiempo
+
+    def cancelar(self, clave: Hashable):
+        """Descarta un trabajo entregado que no llegó a ejecutarse (no cuenta para los tiempos)"""
+        self._en_curso.pop(clave, None)
+
+    def resumen(self) -> dict:
+        """Media y p95 del tiempo de finalización de los últimos trabajos terminados"""
+        tiempos = list(self._tiempos)
+        return {
+            "completados": self.completados,
+            "pendientes": self.pendientes,
+            "en_curso": self.en_curso,
+            "media_segundos": sum(tiempos) / len(tiempos) if tiempos else None,
+            "p95_segundos": percentil(tiempos, 95)
+        }
@@ -0,0 +1,20 @@
+import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import crear_engine_sqlite
+
+
+@pytest.fixture
+def sesiones(tmp_path):
+    """Fábrica de sesiones sobre un SQLite temporal con el esquema del proyecto (sustituto de PostgreSQL)"""
+    engine = crear_engine_sqlite(str(tmp_path / "reportes.db"))
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def ahora_utc():
+    """Hora de la base (CURRENT_TIMESTAMP de SQLite es UTC) para armar vencimientos de reclamo"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,51 @@
+import ast
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session
+
+from benchmarks.common import crear_engine_sqlite
+from utils.csv_export import resolver_exportador, soporta_copy
+
+COMUNES = ("EXPORTADORES", "soporta_copy", "resolver_exportador")
+
+
+def definiciones(ruta: Path) -> dict[str, str]:
+    """Código fuente de las definiciones de nivel superior de un módulo, por nombre"""
+    fuente = ruta.read_text(encoding="utf-8")
+    resultado = {}
+    for nodo in ast.parse(fuente).body:
+        nombres = [nodo.name] if hasattr(nodo, "name") else [
+            objetivo.id for objetivo in getattr(nodo, "targets", []) if isinstance(objetivo, ast.Name)
+        ]
+        for nombre in nombres:
+            resultado[nombre] = ast.get_source_segment(fuente, nodo)
+    return resultado
+
+
+def test_funciones_comunes_iguales_en_el_middleware():
+    backend = Path(__file__).resolve().parents[1]
+    copia = backend.parent / "middleware" / "utils" / "csv_export.py"
+    if not copia.exists():
+        pytest.skip("middleware no está junto al backend")
+
+    propias, del_middleware = definiciones(backend / "utils" / "csv_export.py"), definiciones(copia)
+    for nombre in COMUNES:
+        assert propias[nombre] == del_middleware[nombre], nombre
+
+
+def test_sin_postgresql_se_usa_python(tmp_path):
+    engine = crear_engine_sqlite(str(tmp_path / "reportes.db"))
+    with Session(engine) as db:
+        assert resolver_exportador(db, "auto") == "python"
+        assert resolver_exportador(db, "copy") == "python"
+        with pytest.raises(ValueError):
+            resolver_exportador(db, "otro")
+    engine.dispose()
+
+
+def test_copy_to_csv_requiere_postgresql(tmp_path):
+    engine = crear_engine_sqlite(str(tmp_path / "reportes.db"))
+    with Session(engine) as db:
+        assert not soporta_copy(db)
+    engine.dispose()
@@ -0,0 +1,169 @@
+"""
+Cola de reporte_estado sobre SQLite. SQLite no calcula func.now() + intervalo como fecha, así
+que las pruebas fijan lease_expira con la hora de la base en lugar de leer la del reclamo.
+"""
+import datetime
+import functools
+
+from sqlalchemy import inspect, select, update
+
+import tasks.job_queue as job_queue
+from models.campania_estadistica import CampaniaEstadistica
+from models.report_status import ReporteEstado
+from tasks.job_queue import (
+    MAX_INTENTOS, claim_job, claim_jobs, expire_exhausted_jobs, finish_job, save_checkpoint
+)
+from tasks.report_generator import PuntoControl
+from tasks.report_scheduler import claim_priority
+from utils.report_formats import ruta_parcial
+
+FECHA = datetime.date(2024, 1, 15)
+
+
+def registrar(sesiones, id_campana: int, **valores) -> int:
+    with sesiones() as db:
+        reporte = ReporteEstado(id_campana=id_campana, fecha=FECHA, estado="PENDIENTE", **valores)
+        db.add(reporte)
+        db.commit()
+        return reporte.id
+
+
+def fila(sesiones, id_reporte: int):
+    with sesiones() as db:
+        return db.execute(
+            select(ReporteEstado.estado, ReporteEstado.worker_id, ReporteEstado.intentos, ReporteEstado.archivo_parcial)
+            .where(ReporteEstado.id == id_reporte)
+        ).one()
+
+
+def reclamar(sesiones, worker: str, id_reporte=None):
+    """Id del trabajo reclamado (None si no hay), sin cargar la fila reclamada"""
+    with sesiones() as db:
+        job = claim_job(db, worker, id_reporte)
+        return None if job is None else inspect(job).identity[0]
+
+
+def fijar_lease(sesiones, id_reporte: int, vence: datetime.datetime):
+    with sesiones() as db:
+        db.execute(update(ReporteEstado).where(ReporteEstado.id == id_reporte).values(lease_expira=vence))
+        db.commit()
+
+
+def test_reclama_el_mas_antiguo(sesiones, ahora_utc):
+    primero = registrar(sesiones, 1)
+    segundo = registrar(sesiones, 2)
+
+    assert reclamar(sesiones, "w1") == primero
+    assert fila(sesiones, primero)[:3] == ("EN PROCESO", "w1", 1)
+
+    fijar_lease(sesiones, primero, ahora_utc + datetime.timedelta(minutes=5))
+    assert reclamar(sesiones, "w2") == segundo
+    fijar_lease(sesiones, segundo, ahora_utc + datetime.timedelta(minutes=5))
+    assert reclamar(sesiones, "w3") is None
+
+
+def test_reclamo_por_id(sesiones):
+    registrar(sesiones, 1)
+    segundo = registrar(sesiones, 2)
+
+    assert reclamar(sesiones, "w1", segundo) == segundo
+    assert fila(sesiones, segundo)[1] == "w1"
+
+
+def test_reclamo_por_costo_con_envejecimiento(sesiones, ahora_utc, monkeypatch):
+    monkeypatch.setattr(job_queue, "claim_priority", functools.partial(claim_priority, materializadas=True))
+    segundos = datetime.timedelta(seconds=1)
+    # Campaña 1: 10 M detalles (~100 s), la más antigua por 10 s; campaña 2: 1 000 detalles
+    grande = registrar(sesiones, 1, timestamp=ahora_utc - 20 * segundos)
+    pequena = registrar(sesiones, 2, timestamp=ahora_utc - 10 * segundos)
+    # Campaña 3: también grande, pero espera desde hace 10 minutos
+    antigua = registrar(sesiones, 3, timestamp=ahora_utc - 600 * segundos)
+    with sesiones() as db:
+        db.add_all([
+            CampaniaEstadistica(id_maestro=id_campana, estado="ENVIADO", fecha=FECHA, total=total)
+            for id_campana, total in [(1, 10_000_000), (2, 1_000), (3, 10_000_000)]
+        ])
+        db.commit()
+
+    vence = ahora_utc + datetime.timedelta(minutes=5)
+    orden = []
+    for worker in ("w1", "w2", "w3"):
+        orden.append(reclamar(sesiones, worker))
+        fijar_lease(sesiones, orden[-1], vence)
+
+    assert orden == [antigua, pequena, grande]
+
+
+def test_reclamo_vencido_pasa_a_otro_worker(sesiones, ahora_utc):
+    id_reporte = registrar(sesiones, 1)
+    reclamar(sesiones, "w1")
+    fijar_lease(sesiones, id_reporte, ahora_utc - datetime.timedelta(seconds=1))
+
+    assert reclamar(sesiones, "w2") == id_reporte
+    assert fila(sesiones, id_reporte)[:3] == ("EN PROCESO", "w2", 2)
+
+    # El resultado del worker anterior se descarta
+    with sesiones() as db:
+        assert not finish_job(db, id_reporte, "w1", "COMPLETADO", "reports/a.csv")
+        assert finish_job(db, id_reporte, "w2", "COMPLETADO", "reports/b.csv")
+    assert fila(sesiones, id_reporte)[:3] == ("COMPLETADO", None, 2)
+
+
+def test_reintento_conserva_el_punto_de_control(sesiones):
+    id_reporte = registrar(sesiones, 1)
+    reclamar(sesiones, "w1")
+    punto = PuntoControl("reports/a.csv", ultimo_id=500, tamano=1024, filas=500)
+    assert save_checkpoint(sesiones, id_reporte, "w1", punto)
+
+    with sesiones() as db:
+        assert finish_job(db, id_reporte, "w1", "PENDIENTE")
+    assert fila(sesiones, id_reporte) == ("PENDIENTE", None, 1, "reports/a.csv")
+
+    # Vuelve a la cola y el nuevo intento encuentra el punto de control
+    assert reclamar(sesiones, "w2") == id_reporte
+    with sesiones() as db:
+        assert finish_job(db, id_reporte, "w2", "COMPLETADO", "reports/a.csv")
+    assert fila(sesiones, id_reporte) == ("COMPLETADO", None, 2, None)
+
+
+def test_intentos_agotados(sesiones, ahora_utc, tmp_path):
+    archivo = tmp_path / "reporte.csv"
+    ruta_parcial(archivo).write_text("id\n1\n")
+    vencido = ahora_utc - datetime.timedelta(seconds=1)
+
+    agotado = registrar(sesiones, 1, intentos=MAX_INTENTOS)
+    with sesiones() as db:
+        db.execute(
+            update(ReporteEstado).where(ReporteEstado.id == agotado)
+            .values(
+                estado="EN PROCESO", worker_id="caido", lease_expira=vencido, archivo_parcial=str(archivo),
+                checkpoint_id=1, checkpoint_bytes=5, checkpoint_filas=1
+            )
+        )
+        db.commit()
+    pendiente_agotado = registrar(sesiones, 2, intentos=MAX_INTENTOS)
+
+    # Ninguno es reclamable
+    assert reclamar(sesiones, "w1") is None
+
+    with sesiones() as db:
+        assert expire_exhausted_jobs(db) == 1
+    assert fila(sesiones, agotado) == ("ERROR", None, MAX_INTENTOS, None)
+    with sesiones() as db:
+        assert db.execute(
+            select(ReporteEstado.checkpoint_id, ReporteEstado.checkpoint_bytes, ReporteEstado.checkpoint_filas)
+            .where(ReporteEstado.id == agotado)
+        ).one() == (None, None, None)
+    assert not ruta_parcial(archivo).exists()
+    assert fila(sesiones, pendiente_agotado)[0] == "PENDIENTE"
+
+
+def test_reclamo_en_lote(sesiones, ahora_utc):
+    ids = [registrar(sesiones, id_campana) for id_campana in (1, 2, 3)]
+    reclamar(sesiones, "otro", ids[1])
+    fijar_lease(sesiones, ids[1], ahora_utc + datetime.timedelta(minutes=5))
+
+    with sesiones() as db:
+        jobs = claim_jobs(db, "w1", ids)
+    assert [(job.id, job.id_campana, job.intentos) for job in jobs] == [(ids[0], 1, 1), (ids[2], 3, 1)]
+    assert fila(sesiones, ids[1])[1] == "otro"
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from utils.pipeline import TuberiaLotes
+
+
+def test_entrega_los_lotes_en_orden():
+    lotes = [[n, n + 1] for n in range(0, 100, 2)]
+    with TuberiaLotes(iter(lotes), profundidad=2) as tuberia:
+        assert list(tuberia) == lotes
+
+
+def test_error_del_lector_se_relanza_en_el_escritor():
+    def lotes():
+        yield [1]
+        yield [2]
+        raise ValueError("conexión perdida")
+
+    recibidos = []
+    with pytest.raises(ValueError, match="conexión perdida"):
+        with TuberiaLotes(lotes()) as tuberia:
+            for lote in tuberia:
+                recibidos.append(lote)
+
+    # Los lotes anteriores al error se entregan
+    assert recibidos == [[1], [2]]
+
+
+def test_error_del_escritor_detiene_al_lector():
+    leidos = []
+
+    def lotes():
+        for n in range(1000):
+            leidos.append(n)
+            yield [n]
+
+    with pytest.raises(RuntimeError):
+        with TuberiaLotes(lotes(), profundidad=1) as tuberia:
+            for _ in tuberia:
+                raise RuntimeError("disco lleno")
+
+    # Al salir del bloque el lector terminó: no sigue leyendo con la conexión del reporte
+    assert not tuberia._hilo.is_alive()
+    # Con una cola de un lote el lector no se adelanta más que unos pocos lotes
+    assert len(leidos) < 10
+
+
+def test_copia_del_middleware_identica():
+    backend = Path(__file__).resolve().parents[1]
+    copia = backend.parent / "middleware" / "utils" / "pipeline.py"
+    if not copia.exists():
+        pytest.skip("middleware no está junto al backend")
+    assert copia.read_bytes() == (backend / "utils" / "pipeline.py").read_bytes()
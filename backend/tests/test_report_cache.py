@@ -0,0 +1,125 @@
+import datetime
+import json
+import os
+
+from models.report_status import ReporteEstado
+from tasks.report_cache import (
+    calcular_huellas, cached_reports_query, evict_reports, find_cached_report, select_cached
+)
+from utils.report_formats import SUFIJO_PARCIAL, ruta_manifiesto, ruta_parte
+
+ACTUALIZADO = datetime.datetime(2024, 1, 15, 10, 0)
+
+
+def filas_huella(total_enviados: int = 10):
+    """Filas de fingerprint_query de dos campañas (id, nombre, estado, fecha, estado detalle, total, marca)"""
+    return [
+        (1, "Campaña 1", "ACTIVA", datetime.date(2024, 1, 15), "ENVIADO", total_enviados, ACTUALIZADO),
+        (1, "Campaña 1", "ACTIVA", datetime.date(2024, 1, 15), "FALLIDO", 2, ACTUALIZADO),
+        (2, "Campaña 2", "ACTIVA", datetime.date(2024, 1, 15), None, None, None),
+    ]
+
+
+def test_huella_por_campania():
+    huellas = calcular_huellas(filas_huella())
+
+    assert set(huellas) == {1, 2}
+    assert huellas == calcular_huellas(filas_huella())
+    assert huellas[1] != huellas[2]
+
+
+def test_huella_cambia_con_los_datos():
+    antes, despues = calcular_huellas(filas_huella(10)), calcular_huellas(filas_huella(11))
+
+    assert antes[1] != despues[1]
+    assert antes[2] == despues[2]
+
+
+def archivo(ruta, contenido: bytes = b"x", acceso: float = 0.0):
+    ruta.write_bytes(contenido)
+    if acceso:
+        os.utime(ruta, (acceso, ruta.stat().st_mtime))
+    return str(ruta)
+
+
+def test_select_cached_toma_el_mas_reciente_que_existe(tmp_path):
+    antiguo = archivo(tmp_path / "antiguo.csv")
+    otra_huella = archivo(tmp_path / "otra.csv")
+    rows = [
+        # Más reciente primero (cached_reports_query)
+        (1, "h1", str(tmp_path / "eliminado.csv"), 30),
+        (1, "h1", antiguo, 20),
+        (1, "h1", antiguo, 10),
+        (2, "vieja", otra_huella, 15),
+        (3, "h3", None, 5),
+    ]
+
+    assert select_cached(rows, {1: "h1", 2: "h2", 3: "h3"}) == {1: (20, antiguo)}
+
+
+def test_find_cached_report(sesiones, tmp_path):
+    ruta = archivo(tmp_path / "reporte.csv")
+    with sesiones() as db:
+        for formato, estado in [("csv", "COMPLETADO"), ("parquet", "COMPLETADO"), ("csv", "ERROR")]:
+            db.add(ReporteEstado(
+                id_campana=1, fecha=datetime.date(2024, 1, 15), formato=formato,
+                estado=estado, huella="h1", ruta_archivo=ruta
+            ))
+        db.commit()
+
+        assert find_cached_report(db, 1, "h1", "csv") == ruta
+        assert find_cached_report(db, 1, "h2", "csv") is None
+        assert find_cached_report(db, 1, "h1", "csv.gz") is None
+        ids = [id_reporte for *_, id_reporte in db.execute(cached_reports_query({1: "h1"}, "csv")).all()]
+        assert ids == [1]
+
+
+def test_evict_elimina_los_usados_hace_mas_tiempo(tmp_path):
+    viejo = archivo(tmp_path / "viejo.csv", b"x" * 100, acceso=1_000)
+    medio = archivo(tmp_path / "medio.csv", b"x" * 100, acceso=2_000)
+    nuevo = archivo(tmp_path / "nuevo.csv", b"x" * 100, acceso=3_000)
+
+    assert evict_reports(tmp_path, max_bytes=250) == [viejo]
+    assert evict_reports(tmp_path, max_bytes=0, max_archivos=1) == [medio]
+    assert os.listdir(tmp_path) == ["nuevo.csv"]
+    assert evict_reports(tmp_path, max_bytes=1) == [nuevo]
+
+
+def test_evict_respeta_conservar_y_parciales(tmp_path):
+    recien_generado = archivo(tmp_path / "generado.csv", b"x" * 100, acceso=1_000)
+    parcial = archivo(tmp_path / f"reanudable.csv{SUFIJO_PARCIAL}", b"x" * 100, acceso=500)
+    usado = archivo(tmp_path / "usado.csv", b"x" * 100, acceso=2_000)
+
+    assert evict_reports(tmp_path, max_bytes=50, conservar=[recien_generado]) == [usado]
+    assert os.path.exists(recien_generado) and os.path.exists(parcial)
+
+
+def reporte_con_partes(directorio, nombre: str, partes: int, acceso: float) -> list[str]:
+    """Manifiesto y partes de una exportación con partes; el manifiesto es el primero"""
+    rutas = [archivo(ruta_parte(directorio, nombre, numero, "csv"), b"x" * 100) for numero in range(partes)]
+    manifiesto = ruta_manifiesto(directorio, nombre)
+    manifiesto.write_text(json.dumps({"partes": [{"archivo": os.path.basename(ruta)} for ruta in rutas]}))
+    os.utime(manifiesto, (acceso, manifiesto.stat().st_mtime))
+    return [str(manifiesto), *rutas]
+
+
+def test_evict_elimina_el_manifiesto_con_sus_partes(tmp_path):
+    viejo = reporte_con_partes(tmp_path, "viejo", 2, acceso=1_000)
+    nuevo = reporte_con_partes(tmp_path, "nuevo", 2, acceso=3_000)
+    # Las partes de una exportación en curso: aún parciales o ya renombradas sin manifiesto
+    en_curso = [
+        archivo(ruta_parte(tmp_path, "en_curso", 0, "csv"), b"x" * 100, acceso=500),
+        archivo(tmp_path / f"en_curso.parte001.csv{SUFIJO_PARCIAL}", b"x" * 100, acceso=500),
+    ]
+
+    assert evict_reports(tmp_path, max_bytes=400) == viejo
+    assert all(os.path.exists(ruta) for ruta in nuevo + en_curso)
+
+
+def test_select_cached_requiere_todas_las_partes(tmp_path):
+    completo, *_ = reporte_con_partes(tmp_path, "completo", 2, acceso=1_000)
+    incompleto, _, parte = reporte_con_partes(tmp_path, "incompleto", 2, acceso=1_000)
+    os.remove(parte)
+    rows = [(1, "h1", incompleto, 20), (1, "h1", completo, 10)]
+
+    assert select_cached(rows, {1: "h1"}) == {1: (10, completo)}
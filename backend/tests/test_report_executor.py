@@ -0,0 +1,103 @@
+import datetime
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from models.report_status import ReporteEstado
+from tasks import report_executor as modulo
+from tasks.job_queue import MAX_INTENTOS
+from tasks.report_executor import ReportExecutor
+
+FECHA = datetime.date(2024, 1, 15)
+
+
+@pytest.fixture
+def executor(sesiones, monkeypatch):
+    """Pool de la API sobre el SQLite de prueba y detenido: los trabajos quedan en el planificador"""
+    monkeypatch.setattr(modulo, "Session", sesiones)
+    monkeypatch.setattr(modulo, "ESTADISTICAS_MATERIALIZADAS", False)
+    executor = ReportExecutor(max_workers=2)
+    executor._detenido = True
+    return executor
+
+
+def registrar(sesiones, **valores) -> int:
+    with sesiones() as db:
+        reporte = ReporteEstado(fecha=FECHA, **valores)
+        db.add(reporte)
+        db.commit()
+        return reporte.id
+
+
+def test_recuperar_planifica_trabajos_disponibles(executor, sesiones, ahora_utc):
+    vencido = datetime.timedelta(minutes=-5)
+    pendiente = registrar(sesiones, id_campana=1, estado="PENDIENTE")
+    reintento = registrar(sesiones, id_campana=2, estado="PENDIENTE", intentos=1)
+    abandonado = registrar(sesiones, id_campana=3, estado="EN PROCESO", lease_expira=ahora_utc + vencido, intentos=1)
+    registrar(sesiones, id_campana=4, estado="EN PROCESO", lease_expira=ahora_utc + datetime.timedelta(minutes=5), intentos=1)
+    registrar(sesiones, id_campana=5, estado="COMPLETADO")
+    agotado = registrar(sesiones, id_campana=6, estado="EN PROCESO", lease_expira=ahora_utc + vencido, intentos=MAX_INTENTOS)
+
+    assert executor.recuperar() == 3
+    assert executor._ids == {pendiente, reintento, abandonado}
+    assert executor.planificador.pendientes == 3
+
+    with sesiones() as db:
+        assert db.get(ReporteEstado, agotado).estado == "ERROR"
+
+
+def test_recuperar_no_repite_trabajos_planificados(executor, sesiones):
+    ids = [registrar(sesiones, id_campana=id_campana, estado="PENDIENTE") for id_campana in (1, 2)]
+
+    # La solicitud ya planificó el primero
+    assert executor.submit(ids[0])
+    assert executor.recuperar() == 1
+    assert executor.recuperar() == 0
+    assert not executor.submit(ids[1])
+    assert executor.planificador.pendientes == 2
+
+
+def test_trabajo_terminado_se_puede_recuperar(executor, sesiones):
+    id_reporte = registrar(sesiones, id_campana=1, estado="PENDIENTE")
+    executor._detenido = False
+
+    class Pool:
+        """Pool que termina cada trabajo al enviarlo, como un intento fallido que lo devolvió a PENDIENTE"""
+
+        def submit(self, funcion, argumento):
+            self.enviado = argumento
+            future = Future()
+            future.set_result({"contadores": {}, "histogramas": {}})
+            return future
+
+    executor._pool = Pool()
+
+    assert executor.recuperar() == 1
+    assert executor._pool.enviado == id_reporte
+    assert executor._ids == set()
+    assert executor.planificador.completados == 1
+
+    executor._detenido = True
+    assert executor.recuperar() == 1
+
+
+def test_sin_pool_no_recupera(sesiones, monkeypatch):
+    monkeypatch.setattr(modulo, "Session", sesiones)
+    registrar(sesiones, id_campana=1, estado="PENDIENTE")
+    assert ReportExecutor(max_workers=0).recuperar() == 0
+
+
+def test_recuperacion_periodica_se_detiene_con_shutdown(executor, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(executor, "recuperar", lambda: llamadas.append(1) or 0)
+
+    executor.iniciar_recuperacion(intervalo=0.01)
+    while len(llamadas) < 3:
+        time.sleep(0.01)
+    executor.shutdown(wait=False)
+
+    assert executor._recuperador is None
+    total = len(llamadas)
+    executor._parar.wait(0.05)
+    assert len(llamadas) == total
@@ -0,0 +1,178 @@
+import csv
+import gzip
+from pathlib import Path
+
+import pytest
+
+from utils.report_formats import (
+    DemuxEscritores, abrir_binario, abrir_escritor, formato_de_ruta, ruta_reporte, unir_partes
+)
+
+COLUMNAS = [("id", "int"), ("mensaje", "str")]
+FILAS = [(1, "¡Oferta! 10% en café"), (2, 'con "comillas", y comas')]
+
+
+def leer_csv(ruta: Path, formato: str) -> list[list[str]]:
+    if formato == "csv.gz":
+        archivo = gzip.open(ruta, "rt", newline="", encoding="utf-8")
+    elif formato == "csv.zst":
+        import zstandard
+        archivo = zstandard.open(ruta, "rt", newline="", encoding="utf-8")
+    else:
+        archivo = open(ruta, newline="", encoding="utf-8")
+    with archivo:
+        return list(csv.reader(archivo))
+
+
+@pytest.mark.parametrize("formato", ["csv", "csv.gz", "csv.zst"])
+def test_csv_con_y_sin_compresion(tmp_path, formato):
+    ruta = ruta_reporte(tmp_path, "reporte", formato)
+    escritor = abrir_escritor(ruta, formato, COLUMNAS)
+    escritor.escribir(FILAS[:1])
+    escritor.escribir(FILAS[1:])
+    escritor.close()
+
+    assert ruta.name == f"reporte.{formato}"
+    assert leer_csv(ruta, formato) == [["id", "mensaje"], *[[str(i), m] for i, m in FILAS]]
+
+
+@pytest.mark.parametrize("formato", ["csv.gz", "csv.zst"])
+def test_anexar_a_un_csv_comprimido(tmp_path, formato):
+    ruta = ruta_reporte(tmp_path, "reporte", formato)
+    for numero, filas in enumerate([FILAS[:1], FILAS[1:]]):
+        escritor = abrir_escritor(ruta, formato, COLUMNAS, encabezado=numero == 0, anexar=numero > 0)
+        escritor.escribir(filas)
+        escritor.close()
+
+    # Un miembro gzip o frame zstd nuevo por tramo: se lee como un solo CSV
+    assert leer_csv(ruta, formato) == [["id", "mensaje"], *[[str(i), m] for i, m in FILAS]]
+
+
+def test_binario_de_copy(tmp_path):
+    ruta = ruta_reporte(tmp_path, "reporte", "csv.gz")
+    with abrir_binario(ruta, "csv.gz") as salida:
+        salida.write(b"id,mensaje\r\n1,a\r\n")
+    assert leer_csv(ruta, "csv.gz") == [["id", "mensaje"], ["1", "a"]]
+
+    with pytest.raises(ValueError):
+        abrir_binario(tmp_path / "reporte.parquet", "parquet")
+
+
+def test_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    ruta = ruta_reporte(tmp_path, "reporte", "parquet")
+    escritor = abrir_escritor(ruta, "parquet", COLUMNAS)
+    escritor.escribir(FILAS)
+    escritor.close()
+
+    tabla = pq.read_table(ruta)
+    assert tabla.column_names == ["id", "mensaje"]
+    assert list(zip(*(columna.to_pylist() for columna in tabla.columns))) == FILAS
+
+    with pytest.raises(ValueError):
+        abrir_escritor(ruta, "parquet", COLUMNAS, anexar=True)
+
+
+def test_formato_de_ruta():
+    assert formato_de_ruta("reports/report_campaign_1.csv.gz") == "csv.gz"
+    assert formato_de_ruta("reports/report_campaign_1.csv.zst") == "csv.zst"
+    assert formato_de_ruta("reports/report_campaign_1.parquet") == "parquet"
+    assert formato_de_ruta("reports/report_campaign_1.csv") == "csv"
+
+    with pytest.raises(ValueError):
+        ruta_reporte(Path("reports"), "reporte", "xlsx")
+
+
+class Escritor:
+    """Escritor en memoria que registra sus filas y si se cerró"""
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.filas = []
+        self.cerrado = False
+
+    def escribir(self, filas):
+        self.filas.extend(filas)
+
+    def close(self):
+        self.cerrado = True
+
+
+def demux(max_abiertos: int):
+    abiertos = {}
+
+    def abrir(clave):
+        abiertos[clave] = Escritor(clave)
+        return abiertos[clave]
+
+    return DemuxEscritores(abrir, max_abiertos), abiertos
+
+
+def test_demux_cierra_el_usado_hace_mas_tiempo():
+    escritores, abiertos = demux(max_abiertos=2)
+    escritores.escribir(1, [(1,)])
+    escritores.escribir(2, [(2,)])
+    escritores.escribir(1, [(3,)])
+    # 2 es el usado hace más tiempo: se cierra al abrir 3
+    escritores.escribir(3, [(4,)])
+
+    assert abiertos[2].cerrado and not abiertos[1].cerrado
+    assert escritores.cerrados == {2}
+
+    escritores.close()
+    assert all(escritor.cerrado for escritor in abiertos.values())
+    assert abiertos[1].filas == [(1,), (3,)]
+
+
+def test_demux_no_reabre_una_clave_cerrada():
+    escritores, _ = demux(max_abiertos=1)
+    escritores.escribir(1, [(1,)])
+    escritores.escribir(2, [(2,)])
+
+    with pytest.raises(RuntimeError, match="agrupadas por clave"):
+        escritores.escribir(1, [(3,)])
+
+
+def test_demux_escribe_un_archivo_por_clave(tmp_path):
+    escritores = DemuxEscritores(lambda clave: abrir_escritor(tmp_path / f"{clave}.csv", "csv", COLUMNAS))
+    for clave, filas in [(10, [(1, "a"), (2, "b")]), (20, [(3, "c")])]:
+        escritores.escribir(clave, filas)
+    escritores.close()
+
+    with open(tmp_path / "10.csv", newline="", encoding="utf-8") as archivo:
+        assert list(csv.reader(archivo)) == [["id", "mensaje"], ["1", "a"], ["2", "b"]]
+    with open(tmp_path / "20.csv", newline="", encoding="utf-8") as archivo:
+        assert list(csv.reader(archivo)) == [["id", "mensaje"], ["3", "c"]]
+
+
+def test_unir_partes_gzip(tmp_path):
+    partes = []
+    for numero, filas in enumerate([[(1, "a")], [(2, "b")]]):
+        parte = tmp_path / f"parte{numero}.csv.gz"
+        escritor = abrir_escritor(parte, "csv.gz", COLUMNAS, encabezado=numero == 0)
+        escritor.escribir(filas)
+        escritor.close()
+        partes.append(parte)
+
+    destino = tmp_path / "reporte.csv.gz"
+    unir_partes(partes, destino, "csv.gz")
+
+    # Un gzip con varios miembros se lee como un solo archivo
+    with gzip.open(destino, "rt", newline="", encoding="utf-8") as archivo:
+        assert list(csv.reader(archivo)) == [["id", "mensaje"], ["1", "a"], ["2", "b"]]
+
+
+def test_unir_partes_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    partes = []
+    for numero, filas in enumerate([FILAS[:1], FILAS[1:]]):
+        parte = tmp_path / f"parte{numero}.parquet"
+        escritor = abrir_escritor(parte, "parquet", COLUMNAS)
+        escritor.escribir(filas)
+        escritor.close()
+        partes.append(parte)
+
+    destino = tmp_path / "reporte.parquet"
+    unir_partes(partes, destino, "parquet")
+    tabla = pq.read_table(destino)
+    assert list(zip(*(columna.to_pylist() for columna in tabla.columns))) == FILAS
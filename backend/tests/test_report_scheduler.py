@@ -0,0 +1,109 @@
+from tasks.report_scheduler import PlanificadorReportes, percentil
+
+
+class Reloj:
+    """Reloj falso: solo avanza cuando la prueba lo indica"""
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self) -> float:
+        return self.ahora
+
+
+def entregar(planificador: PlanificadorReportes, cantidad: int) -> list:
+    return [planificador.siguiente().clave for _ in range(cantidad)]
+
+
+def test_primero_el_mas_corto():
+    planificador = PlanificadorReportes(reloj=Reloj(), envejecimiento=0.0)
+    planificador.agregar_lote([("grande", 50.0), ("pequeno", 1.0), ("mediano", 5.0), ("pequeno_2", 1.0)])
+
+    # Empates por orden de llegada
+    assert entregar(planificador, 4) == ["pequeno", "pequeno_2", "mediano", "grande"]
+    assert planificador.siguiente() is None
+
+
+def test_por_llegada_sin_costo():
+    planificador = PlanificadorReportes(reloj=Reloj(), por_costo=False)
+    planificador.agregar_lote([("grande", 50.0), ("pequeno", 1.0)])
+    assert entregar(planificador, 2) == ["grande", "pequeno"]
+
+
+def flujo_con_grande(envejecimiento: float, segundos: int):
+    """
+    Un trabajo de 10 s al frente y uno de 1 s por segundo con un solo worker: retorna el segundo
+    en que se entrega el grande (None si no se entregó)
+    """
+    reloj = Reloj()
+    planificador = PlanificadorReportes(reloj=reloj, envejecimiento=envejecimiento)
+    planificador.agregar("grande", 10.0)
+    for segundo in range(segundos):
+        reloj.ahora = float(segundo)
+        planificador.agregar(f"pequeno_{segundo}", 1.0)
+        trabajo = planificador.siguiente()
+        planificador.terminar(trabajo.clave)
+        if trabajo.clave == "grande":
+            return segundo
+    return None
+
+
+def test_envejecimiento_evita_que_el_grande_espere_sin_limite():
+    # Sin envejecimiento los pequeños lo adelantan mientras sigan llegando
+    assert flujo_con_grande(envejecimiento=0.0, segundos=100) is None
+    # Con envejecimiento 1 solo lo adelantan los que llegan hasta 10 s después (costo / envejecimiento)
+    assert flujo_con_grande(envejecimiento=1.0, segundos=100) == 9
+
+
+def test_turnos_ponderados_por_costo_entre_grupos():
+    planificador = PlanificadorReportes(reloj=Reloj())
+    planificador.agregar_lote([(f"a{n}", 5.0) for n in range(3)], "fecha_a")
+    planificador.agregar_lote([(f"b{n}", 1.0) for n in range(10)], "fecha_b")
+
+    # Un trabajo de 5 s de la fecha A equivale a cinco de 1 s de la fecha B
+    grupos = [clave[0] for clave in entregar(planificador, 8)]
+    assert grupos == ["a", "b", "b", "b", "b", "b", "a", "b"]
+
+
+def test_grupo_nuevo_no_acapara_los_turnos():
+    planificador = PlanificadorReportes(reloj=Reloj())
+    planificador.agregar_lote([(f"a{n}", 1.0) for n in range(10)], "fecha_a")
+    entregar(planificador, 5)
+
+    # La fecha B empieza con el costo que ya recibió A: se alternan en lugar de pasar B completa
+    planificador.agregar_lote([(f"b{n}", 1.0) for n in range(5)], "fecha_b")
+    grupos = [clave[0] for clave in entregar(planificador, 6)]
+    assert grupos == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_un_solo_grupo_sin_turnos():
+    planificador = PlanificadorReportes(reloj=Reloj(), envejecimiento=0.0, por_grupo=False)
+    planificador.agregar("a_grande", 5.0, "fecha_a")
+    planificador.agregar("b_pequeno", 1.0, "fecha_b")
+    assert entregar(planificador, 2) == ["b_pequeno", "a_grande"]
+
+
+def test_tiempos_de_finalizacion():
+    reloj = Reloj()
+    planificador = PlanificadorReportes(reloj=reloj, ventana=3)
+    planificador.agregar_lote([(n, 1.0) for n in range(4)])
+
+    for segundo, clave in enumerate(entregar(planificador, 4), start=1):
+        reloj.ahora = float(segundo)
+        assert planificador.terminar(clave) == float(segundo)
+
+    # Trabajo no entregado o cancelado: no cuenta
+    assert planificador.terminar("otro") is None
+    resumen = planificador.resumen()
+    assert resumen["completados"] == 4
+    assert resumen["pendientes"] == resumen["en_curso"] == 0
+    # Solo los últimos tres (ventana)
+    assert resumen["media_segundos"] == 3.0
+    assert resumen["p95_segundos"] == 4.0
+
+
+def test_percentil():
+    assert percentil([], 95) is None
+    assert percentil([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentil(list(range(1, 101)), 95) == 95
+    assert percentil([7.0], 0) == 7.0
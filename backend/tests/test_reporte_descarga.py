@@ -0,0 +1,119 @@
+"""
+Descarga de reportes (GET /reporte/download/{id_reporte}) con TestClient, sobre la misma base
+SQLite que lee la sesión asíncrona de la API (aiosqlite).
+"""
+import asyncio
+import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from api.reporte import ReporteService
+from models.database import get_async_db
+from models.report_status import ReporteEstado
+from utils.file_response import ReportFileResponse
+
+CONTENIDO = b"id,mensaje\n" + b"".join(f"{i},mensaje {i}\n".encode() for i in range(1000))
+
+
+@pytest.fixture
+def reporte(sesiones, tmp_path):
+    """Id de un reporte completado y la ruta de su archivo"""
+    ruta = tmp_path / "report_campaign_1.csv"
+    ruta.write_bytes(CONTENIDO)
+    with sesiones() as db:
+        fila = ReporteEstado(
+            id_campana=1, fecha=datetime.date(2024, 1, 15), formato="csv",
+            estado="COMPLETADO", ruta_archivo=str(ruta)
+        )
+        db.add(fila)
+        db.commit()
+        return fila.id, ruta
+
+
+@pytest.fixture
+def cliente(sesiones, tmp_path):
+    # Sin pool: cada sesión cierra su conexión y no quedan hilos de aiosqlite abiertos
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'reportes.db'}", poolclass=NullPool)
+    sesion_async = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def db_de_prueba():
+        async with sesion_async() as db:
+            yield db
+
+    app = FastAPI()
+    ReporteService(app)
+    app.dependency_overrides[get_async_db] = db_de_prueba
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+def test_descarga_completa(cliente, reporte):
+    id_reporte, ruta = reporte
+    respuesta = cliente.get(f"/reporte/download/{id_reporte}")
+
+    assert respuesta.status_code == 200
+    assert respuesta.content == CONTENIDO
+    assert respuesta.headers["content-type"].startswith("text/csv")
+    assert ruta.name in respuesta.headers["content-disposition"]
+    assert respuesta.headers["cache-control"] == "private, no-cache"
+
+
+def test_descarga_por_rango(cliente, reporte):
+    id_reporte, _ = reporte
+    respuesta = cliente.get(f"/reporte/download/{id_reporte}", headers={"Range": "bytes=100-199"})
+
+    assert respuesta.status_code == 206
+    assert respuesta.content == CONTENIDO[100:200]
+    assert respuesta.headers["content-range"] == f"bytes 100-199/{len(CONTENIDO)}"
+
+
+def test_rango_fuera_del_archivo(cliente, reporte):
+    id_reporte, _ = reporte
+    respuesta = cliente.get(f"/reporte/download/{id_reporte}", headers={"Range": f"bytes={len(CONTENIDO) + 10}-"})
+
+    assert respuesta.status_code == 416
+    assert respuesta.headers["content-range"] == f"*/{len(CONTENIDO)}"
+
+
+def test_if_none_match_responde_304(cliente, reporte):
+    id_reporte, _ = reporte
+    etag = cliente.get(f"/reporte/download/{id_reporte}").headers["etag"]
+
+    respuesta = cliente.get(f"/reporte/download/{id_reporte}", headers={"If-None-Match": f"W/{etag}"})
+    assert respuesta.status_code == 304
+    assert respuesta.content == b""
+    assert respuesta.headers["etag"] == etag
+
+    otro = cliente.get(f"/reporte/download/{id_reporte}", headers={"If-None-Match": '"otra-version"'})
+    assert otro.status_code == 200
+
+
+def test_archivo_eliminado_responde_410(cliente, reporte):
+    id_reporte, ruta = reporte
+    ruta.unlink()
+
+    assert cliente.get(f"/reporte/download/{id_reporte}").status_code == 410
+    assert cliente.get(f"/reporte/download/{id_reporte + 1}").status_code == 404
+
+
+def test_envio_sin_copia_con_pathsend(tmp_path):
+    ruta = tmp_path / "reporte.csv"
+    ruta.write_bytes(CONTENIDO)
+    respuesta = ReportFileResponse(ruta, stat_result=ruta.stat(), media_type="text/csv")
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": {"http.response.pathsend": {}}}
+    mensajes = []
+
+    async def recibir():
+        return {"type": "http.request"}
+
+    async def enviar(mensaje):
+        mensajes.append(mensaje)
+
+    asyncio.run(respuesta(scope, recibir, enviar))
+
+    assert [mensaje["type"] for mensaje in mensajes] == ["http.response.start", "http.response.pathsend"]
+    assert mensajes[1]["path"] == str(ruta)
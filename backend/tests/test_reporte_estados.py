@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from api.reporte import ReporteService
+
+
+def reporte(id_campana: int, estado: str):
+    return SimpleNamespace(id_campana=id_campana, estado=estado)
+
+
+def test_flujo_por_ids_espera_campanias_sin_reporte():
+    filtro = {"ids_campana": [1, 2, 3], "fecha": None}
+    reportes = [reporte(1, "COMPLETADO"), reporte(2, "ERROR")]
+
+    assert not ReporteService._estados_terminados(filtro, reportes)
+    assert ReporteService._estados_terminados(filtro, reportes + [reporte(3, "COMPLETADO")])
+
+
+def test_flujo_por_ids_espera_reportes_activos():
+    filtro = {"ids_campana": [1, 2], "fecha": None}
+    assert not ReporteService._estados_terminados(filtro, [reporte(1, "COMPLETADO"), reporte(2, "EN PROCESO")])
+
+
+def test_flujo_por_fecha_termina_con_los_reportes_encontrados():
+    filtro = {"ids_campana": None, "fecha": "2024-01-15"}
+
+    assert not ReporteService._estados_terminados(filtro, [])
+    assert not ReporteService._estados_terminados(filtro, [reporte(1, "COMPLETADO"), reporte(2, "PENDIENTE")])
+    assert ReporteService._estados_terminados(filtro, [reporte(1, "COMPLETADO"), reporte(2, "ERROR")])
@@ -0,0 +1,37 @@
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Caché en memoria del proceso con expiración por tiempo.
+    Pensada para valores costosos de calcular que toleran cierta desactualización (por ejemplo, conteos).
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._items: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            expira, valor = item
+            if expira <= self.clock():
+                del self._items[key]
+                return None
+
+            return valor
+
+    def set(self, key: Hashable, valor: Any):
+        with self._lock:
+            self._items[key] = (self.clock() + self.ttl, valor)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
@@ -0,0 +1,22 @@
+import base64
+import json
+from fastapi import HTTPException
+
+def codificar_cursor(datos: dict) -> str:
+    """Codifica la posición de una página keyset en un cursor opaco (base64 url-safe)."""
+
+    contenido = json.dumps(datos, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(contenido).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> dict:
+    """Decodifica un cursor generado por codificar_cursor."""
+
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(datos, dict):
+            raise ValueError(cursor)
+        return datos
+
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido.")
@@ -0,0 +1,71 @@
+import os
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+
+def etag_coincide(if_none_match: str, etag: str) -> bool:
+    """
+    Compara el encabezado If-None-Match con el ETag del archivo (comparación débil, RFC 9110):
+    acepta '*' y listas separadas por comas, con o sin el prefijo W/.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(candidato.strip().removeprefix("W/") == etag for candidato in if_none_match.split(","))
+
+
+class ReportFileResponse(FileResponse):
+    """
+    FileResponse para descargar reportes grandes:
+
+    - If-None-Match: si el cliente ya tiene la versión actual (mismo ETag) responde 304 sin cuerpo.
+    - Range / If-Range: descargas parciales y reanudables (206), resueltas por FileResponse.
+    - Envío sin copia: una descarga completa (GET sin Range) se entrega con sendfile() si el
+      servidor ASGI ofrece las extensiones http.response.pathsend o http.response.zerocopysend,
+      en lugar de leer el archivo en Python. El resto (HEAD, rangos, servidores sin extensiones)
+      lo envía FileResponse en bloques de chunk_size.
+
+    Solo se usa la interfaz pública de FileResponse (__call__, headers, stat_result), de modo
+    que no depende de sus métodos internos entre versiones de Starlette.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Los clientes pueden guardar el archivo pero deben revalidarlo (ETag) antes de usarlo
+        self.headers.setdefault("cache-control", "private, no-cache")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = Headers(scope=scope)
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None and self.stat_result is not None and etag_coincide(if_none_match, self.headers["etag"]):
+            no_modificado = Response(status_code=304, headers={
+                clave: self.headers[clave]
+                for clave in ("etag", "last-modified", "cache-control")
+            })
+            return await no_modificado(scope, receive, send)
+
+        extensiones = scope.get("extensions") or {}
+        completo = scope["method"].upper() == "GET" and headers.get("range") is None and self.stat_result is not None
+        if not completo or not extensiones.keys() & {"http.response.pathsend", "http.response.zerocopysend"}:
+            return await super().__call__(scope, receive, send)
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if "http.response.pathsend" in extensiones:
+            await send({"type": "http.response.pathsend", "path": os.fspath(self.path)})
+        else:
+            # El servidor ASGI lee el descriptor con sendfile(); se cierra al terminar el envío
+            with open(self.path, "rb") as archivo:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": archivo,
+                    "offset": 0,
+                    "count": self.stat_result.st_size,
+                    "more_body": False
+                })
+
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,243 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+# Límites (segundos) de los histogramas de duración
+BUCKETS_SQL = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_REPORTE = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Tipo MIME del formato de texto de Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _etiquetas(labels: dict) -> tuple:
+    return tuple(sorted((clave, str(valor)) for clave, valor in labels.items()))
+
+
+def _formatear_etiquetas(etiquetas: tuple) -> str:
+    if not etiquetas:
+        return ""
+    pares = ",".join(f'{clave}="{valor}"' for clave, valor in etiquetas)
+    return "{" + pares + "}"
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas en memoria del proceso (contadores e histogramas con etiquetas),
+    exportable en el formato de texto de Prometheus.
+
+    Los procesos del pool de reportes entregan sus métricas con drain() y el proceso de la API
+    las acumula con merge(), de modo que /metrics muestra también el trabajo de los hijos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definiciones: dict[str, tuple[str, str, tuple]] = {}
+        self._contadores: dict[tuple[str, tuple], float] = {}
+        self._histogramas: dict[tuple[str, tuple], list] = {}
+        self._gauges: list[Callable[[], list[tuple[str, dict, float]]]] = []
+
+    def counter(self, nombre: str, ayuda: str):
+        self._definiciones[nombre] = ("counter", ayuda, ())
+
+    def histogram(self, nombre: str, ayuda: str, buckets: tuple = BUCKETS_SQL):
+        self._definiciones[nombre] = ("histogram", ayuda, tuple(buckets))
+
+    def gauge(self, nombre: str, ayuda: str):
+        self._definiciones[nombre] = ("gauge", ayuda, ())
+
+    def gauge_callback(self, funcion: Callable[[], list[tuple[str, dict, float]]]):
+        """Registra una función que calcula gauges (nombre, etiquetas, valor) al exportar"""
+        self._gauges.append(funcion)
+
+    def inc(self, nombre: str, valor: float = 1, **labels):
+        clave = (nombre, _etiquetas(labels))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observe(self, nombre: str, valor: float, **labels):
+        buckets = self._definiciones[nombre][2]
+        clave = (nombre, _etiquetas(labels))
+        with self._lock:
+            serie = self._histogramas.get(clave)
+            if serie is None:
+                # [conteo por bucket..., +Inf] + [suma]
+                serie = self._histogramas[clave] = [0] * (len(buckets) + 1) + [0.0]
+            serie[bisect.bisect_left(buckets, valor)] += 1
+            serie[-1] += valor
+
+    def drain(self) -> dict:
+        """Retorna las series acumuladas y las reinicia (para enviarlas a otro proceso)"""
+        with self._lock:
+            datos = {"contadores": self._contadores, "histogramas": self._histogramas}
+            self._contadores, self._histogramas = {}, {}
+        return datos
+
+    def merge(self, datos: dict):
+        """Suma las series entregadas por drain() de otro proceso"""
+        with self._lock:
+            for clave, valor in datos["contadores"].items():
+                self._contadores[clave] = self._contadores.get(clave, 0) + valor
+            for clave, serie in datos["histogramas"].items():
+                actual = self._histogramas.get(clave)
+                self._histogramas[clave] = serie[:] if actual is None else [a + b for a, b in zip(actual, serie)]
+
+    def render(self) -> str:
+        """Exporta todas las series en el formato de texto de Prometheus"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {clave: serie[:] for clave, serie in self._histogramas.items()}
+
+        gauges: dict[tuple[str, tuple], float] = {}
+        for funcion in self._gauges:
+            for nombre, labels, valor in funcion():
+                gauges[(nombre, _etiquetas(labels))] = valor
+
+        lineas = []
+        for nombre, (tipo, ayuda, buckets) in sorted(self._definiciones.items()):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+            if tipo == "histogram":
+                for (serie_nombre, etiquetas), serie in sorted(histogramas.items()):
+                    if serie_nombre != nombre:
+                        continue
+                    acumulado = 0
+                    for limite, conteo in zip((*buckets, "+Inf"), serie[:-1]):
+                        acumulado += conteo
+                        le = _formatear_etiquetas(etiquetas + (("le", str(limite)),))
+                        lineas.append(f"{nombre}_bucket{le} {acumulado}")
+                    lineas.append(f"{nombre}_sum{_formatear_etiquetas(etiquetas)} {serie[-1]}")
+                    lineas.append(f"{nombre}_count{_formatear_etiquetas(etiquetas)} {acumulado}")
+            else:
+                series = contadores if tipo == "counter" else gauges
+                for (serie_nombre, etiquetas), valor in sorted(series.items()):
+                    if serie_nombre == nombre:
+                        lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {valor}")
+
+        return "\n".join(lineas) + "\n"
+
+
+# Registro compartido por el proceso
+registry = MetricsRegistry()
+
+registry.counter("sql_sentencias_total", "Sentencias SQL ejecutadas por engine")
+registry.histogram("sql_sentencia_segundos", "Duración de las sentencias SQL por engine", BUCKETS_SQL)
+registry.counter("reportes_total", "Reportes generados por tipo y resultado")
+registry.histogram("reporte_fase_segundos", "Duración de cada fase de la generación de un reporte", BUCKETS_REPORTE)
+registry.counter("reporte_filas_total", "Filas leídas de la base de datos para los reportes")
+registry.counter("reporte_bytes_total", "Bytes escritos en los archivos de reporte")
+registry.counter("reporte_sql_sentencias_total", "Sentencias SQL ejecutadas durante la generación de reportes")
+
+
+# Medición del reporte en curso en el hilo actual; los hooks de SQL le suman sus sentencias
+MEDICION_ACTUAL: contextvars.ContextVar[Optional["MedicionReporte"]] = contextvars.ContextVar("medicion_reporte", default=None)
+
+
+class MedicionReporte:
+    """
+    Tiempos por fase de la generación de un reporte (consulta, escritura, fsync),
+    filas leídas, bytes escritos y sentencias SQL ejecutadas.
+    """
+
+    def __init__(self, tipo: str):
+        self.tipo = tipo
+        self.fases: dict[str, float] = {}
+        self.filas = 0
+        self.bytes = 0
+        self.sentencias = 0
+        self.tiempo_sql = 0.0
+        self._token = None
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self._token = MEDICION_ACTUAL.set(self)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_exc, *exc):
+        self.fases["total"] = time.perf_counter() - self._inicio
+        MEDICION_ACTUAL.reset(self._token)
+        self.registrar("error" if tipo_exc else "ok")
+
+    @contextmanager
+    def fase(self, nombre: str):
+        """Acumula el tiempo del bloque en la fase indicada"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = self.fases.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def registrar(self, resultado: str):
+        registry.inc("reportes_total", tipo=self.tipo, resultado=resultado)
+        registry.inc("reporte_filas_total", self.filas, tipo=self.tipo)
+        registry.inc("reporte_bytes_total", self.bytes, tipo=self.tipo)
+        registry.inc("reporte_sql_sentencias_total", self.sentencias, tipo=self.tipo)
+        for fase, segundos in self.fases.items():
+            registry.observe("reporte_fase_segundos", segundos, tipo=self.tipo, fase=fase)
+
+    def resumen(self) -> str:
+        fases = ", ".join(f"{fase} {segundos:.3f}s" for fase, segundos in self.fases.items())
+        return (f"{fases}; {self.filas} filas, {self.bytes / 1024 / 1024:.1f} MB, "
+                f"{self.sentencias} sentencias SQL ({self.tiempo_sql:.3f}s)")
+
+
+def instrumentar_engine(engine, nombre: str):
+    """
+    Registra hooks de SQLAlchemy que cuentan y miden cada sentencia ejecutada por el engine
+    (síncrono o asíncrono) en el registro de métricas y en la medición del reporte en curso.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_sentencia", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("inicio_sentencia")
+        if not inicios:
+            return
+        duracion = time.perf_counter() - inicios.pop()
+        registry.inc("sql_sentencias_total", engine=nombre)
+        registry.observe("sql_sentencia_segundos", duracion, engine=nombre)
+
+        medicion = MEDICION_ACTUAL.get()
+        if medicion is not None:
+            medicion.sentencias += 1
+            medicion.tiempo_sql += duracion
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # La sentencia falló: descartar su inicio para no desalinear la pila
+        if context.connection is not None:
+            inicios = context.connection.info.get("inicio_sentencia")
+            if inicios:
+                inicios.pop()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        cuerpo = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(puerto: int) -> ThreadingHTTPServer:
+    """Expone el registro del proceso en http://0.0.0.0:puerto/ (workers fuera de la API)"""
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), _MetricsHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
@@ -0,0 +1,99 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from typing import Iterable
+
+# Este módulo está copiado en backend/utils/pipeline.py y middleware/utils/pipeline.py: las dos
+# aplicaciones se despliegan por separado y no comparten paquete. Los archivos deben ser
+# idénticos (lo verifica backend/tests/test_pipeline.py)
+
+# Lectura y escritura de los reportes en paralelo: un hilo trae los lotes de la base de datos
+# mientras el hilo principal los codifica y escribe en el archivo
+REPORT_PIPELINE = os.getenv("REPORT_PIPELINE", "true").lower() == "true"
+
+# Lotes leídos que pueden esperar a ser escritos; si la cola se llena el lector se detiene,
+# por lo que la memoria queda acotada a PIPELINE_PROFUNDIDAD lotes
+PIPELINE_PROFUNDIDAD = int(os.getenv("PIPELINE_PROFUNDIDAD", 4))
+
+_FIN = object()
+
+
+class _Error:
+    def __init__(self, excepcion: BaseException):
+        self.excepcion = excepcion
+
+
+class TuberiaLotes:
+    """
+    Productor/consumidor entre la lectura de lotes y su escritura. Un hilo recorre el iterable
+    de lotes (por ejemplo Result.partitions() de un cursor del servidor) y los deja en una cola
+    acotada; el hilo que itera la tubería los recibe en orden.
+
+    Los errores del lector se relanzan en el hilo que escribe. Al salir del bloque with (también
+    por un error de escritura) el lector se detiene y se espera a que termine, así la conexión
+    no queda en uso por otro hilo.
+
+        with TuberiaLotes(result.partitions()) as lotes:
+            for lote in lotes:
+                writer.escribir(lote)
+    """
+
+    def __init__(self, lotes: Iterable, profundidad: int = PIPELINE_PROFUNDIDAD):
+        self._lotes = lotes
+        self._cola: queue.Queue = queue.Queue(maxsize=max(1, profundidad))
+        self._detener = threading.Event()
+        # El lector comparte el contexto (medición del reporte en curso) del hilo que lo crea
+        contexto = contextvars.copy_context()
+        self._hilo = threading.Thread(target=contexto.run, args=(self._producir,), daemon=True)
+        # Segundos del lector trayendo lotes y del escritor esperando lotes (diagnóstico del cuello de botella)
+        self.segundos_lectura = 0.0
+        self.segundos_espera = 0.0
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        while self._hilo.is_alive():
+            # Liberar espacio por si el lector está bloqueado en put()
+            try:
+                self._cola.get_nowait()
+            except queue.Empty:
+                pass
+            self._hilo.join(timeout=0.05)
+
+    def __iter__(self):
+        while True:
+            inicio = time.perf_counter()
+            item = self._cola.get()
+            self.segundos_espera += time.perf_counter() - inicio
+
+            if item is _FIN:
+                return
+            if isinstance(item, _Error):
+                raise item.excepcion
+            yield item
+
+    def _poner(self, item) -> bool:
+        while not self._detener.is_set():
+            try:
+                self._cola.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producir(self):
+        try:
+            iterador = iter(self._lotes)
+            while not self._detener.is_set():
+                inicio = time.perf_counter()
+                lote = next(iterador, _FIN)
+                self.segundos_lectura += time.perf_counter() - inicio
+                if not self._poner(lote) or lote is _FIN:
+                    return
+        except BaseException as e:
+            self._poner(_Error(e))
@@ -0,0 +1,292 @@
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Iterable, Protocol
+
+# Formatos de salida de los reportes; el formato es también la extensión del archivo
+# - csv: texto plano
+# - csv.gz / csv.zst: CSV comprimido en streaming (gzip o zstd)
+# - parquet: columnar, escrito por grupos de filas con Arrow
+FORMATOS = ("csv", "csv.gz", "csv.zst", "parquet")
+
+# Tipo MIME de cada formato para la descarga
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "csv.zst": "application/zstd",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Nivel de compresión: gzip 6 (el de la herramienta gzip) y zstd 3 (el de la librería)
+GZIP_NIVEL = 6
+ZSTD_NIVEL = 3
+
+# Filas por row group de Parquet: grupos grandes comprimen mejor y se leen más rápido
+PARQUET_FILAS_POR_GRUPO = 128 * 1024
+
+# Tamaño del buffer de escritura del archivo (bytes)
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Tipo de cada columna de un reporte: int o str
+Columnas = list[tuple[str, str]]
+
+# Sufijo del archivo mientras se escribe por tramos; al terminar se renombra a su nombre final
+SUFIJO_PARCIAL = ".parcial"
+
+# Exportación con partes: report_x.parte000.csv, report_x.parte001.csv... y report_x.manifest.json
+SUFIJO_MANIFIESTO = ".manifest.json"
+_PARTE = re.compile(r"\.parte\d{3}\.")
+
+
+class EscritorReporte(Protocol):
+    """Codificador de un reporte: recibe lotes de filas y los escribe en el archivo"""
+
+    def escribir(self, filas: Iterable[tuple]): ...
+
+    def close(self): ...
+
+
+def validar_formato(formato: str):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido '{formato}'. Opciones: {', '.join(FORMATOS)}")
+
+
+def ruta_reporte(directorio: Path, nombre: str, formato: str) -> Path:
+    """Ruta del archivo de reporte con la extensión de su formato (report_x.csv.gz, report_x.parquet...)"""
+    validar_formato(formato)
+    return directorio / f"{nombre}.{formato}"
+
+
+def ruta_parcial(filepath: Path) -> Path:
+    """Archivo en el que se escribe el reporte antes de promoverlo a filepath (report_x.csv.gz.parcial)"""
+    return filepath.with_name(filepath.name + SUFIJO_PARCIAL)
+
+
+def ruta_parte(directorio: Path, nombre: str, numero: int, formato: str) -> Path:
+    """Ruta de una parte de la exportación fragmentada (report_x.parte003.csv.gz)"""
+    return ruta_reporte(directorio, f"{nombre}.parte{numero:03d}", formato)
+
+
+def ruta_manifiesto(directorio: Path, nombre: str) -> Path:
+    """Ruta del manifiesto que lista las partes de un reporte (report_x.manifest.json)"""
+    return directorio / f"{nombre}{SUFIJO_MANIFIESTO}"
+
+
+def reporte_de_archivo(nombre_archivo: str) -> str:
+    """
+    Reporte al que pertenece un archivo de reports/: el nombre sin extensión para las partes
+    y el manifiesto (report_x), el propio nombre de archivo para el resto
+    """
+    if nombre_archivo.endswith(SUFIJO_MANIFIESTO):
+        return nombre_archivo[:-len(SUFIJO_MANIFIESTO)]
+    parte = _PARTE.search(nombre_archivo)
+    return nombre_archivo[:parte.start()] if parte else nombre_archivo
+
+
+def partes_de_manifiesto(manifiesto: Path) -> list[Path]:
+    """Archivos de parte listados en un manifiesto, en orden"""
+    with open(manifiesto, encoding="utf-8") as archivo:
+        return [manifiesto.parent / parte["archivo"] for parte in json.load(archivo)["partes"]]
+
+
+def formato_de_ruta(ruta: str) -> str:
+    """Formato de un archivo de reporte a partir de su extensión"""
+    for formato in sorted(FORMATOS, key=len, reverse=True):
+        if ruta.endswith(f".{formato}"):
+            return formato
+    return "csv"
+
+
+def abrir_binario(filepath: Path, formato: str, anexar: bool = False):
+    """
+    Abre el archivo para escribir bytes de CSV, comprimiéndolos si el formato lo indica.
+    Lo usa COPY TO STDOUT, que entrega el CSV ya formateado por PostgreSQL.
+    Con anexar se escribe al final del archivo (en gzip y zstd, como un miembro o frame nuevo).
+    """
+    modo = 'ab' if anexar else 'wb'
+    if formato == "csv":
+        return open(filepath, modo, buffering=WRITE_BUFFER_SIZE)
+    if formato == "csv.gz":
+        return gzip.open(filepath, modo, compresslevel=GZIP_NIVEL)
+    if formato == "csv.zst":
+        import zstandard
+        return zstandard.open(filepath, modo, cctx=zstandard.ZstdCompressor(level=ZSTD_NIVEL))
+    raise ValueError(f"El formato '{formato}' no es un CSV")
+
+
+def abrir_texto(filepath: Path, formato: str, anexar: bool = False):
+    """Abre el archivo para escribir CSV como texto UTF-8, comprimido si el formato lo indica"""
+    modo = 'a' if anexar else 'w'
+    if formato == "csv":
+        return open(filepath, modo, newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+    if formato == "csv.gz":
+        return gzip.open(filepath, f'{modo}t', compresslevel=GZIP_NIVEL, newline='', encoding='utf-8')
+    if formato == "csv.zst":
+        import zstandard
+        return zstandard.open(
+            filepath, f'{modo}t', cctx=zstandard.ZstdCompressor(level=ZSTD_NIVEL), newline='', encoding='utf-8'
+        )
+    raise ValueError(f"El formato '{formato}' no es un CSV")
+
+
+class EscritorCSV:
+    """CSV (plano o comprimido en streaming) con encabezado (opcional para las partes de un reporte)"""
+
+    def __init__(self, filepath: Path, formato: str, columnas: Columnas, encabezado: bool = True, anexar: bool = False):
+        self.archivo = abrir_texto(filepath, formato, anexar)
+        self.writer = csv.writer(self.archivo)
+        if encabezado:
+            self.writer.writerow([nombre for nombre, _ in columnas])
+
+    def escribir(self, filas: Iterable[tuple]):
+        self.writer.writerows(filas)
+
+    def close(self):
+        self.archivo.close()
+
+
+class EscritorParquet:
+    """
+    Parquet escrito por row groups con Arrow: las filas se acumulan por columna y cada
+    PARQUET_FILAS_POR_GRUPO filas se escribe un grupo, por lo que la memoria no depende
+    del tamaño de la campaña.
+    """
+
+    TIPOS = {"int": "int64", "str": "string"}
+
+    def __init__(self, filepath: Path, columnas: Columnas, filas_por_grupo: int = PARQUET_FILAS_POR_GRUPO):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([(nombre, self.TIPOS[tipo]) for nombre, tipo in columnas])
+        self.writer = pq.ParquetWriter(filepath, self.schema, compression="zstd")
+        self.filas_por_grupo = filas_por_grupo
+        self._pendientes: list[tuple] = []
+
+    def escribir(self, filas: Iterable[tuple]):
+        self._pendientes.extend(filas)
+        if len(self._pendientes) >= self.filas_por_grupo:
+            self._escribir_grupo()
+
+    def _escribir_grupo(self):
+        if not self._pendientes:
+            return
+        columnas = zip(*self._pendientes)
+        tabla = self._pa.Table.from_arrays(
+            [self._pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self.schema)],
+            schema=self.schema
+        )
+        self.writer.write_table(tabla, row_group_size=len(self._pendientes))
+        self._pendientes = []
+
+    def close(self):
+        self._escribir_grupo()
+        self.writer.close()
+
+
+def abrir_escritor(
+    filepath: Path,
+    formato: str,
+    columnas: Columnas,
+    encabezado: bool = True,
+    anexar: bool = False
+) -> EscritorReporte:
+    """
+    Crea el codificador del formato indicado (Parquet siempre lleva su esquema).
+    Con anexar las filas se agregan al final del archivo; Parquet no lo admite.
+    """
+    validar_formato(formato)
+    if formato == "parquet":
+        if anexar:
+            raise ValueError("Parquet no admite agregar filas a un archivo existente")
+        return EscritorParquet(filepath, columnas)
+    return EscritorCSV(filepath, formato, columnas, encabezado, anexar)
+
+
+class DemuxEscritores:
+    """
+    Reparte las filas de un recorrido en un archivo por clave (por ejemplo, una campaña),
+    con a lo sumo max_abiertos archivos abiertos: al abrir uno más se cierra el usado hace
+    más tiempo. Un archivo cerrado no se reabre (Parquet no admite agregar filas), así que el
+    recorrido debe entregar juntas las filas de cada clave (ORDER BY clave).
+    """
+
+    def __init__(self, abrir, max_abiertos: int = 1):
+        self._abrir = abrir
+        self.max_abiertos = max(1, max_abiertos)
+        # Escritores abiertos en orden de uso (el último es el más reciente)
+        self._abiertos: dict = {}
+        self.cerrados: set = set()
+
+    def escribir(self, clave, filas: Iterable[tuple]):
+        writer = self._abiertos.pop(clave, None)
+        if writer is None:
+            if clave in self.cerrados:
+                raise RuntimeError(f"El archivo de {clave} ya se cerró: las filas deben llegar agrupadas por clave")
+            while len(self._abiertos) >= self.max_abiertos:
+                self.cerrar(next(iter(self._abiertos)))
+            writer = self._abrir(clave)
+        self._abiertos[clave] = writer
+        writer.escribir(filas)
+
+    def cerrar(self, clave):
+        writer = self._abiertos.pop(clave, None)
+        if writer is not None:
+            writer.close()
+            self.cerrados.add(clave)
+
+    def close(self):
+        for clave in list(self._abiertos):
+            self.cerrar(clave)
+
+
+def _copiar_archivo(origen: Path, destino):
+    """Agrega el archivo origen al final de destino; copy_file_range copia dentro del kernel"""
+    with open(origen, 'rb') as entrada:
+        restante = os.fstat(entrada.fileno()).st_size
+        if hasattr(os, "copy_file_range"):
+            try:
+                while restante > 0:
+                    copiados = os.copy_file_range(entrada.fileno(), destino.fileno(), restante)
+                    if copiados == 0:
+                        break
+                    restante -= copiados
+                return
+            except OSError:
+                # Sistemas de archivos sin soporte: se continúa desde la posición actual
+                entrada.seek(os.fstat(entrada.fileno()).st_size - restante)
+        shutil.copyfileobj(entrada, destino, WRITE_BUFFER_SIZE)
+
+
+def unir_partes(partes: list[Path], destino: Path, formato: str):
+    """
+    Une en orden las partes de un reporte en un solo archivo. Las partes CSV se concatenan
+    byte a byte: un gzip con varios miembros y un zstd con varios frames siguen siendo archivos
+    válidos, así que no se descomprimen. Las partes Parquet se reescriben por row groups.
+    """
+    validar_formato(formato)
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for parte in partes:
+                archivo = pq.ParquetFile(parte)
+                if writer is None:
+                    writer = pq.ParquetWriter(destino, archivo.schema_arrow, compression="zstd")
+                for grupo in range(archivo.num_row_groups):
+                    writer.write_table(archivo.read_row_group(grupo))
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+
+    # Sin buffer de Python: copy_file_range escribe directamente en el descriptor
+    with open(destino, 'wb', buffering=0) as salida:
+        for parte in partes:
+            _copiar_archivo(parte, salida)
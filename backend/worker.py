@@ -0,0 +1,76 @@
+import argparse
+import multiprocessing
+import time
+
+from models.database import Base, engine, worker_engine, WorkerSession
+from models.ta_sms_maestro import TaSmsMaestro
+from models.ta_sms_detalle import TaSmsDetalle
+from models.report_status import ReporteEstado
+from tasks.job_queue import expire_exhausted_jobs, run_job, worker_id
+from utils.metrics import serve_metrics
+
+
+def worker_loop(intervalo: float, una_vez: bool, puerto_metricas: int = 0):
+    """
+    Procesa trabajos de la cola de reporte_estado hasta que se detenga el proceso.
+    Con una_vez, termina cuando la cola queda vacía.
+    Con puerto_metricas, expone las métricas del proceso en formato Prometheus.
+    """
+    # Cada proceso usa su propio pool de conexiones
+    worker_engine.dispose(close=False)
+    worker = worker_id()
+    if puerto_metricas:
+        serve_metrics(puerto_metricas)
+        print(f"Worker {worker} iniciado (métricas en el puerto {puerto_metricas})")
+    else:
+        print(f"Worker {worker} iniciado")
+
+    while True:
+        try:
+            if run_job(WorkerSession, worker=worker):
+                continue
+
+            # Cola vacía: cerrar trabajos abandonados que agotaron sus intentos y esperar
+            with WorkerSession() as db:
+                expire_exhausted_jobs(db)
+
+        except Exception as e:
+            print(f"Error en worker {worker}: {str(e)}")
+
+        if una_vez:
+            break
+
+        time.sleep(intervalo)
+
+
+def run_worker():
+    parser = argparse.ArgumentParser(description="Worker de generación de reportes (cola en reporte_estado)")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos worker a lanzar en este nodo")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera cuando la cola está vacía")
+    parser.add_argument("--una-vez", action="store_true", help="Procesar la cola pendiente y terminar")
+    parser.add_argument("--puerto-metricas", type=int, default=0,
+                        help="Puerto de las métricas Prometheus del primer proceso; los siguientes usan los puertos consecutivos")
+    args = parser.parse_args()
+
+    # Crear tablas si no existen
+    Base.metadata.create_all(bind=engine)
+
+    if args.procesos == 1:
+        worker_loop(args.intervalo, args.una_vez, args.puerto_metricas)
+        return
+
+    procesos = [
+        multiprocessing.Process(
+            target=worker_loop,
+            args=(args.intervalo, args.una_vez, args.puerto_metricas + i if args.puerto_metricas else 0)
+        )
+        for i in range(args.procesos)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join()
+
+
+if __name__ == "__main__":
+    run_worker()
@@ -36,7 +36,7 @@ interface CampaniasContextType {
   generatingReports: boolean;
   setGeneratingReports: (generating: boolean) => void;
   checkReportStatus: (campaignId: number) => Promise<ReportStatus>;
-  downloadReport: (filePath: string) => Promise<void>;
+  downloadReport: (urlDescarga: string) => Promise<void>;
 }
 
 const CampaniasContext = createContext<CampaniasContextType | undefined>(undefined);
@@ -83,18 +83,15 @@ export const CampaniasProvider: React.FC<{ children: React.ReactNode }> = ({ chi
     return response.value!;
   };
 
-  const downloadReport = async (filePath: string) => {
+  const downloadReport = async (urlDescarga: string) => {
     try {
-      const response = await http.get('/reports/download', { path: filePath }, true);
-      if (response.value) {
-        const url = window.URL.createObjectURL(new Blob([response.value as any]));
-        const link = document.createElement('a');
-        link.href = url;
-        link.setAttribute('download', filePath.split('/').pop() || 'reporte.csv');
-        document.body.appendChild(link);
-        link.click();
-        link.remove();
-      }
+      // El navegador descarga el archivo directamente (sin cargarlo en memoria) y puede reanudarlo
+      const link = document.createElement('a');
+      link.href = `${import.meta.env.VITE_IP_BACKEND_MAIN}${urlDescarga}`;
+      link.setAttribute('download', '');
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
     } catch (error) {
       console.error('Error descargando reporte:', error);
     }
@@ -26,8 +26,8 @@ const TableComponent: React.FC = () => {
   const handleDownloadReport = async (id: number) => {
     try {
       const status = await checkReportStatus(id);
-      if (status.estado === 'COMPLETADO' && status.ruta_archivo) {
-        await downloadReport(status.ruta_archivo);
+      if (status.estado === 'COMPLETADO' && status.url_descarga) {
+        await downloadReport(status.url_descarga);
       } else {
         message.info('El reporte aún no está disponible');
       }
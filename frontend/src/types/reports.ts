@@ -2,7 +2,9 @@ export interface ReportStatus {
   id_campana: number;
   estado: 'PENDIENTE' | 'EN PROCESO' | 'COMPLETADO' | 'ERROR';
   fecha: string;
+  formato: 'csv' | 'csv.gz' | 'csv.zst' | 'parquet';
   ruta_archivo: string | null;
+  url_descarga: string | null;
 }
 
 export interface ReportResponse {
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from api.report import ReportService
+from api.pool import PoolService
 from fastapi.middleware.cors import CORSMiddleware
 
 def setup_services(api_server: FastAPI):
     ReportService(api_server)
+    PoolService(api_server)
 
     # Configuraciones de CORS
     api_server.add_middleware(
@@ -0,0 +1,25 @@
+from fastapi import FastAPI, APIRouter
+from models.database import ENGINES
+from models.pool import pool_status
+
+ROUTE_NAME = 'pool'
+
+class PoolService:
+
+    def __init__(self, api_server: FastAPI):
+        self.api_router = APIRouter(prefix=f'/{ROUTE_NAME}')
+        self.setup_routes()
+        api_server.include_router(self.api_router)
+
+    def setup_routes(self):
+        self.api_router.get('/')(self.get_pool_status)#estado de los pools de conexiones
+
+    async def get_pool_status(self):
+        """
+        Obtiene el estado de cada pool de conexiones del proceso de la API:
+        conexiones en uso (checked_out), overflow, esperas por pool agotado y timeouts.
+        """
+        return {
+            nombre: pool_status(engine)
+            for nombre, engine in ENGINES.items()
+        }
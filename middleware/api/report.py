@@ -1,21 +1,53 @@
 from pathlib import Path
 import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
 
-from sqlalchemy import text
-from models.database import get_db
-from datetime import datetime
-from models.report_status import ReporteEstado
+from sqlalchemy import Result, exists, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from models.database import WorkerSession, get_db, get_worker_db
+from datetime import date, datetime
+from models.report_status import REPORTE_COMPLETADO, ReporteEstado
 from models.ta_sms_detalle import TaSmsDetalle
 from models.ta_sms_maestro import TaSmsMaestro
 from sqlalchemy.orm import Session
 from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query
+from utils.csv_export import EXPORTADORES, copy_to_csv, resolver_exportador
+from utils.pipeline import REPORT_PIPELINE, TuberiaLotes
 
 ROUTE_NAME = "reporte"
+EXPORTADORES_PATTERN = f"^({'|'.join(EXPORTADORES)})$"
+
+# Recorridos: una consulta de detalles por maestro o una sola para todos los maestros de la fecha
+RECORRIDOS_PATTERN = "^(campania|fecha)$"
+
+# Filas que se traen del cursor del servidor por cada lote
+BATCH_SIZE = 1000
+
+# Maestros que se leen, generan y registran juntos (un INSERT ... ON CONFLICT por lote)
+REPORT_LOTE_MAESTROS = int(os.getenv("REPORT_LOTE_MAESTROS", 100))
+
+# Hilos que generan los CSV de un lote en paralelo; cada uno usa una conexión del pool de
+# workers además de la de la solicitud (DB_WORKER_POOL_SIZE + DB_WORKER_MAX_OVERFLOW > REPORT_WORKERS)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+
+
+def nombre_archivo(maestro) -> str:
+    """CSV del maestro: nombre y fecha de la campaña; el id evita que dos campañas homónimas compartan archivo"""
+    return f"{maestro.nombre}_{maestro.fecha}_{maestro.id}.csv"
 
 class ReportService:
     def __init__(self, api_server: FastAPI):
         self.reports_dir = Path("reports")
         self.reports_dir.mkdir(exist_ok=True)
+        # Traer el siguiente lote de detalles mientras se escribe el anterior (ver utils/pipeline.py)
+        self.tuberia = REPORT_PIPELINE
+        # Generación por lotes de maestros con varios hilos, cada uno con su sesión
+        self.lote_maestros = REPORT_LOTE_MAESTROS
+        self.workers = REPORT_WORKERS
+        self.session_factory = WorkerSession
 
         self.api_router = APIRouter(prefix="/report")
         self.setup_routes()
@@ -27,9 +59,12 @@ class ReportService:
     def obtener_maestros_sin_reporte(self,fecha:datetime, db:Session = Depends(get_db)):
 
         try:
+            # La función retorna maestro_id, maestro_nombre y maestro_fecha
             results = db.execute(
                 text("""
-            SELECT * FROM obtener_maestros_sin_reporte(:fecha);
+            SELECT maestro_id AS id, maestro_nombre AS nombre, maestro_fecha AS fecha,
+                   estado_reporte, ruta_archivo
+            FROM obtener_maestros_sin_reporte(:fecha);
             """), {'fecha': fecha}
             ).fetchall()
 
@@ -42,55 +77,208 @@ class ReportService:
                 detail=f"Error al obtener campañas: {str(e)}"
             )
         
-    def obtener_detalles_maestro(self, id_maestro, db:Session = Depends(get_db)):
-        detalles = db.query(TaSmsDetalle.id, TaSmsDetalle.mensaje, TaSmsDetalle.estado) \
-            .filter(TaSmsDetalle.id_maestro == id_maestro) \
-            .all()
-        
-        return detalles
+    def obtener_maestros_sin_reporte_lote(self, fecha: date, desde_id: int, limite: int, db: Session = Depends(get_db)):
+        """
+        Siguiente lote de maestros de la fecha sin reporte (como obtener_maestros_sin_reporte),
+        por id ascendente a partir de desde_id (keyset): cada lote es una consulta por índice
+        aunque los lotes anteriores ya se hayan registrado
+        """
+        sin_reporte = ~exists().where(
+            ReporteEstado.id_campana == TaSmsMaestro.id,
+            ReporteEstado.fecha == TaSmsMaestro.fecha
+        )
+        return db.execute(
+            select(TaSmsMaestro.id, TaSmsMaestro.nombre, TaSmsMaestro.fecha)
+            .where(TaSmsMaestro.fecha == fecha, TaSmsMaestro.id > desde_id, sin_reporte)
+            .order_by(TaSmsMaestro.id)
+            .limit(limite)
+        ).all()
+
+    def obtener_detalles_maestro(self, id_maestro, db:Session = Depends(get_db)) -> Result:
+        """Detalles (id, mensaje, estado) del maestro desde un cursor del servidor, en lotes de BATCH_SIZE"""
+        return db.execute(
+            select(TaSmsDetalle.id, TaSmsDetalle.mensaje, TaSmsDetalle.estado)
+            .where(TaSmsDetalle.id_maestro == id_maestro)
+            .order_by(TaSmsDetalle.id)
+            .execution_options(stream_results=True, yield_per=BATCH_SIZE)
+        )
+
+    def obtener_detalles_fecha(self, ids_maestro: list[int], db:Session = Depends(get_db)) -> Result:
+        """
+        Detalles (id_maestro, id, mensaje, estado) de varios maestros en un solo recorrido,
+        ordenados por maestro para repartirlos en sus CSV conforme llegan del cursor
+        """
+        return db.execute(
+            select(TaSmsDetalle.id_maestro, TaSmsDetalle.id, TaSmsDetalle.mensaje, TaSmsDetalle.estado)
+            .join(TaSmsMaestro, TaSmsMaestro.id == TaSmsDetalle.id_maestro)
+            .where(TaSmsMaestro.id.in_(ids_maestro))
+            .order_by(TaSmsDetalle.id_maestro, TaSmsDetalle.id)
+            .execution_options(stream_results=True, yield_per=BATCH_SIZE)
+        )
+
+    def generar_csv_copy(self, maestro, db:Session = Depends(get_db)):
+        """Genera el CSV del maestro con COPY TO STDOUT; PostgreSQL formatea las filas"""
+        archivo = nombre_archivo(maestro)
+        query = select(
+            TaSmsDetalle.id.label('ID Detalle'),
+            TaSmsDetalle.mensaje.label('Mensaje'),
+            TaSmsDetalle.estado.label('Estado')
+        ).where(TaSmsDetalle.id_maestro == maestro.id).order_by(TaSmsDetalle.id)
+
+        copy_to_csv(db, query, archivo)
+        return archivo
+
     def generar_csv(self, maestro, detalles, db:Session = Depends(get_db)):
-        archivo = f"{maestro.nombre}_{maestro.fecha}.csv"  # Usamos el nombre y la fecha para el archivo
+        """
+        Escribe los detalles del maestro en el CSV. Con un Result de obtener_detalles_maestro
+        se escribe por lotes; con la tubería un hilo trae el siguiente lote mientras se escribe.
+        """
+        archivo = nombre_archivo(maestro)
+        lotes = detalles.partitions() if isinstance(detalles, Result) else [detalles]
         with open(archivo, mode='w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             writer.writerow(['ID Detalle', 'Mensaje', 'Estado'])  # Encabezados del CSV
-            for detalle in detalles:
-                writer.writerow([detalle[0], detalle[1], detalle[2]])  # Escribir detalles
+            if self.tuberia:
+                with TuberiaLotes(lotes) as tuberia:
+                    for lote in tuberia:
+                        writer.writerows(lote)
+            else:
+                for lote in lotes:
+                    writer.writerows(lote)
         return archivo
-    
-    def procesar_reportes(self, fecha):
-        # Obtener los maestros sin reporte generado
-        maestros = self.obtener_maestros_sin_reporte(fecha)
-
-        for maestro in maestros:
-            # Obtener los detalles de cada maestro
-            detalles = self.obtener_detalles_maestro(maestro.id)  # maestro.id es el ID del maestro
-            # Generar el archivo CSV para este maestro
-            archivo_csv = self.generar_csv(maestro, detalles)
-            
-            
-            # Registrar o actualizar el estado del reporte en la base de datos
-            self.registrar_reporte(maestro.id, maestro.fecha, archivo_csv)
-        
-            print(f"Reporte CSV generado y registrado en reporte_estado: {archivo_csv}")
 
+    def generar_csvs_fecha(self, maestros, detalles: Result) -> dict[int, str]:
+        """
+        Reparte las filas de obtener_detalles_fecha en el CSV de cada maestro (los mismos de
+        generar_csv). Como llegan ordenadas por maestro, solo hay un archivo abierto a la vez.
+        Retorna {id_maestro: archivo}; los maestros sin detalles quedan con solo el encabezado.
+        """
+        archivos = {maestro.id: nombre_archivo(maestro) for maestro in maestros}
+        escritos = set()
+        actual, file, writer = None, None, None
+
+        def cambiar(id_maestro):
+            nonlocal actual, file, writer
+            if file is not None:
+                file.close()
+            actual = id_maestro
+            file = open(archivos[id_maestro], mode='w', newline='', encoding='utf-8')
+            writer = csv.writer(file)
+            writer.writerow(['ID Detalle', 'Mensaje', 'Estado'])  # Encabezados del CSV
+            escritos.add(id_maestro)
+
+        def escribir(lote):
+            # Un lote puede abarcar el final de un maestro y el inicio del siguiente
+            for id_maestro, filas in groupby(lote, key=itemgetter(0)):
+                if id_maestro != actual:
+                    cambiar(id_maestro)
+                writer.writerows(fila[1:] for fila in filas)
+
+        try:
+            lotes = detalles.partitions()
+            if self.tuberia:
+                with TuberiaLotes(lotes) as tuberia:
+                    for lote in tuberia:
+                        escribir(lote)
+            else:
+                for lote in lotes:
+                    escribir(lote)
+
+            for id_maestro in archivos:
+                if id_maestro not in escritos:
+                    cambiar(id_maestro)
+        finally:
+            if file is not None:
+                file.close()
+
+        return archivos
+
+    def procesar_reportes(
+        self,
+        fecha: date,
+        exportador: str = Query("auto", pattern=EXPORTADORES_PATTERN, description="Motor de exportación: auto, copy o python"),
+        recorrido: str = Query(
+            "campania", pattern=RECORRIDOS_PATTERN,
+            description="campania: una consulta de detalles por maestro; fecha: un solo recorrido repartido por maestro"
+        ),
+        db: Session = Depends(get_worker_db)
+    ):
+        """
+        Genera el CSV de cada maestro de la fecha sin reporte, por lotes de self.lote_maestros:
+
+        - los maestros del lote se leen con una consulta (keyset por id);
+        - sus CSV se generan en paralelo con self.workers hilos (o con un solo recorrido de
+          detalles del lote con recorrido=fecha);
+        - los reportes del lote se registran con un INSERT ... ON CONFLICT y un commit.
+
+        Un maestro cuyo CSV falla no se registra y queda pendiente para la siguiente ejecución.
+        """
+        usar_copy = recorrido == "campania" and resolver_exportador(db, exportador) == "copy"
+        generados, errores, ultimo_id = 0, 0, 0
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            while True:
+                # Obtener el siguiente lote de maestros sin reporte generado
+                maestros = self.obtener_maestros_sin_reporte_lote(fecha, ultimo_id, self.lote_maestros, db)
+                if not maestros:
+                    break
+                ultimo_id = maestros[-1].id
+
+                if recorrido == "fecha":
+                    # Un solo recorrido de detalles para los maestros del lote
+                    archivos = self.generar_csvs_fecha(maestros, self.obtener_detalles_fecha([m.id for m in maestros], db))
+                else:
+                    archivos = {}
+                    futures = {maestro.id: pool.submit(self.generar_reporte, maestro, usar_copy) for maestro in maestros}
+                    for id_maestro, future in futures.items():
+                        try:
+                            archivos[id_maestro] = future.result()
+                        except Exception as e:
+                            errores += 1
+                            print(f"Error generando el reporte del maestro {id_maestro}: {str(e)}")
+
+                # Registrar o actualizar el estado de los reportes del lote en la base de datos
+                self.registrar_reportes([(m.id, m.fecha, archivos[m.id]) for m in maestros if m.id in archivos], db)
+                generados += len(archivos)
+                print(f"Reportes CSV generados y registrados en reporte_estado: {len(archivos)} de {len(maestros)} maestros")
+
+        return {"fecha": fecha, "generados": generados, "errores": errores}
+
+    def generar_reporte(self, maestro, usar_copy: bool) -> str:
+        """Genera el CSV de un maestro en el hilo actual, con su propia sesión del pool de workers"""
+        with self.session_factory() as db:
+            if usar_copy:
+                # La base de datos escribe el CSV directamente
+                return self.generar_csv_copy(maestro, db)
+
+            # Obtener los detalles del maestro y generar su archivo CSV
+            detalles = self.obtener_detalles_maestro(maestro.id, db)
+            return self.generar_csv(maestro, detalles)
 
     def registrar_reporte(self, id_campana: int, fecha: str, ruta_archivo: str, session: Session = Depends(get_db)):
-        # Verificar si ya existe un reporte para esta campaña y fecha
-        reporte = session.query(ReporteEstado).filter_by(id_campana=id_campana, fecha=fecha).first()
-
-        if reporte:
-            # Si el reporte ya existe, actualizamos el estado y la ruta del archivo
-            reporte.estado = 'Completado'  # O el estado que corresponda
-            reporte.ruta_archivo = ruta_archivo
-        else:
-            # Si no existe, creamos un nuevo registro en la tabla reporte_estado
-            reporte = ReporteEstado(
-                id_campana=id_campana,
-                fecha=fecha,
-                estado='Completado',
-                ruta_archivo=ruta_archivo
-            )
-            session.add(reporte)
+        """Registra o actualiza el reporte de una campaña (ver registrar_reportes)"""
+        self.registrar_reportes([(id_campana, fecha, ruta_archivo)], session)
+
+    def registrar_reportes(self, reportes: list[tuple], session: Session = Depends(get_db)):
+        """
+        Registra los reportes (id_campana, fecha, ruta_archivo) como Completado con una sola
+        sentencia INSERT ... ON CONFLICT DO UPDATE sobre el índice único de reportes completados
+        (ux_reporte_estado_completado) y un commit: si la campaña ya tiene su reporte para la
+        fecha, se actualiza la ruta del archivo.
+        """
+        if not reportes:
+            return
+
+        dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+        query = dialect_insert(ReporteEstado).values([
+            {"id_campana": id_campana, "fecha": fecha, "estado": 'Completado', "ruta_archivo": ruta_archivo}
+            for id_campana, fecha, ruta_archivo in reportes
+        ])
+        session.execute(query.on_conflict_do_update(
+            index_elements=[ReporteEstado.id_campana, ReporteEstado.fecha],
+            index_where=REPORTE_COMPLETADO,
+            set_={"ruta_archivo": query.excluded.ruta_archivo, "timestamp": func.now()}
+        ))
 
         # Guardar los cambios en la base de datos
-        session.commit()
\ No newline at end of file
+        session.commit()
@@ -0,0 +1,107 @@
+"""
+Mide el procesamiento de reportes del middleware (ReportService) para todas las campañas
+de una fecha sobre una base ya sembrada: segundos, filas/s, consultas y RSS pico.
+
+Lo usa la suite de benchmarks del backend (backend/benchmarks/suite.py), que siembra la
+base y lee el resultado en JSON:
+
+    python -m benchmarks.bench_procesar_reportes --url sqlite:////tmp/bench.db --fecha 2025-01-15 --json
+
+--workers y --lote cambian los hilos y los maestros por lote de procesar_reportes;
+--recorrido fecha lee los detalles de cada lote con un solo recorrido.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import date
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from api.report import ReportService
+from models.ta_sms_detalle import TaSmsDetalle
+from models.ta_sms_maestro import TaSmsMaestro
+
+
+def rss_pico_mb() -> float:
+    """RSS máximo alcanzado por el proceso actual, en MB"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def procesar_fecha(service: ReportService, db, fecha: date, recorrido: str = "campania"):
+    """
+    Ejecuta procesar_reportes para la fecha con el exportador de Python. Los maestros se leen
+    por lotes con el ORM, por lo que no se necesita la función obtener_maestros_sin_reporte
+    (solo existe en PostgreSQL).
+    """
+    return service.procesar_reportes(fecha, "python", recorrido, db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de la base sembrada")
+    parser.add_argument("--fecha", required=True, help="Fecha de las campañas (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Hilos de generación (por defecto REPORT_WORKERS)")
+    parser.add_argument("--lote", type=int, default=None, help="Maestros por lote (por defecto REPORT_LOTE_MAESTROS)")
+    parser.add_argument("--recorrido", default="campania", choices=("campania", "fecha"), help="Recorrido de los detalles")
+    parser.add_argument("--json", action="store_true", help="Imprimir el resultado como JSON")
+    args = parser.parse_args()
+
+    fecha = date.fromisoformat(args.fecha)
+    engine = create_engine(args.url)
+    SessionLocal = sessionmaker(bind=engine)
+
+    consultas = 0
+
+    def contar(*_):
+        nonlocal consultas
+        consultas += 1
+
+    with SessionLocal() as db:
+        filas = db.execute(
+            select(func.count(TaSmsDetalle.id))
+            .join(TaSmsMaestro, TaSmsMaestro.id == TaSmsDetalle.id_maestro)
+            .where(TaSmsMaestro.fecha == fecha)
+        ).scalar_one()
+
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as tmp, SessionLocal() as db:
+        # Los CSV del middleware se escriben en el directorio actual
+        os.chdir(tmp)
+        service = ReportService(FastAPI())
+        service.session_factory = SessionLocal
+        service.workers = args.workers or service.workers
+        service.lote_maestros = args.lote or service.lote_maestros
+        event.listen(engine, "before_cursor_execute", contar)
+        inicio = time.perf_counter()
+        try:
+            procesar_fecha(service, db, fecha, args.recorrido)
+        finally:
+            segundos = time.perf_counter() - inicio
+            event.remove(engine, "before_cursor_execute", contar)
+            os.chdir(cwd)
+
+    resultado = {
+        "segundos": segundos,
+        "filas": filas,
+        "filas_s": filas / segundos if segundos else 0.0,
+        "consultas": consultas,
+        "rss_pico_mb": rss_pico_mb()
+    }
+
+    if args.json:
+        print(json.dumps(resultado))
+    else:
+        for clave, valor in resultado.items():
+            print(f"{clave:<12} {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from models.pool import MonitoredQueuePool
 from dotenv import load_dotenv
 import os
 
@@ -13,6 +14,24 @@ BD_PASS = os.getenv("BD_PASS")
 BD_PORT = os.getenv("BD_PORT")
 BD_HOST = os.getenv("BD_HOST")
 
+# Configuración de los pools de conexiones
+# - API: consultas cortas de los endpoints, con timeout de sentencia
+# - WORKER: generación de reportes, pocas conexiones de larga duración y sin timeout por defecto
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+DB_WORKER_POOL_SIZE = int(os.getenv("DB_WORKER_POOL_SIZE", 2))
+DB_WORKER_MAX_OVERFLOW = int(os.getenv("DB_WORKER_MAX_OVERFLOW", 2))
+DB_WORKER_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_WORKER_STATEMENT_TIMEOUT_MS", 0))
+
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+# Nivel de log de SQL: false (sin log), true (sentencias) o debug (sentencias y filas)
+DB_ECHO = {"true": True, "debug": "debug"}.get(os.getenv("DB_ECHO", "false").lower(), False)
+
 # Base para todos los modelos
 Base = declarative_base()
 
@@ -21,8 +40,30 @@ SQLALCHEMY_DATABASE_URL = f"postgresql://{BD_USER}:{BD_PASS}@{BD_HOST}:{BD_PORT}
 
 print("URL:", SQLALCHEMY_DATABASE_URL)
 
-# Creando el motor de conexión
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+
+def _pool_options(pool_size: int, max_overflow: int) -> dict:
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "echo": DB_ECHO
+    }
+
+
+def _statement_timeout_option(statement_timeout_ms: int) -> str:
+    # 0 desactiva el timeout de sentencia en PostgreSQL
+    return f"-c statement_timeout={statement_timeout_ms}"
+
+
+# Creando el motor de conexión (consultas cortas de los endpoints)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=MonitoredQueuePool,
+    connect_args={"options": _statement_timeout_option(DB_STATEMENT_TIMEOUT_MS)},
+    **_pool_options(DB_POOL_SIZE, DB_MAX_OVERFLOW)
+)
 
 # Creando la sesión de la base de datos
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -34,3 +75,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Motor de los workers de reportes: exportaciones largas que no deben competir con la API
+worker_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=MonitoredQueuePool,
+    connect_args={"options": _statement_timeout_option(DB_WORKER_STATEMENT_TIMEOUT_MS)},
+    **_pool_options(DB_WORKER_POOL_SIZE, DB_WORKER_MAX_OVERFLOW)
+)
+
+WorkerSession = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+
+# Función para obtener una sesión del pool de workers (procesamiento de reportes)
+def get_worker_db():
+    db = WorkerSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Pools expuestos en las métricas de la API
+ENGINES = {
+    "api": engine,
+    "worker": worker_engine
+}
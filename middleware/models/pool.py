@@ -0,0 +1,67 @@
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStatsMixin:
+    """
+    Agrega a un QueuePool contadores de espera: cuántas veces un checkout encontró el pool
+    agotado y tuvo que esperar una conexión, el tiempo total esperado y los timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.esperas = 0
+        self.tiempo_espera = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        # Pool agotado: todas las conexiones están en uso y no queda overflow disponible
+        agotado = self.checkedin() == 0 and self.overflow() >= self._max_overflow
+        if not agotado:
+            return super()._do_get()
+
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.esperas += 1
+                self.tiempo_espera += time.perf_counter() - inicio
+
+    def recreate(self):
+        # dispose() recrea el pool; los contadores se conservan
+        nuevo = super().recreate()
+        nuevo.esperas, nuevo.tiempo_espera, nuevo.timeouts = self.esperas, self.tiempo_espera, self.timeouts
+        return nuevo
+
+
+class MonitoredQueuePool(PoolStatsMixin, QueuePool):
+    """QueuePool con contadores de espera"""
+
+
+def pool_status(engine) -> dict:
+    """Estado actual del pool de conexiones de un engine"""
+    pool = engine.pool
+    status = {
+        "pool_size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0)
+    }
+
+    if isinstance(pool, PoolStatsMixin):
+        status.update({
+            "esperas": pool.esperas,
+            "tiempo_espera_s": round(pool.tiempo_espera, 3),
+            "timeouts": pool.timeouts
+        })
+
+    return status
@@ -1,11 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, func
+from sqlalchemy import Column, Integer, String, DateTime, Date, Index, func, text
 from models.database import Base
 
+# Predicado del índice único de los reportes registrados por el middleware (un reporte
+# completado por campaña y fecha); lo usa el INSERT ... ON CONFLICT de registrar_reportes
+REPORTE_COMPLETADO = text("estado = 'Completado'")
+
 class ReporteEstado(Base):
     """
     Modelo para la tabla 'reporte_estado' que almacena el estado de los reportes generados para cada campaña.
     """
     __tablename__ = 'reporte_estado'  # Nombre de la tabla en la base de datos
+    __table_args__ = (
+        Index(
+            'ux_reporte_estado_completado', 'id_campana', 'fecha',
+            unique=True,
+            postgresql_where=REPORTE_COMPLETADO,
+            sqlite_where=REPORTE_COMPLETADO
+        ),
+    )
 
     # Identificador único de la fila (clave primaria)
     id = Column(Integer, primary_key=True, autoincrement=True, comment="Identificador único de la fila del reporte")
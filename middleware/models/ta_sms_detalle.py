@@ -1,4 +1,5 @@
-from sqlalchemy import ForeignKey, Integer, String, Text, DateTime
+from datetime import date
+from sqlalchemy import ForeignKey, Integer, String, Text, DateTime, Date
 from sqlalchemy.orm import declarative_base, mapped_column, Mapped
 from models.database import Base
 from typing import Optional
@@ -14,6 +15,9 @@ class TaSmsDetalle(Base):
         nullable=False,
         index=True)
 
+    # fecha: Fecha de la campaña (copia de TA_SMS_MAESTRO.fecha), clave de partición de la tabla (ver backend)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+
     mensaje: Mapped[str] = mapped_column(Text, nullable=False)
 
     estado: Mapped[str] = mapped_column(String, nullable=False)
\ No newline at end of file
@@ -0,0 +1,52 @@
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+# Versión del middleware de backend/utils/csv_export.py (solo CSV plano con encabezado). Las
+# funciones comunes (soporta_copy, resolver_exportador) deben mantenerse iguales en ambas
+
+# Motores de exportación disponibles para los reportes CSV
+# - copy: COPY (SELECT ...) TO STDOUT en PostgreSQL, la base de datos formatea el CSV
+# - python: cursor del servidor + csv.writer
+# - auto: copy si el motor es PostgreSQL, python en cualquier otro caso
+EXPORTADORES = ("auto", "copy", "python")
+
+
+def soporta_copy(db: Session) -> bool:
+    """Indica si la conexión de la sesión permite COPY TO STDOUT (PostgreSQL con psycopg2)"""
+    bind = db.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+
+
+def resolver_exportador(db: Session, exportador: str = "auto") -> str:
+    """
+    Resuelve el motor de exportación a usar para la sesión.
+    Si se pide 'copy' en un motor distinto a PostgreSQL se usa el escritor de Python.
+    """
+    if exportador not in EXPORTADORES:
+        raise ValueError(f"Exportador inválido '{exportador}'. Opciones: {', '.join(EXPORTADORES)}")
+
+    if exportador == "python":
+        return "python"
+
+    return "copy" if soporta_copy(db) else "python"
+
+
+def copy_to_csv(db: Session, query: Select, filepath) -> int:
+    """
+    Exporta el resultado de una consulta a un archivo CSV con encabezado usando
+    COPY (SELECT ...) TO STDOUT WITH CSV HEADER sobre la conexión psycopg2 de la sesión.
+    Los nombres de columna del encabezado son las etiquetas (label) de la consulta.
+
+    Retorna el número de filas exportadas.
+    """
+    compiled = query.compile(dialect=db.get_bind().dialect)
+    dbapi_connection = db.connection().connection.dbapi_connection
+
+    with dbapi_connection.cursor() as cursor:
+        # mogrify interpola los parámetros de forma segura; COPY no acepta parámetros enlazados
+        sql = cursor.mogrify(str(compiled), compiled.params).decode()
+
+        with open(filepath, 'wb') as csvfile:
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER, ENCODING 'UTF8')", csvfile)
+
+        return cursor.rowcount